@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import tornado.httpserver
+import tornado.netutil
+import tornado.process
+from src.api import make_app
+from src.migrations import migrate
+from src.models import get_engine
+
+
+async def serve(sockets):
+    server = tornado.httpserver.HTTPServer(
+        make_app(get_engine()), xheaders=True
+    )
+    server.add_sockets(sockets)
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Read-only JSON/Atom API for the blog"
+    )
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--address", default="")
+    parser.add_argument(
+        "--processes", type=int, default=1,
+        help="worker processes sharing the port, 0 for one per CPU"
+    )
+    args = parser.parse_args(argv)
+
+    engine = get_engine()
+    migrate(engine)
+    # 接続をフォーク先に持ち込まないよう閉じておく
+    engine.dispose()
+    sockets = tornado.netutil.bind_sockets(args.port, args.address)
+    if args.processes != 1:
+        tornado.process.fork_processes(args.processes)
+    asyncio.run(serve(sockets))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,41 @@
 import streamlit as st
-from src.models import SessionLocal
+from src import instrumentation
+from src.migrations import migrate
+from src.models import get_engine, session_scope
 from src.blog_app import BlogApp
 
-# データベースセッションを作成
-if "session" not in st.session_state:
-    st.session_state["session"] = SessionLocal()
+
+@st.cache_resource
+def prepare_database():
+    """
+    Create the engine and bring the schema up to date, once per process.
+
+    Streamlit has no deploy hook, so the first rerun after a deploy does
+    the migration step; `python manage.py migrate` can run it beforehand.
+    """
+    engine = get_engine()
+    migrate(engine)
+    # BLOG_INSTRUMENTATION=1 のときだけSQLフックを登録する
+    instrumentation.configure(engine)
+    return engine
+
 
 # アプリケーションの実行
 if __name__ == "__main__":
-    app = BlogApp(st.session_state["session"])
-    app.run()
+    prepare_database()
+
+    # 旧バージョンがセッションステートに保持していたDBセッションを破棄
+    abandoned = st.session_state.pop("session", None)
+    if abandoned is not None:
+        abandoned.close()
+
+    # 再実行ごとにDBセッションを作成し、終了時に必ず閉じる
+    stats = None
+    try:
+        with instrumentation.rerun() as stats:
+            with session_scope() as session:
+                app = BlogApp(session)
+                app.run()
+    finally:
+        if stats is not None:
+            st.session_state['rerun_stats'] = stats.as_dict()
@@ -0,0 +1,104 @@
+"""
+Requests per second of the read-only API, with and without conditional GET.
+
+The API runs in-process on a seeded temporary database; a pool of
+concurrent Tornado clients fetches each URL and the throughput is printed
+as JSON. Clients that send the previous ETag get 304s without a body.
+
+Usage:
+    python benchmarks/bench_api.py --posts 10000 --requests 5000
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tornado.httpclient  # noqa: E402
+import tornado.httpserver  # noqa: E402
+import tornado.netutil  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from src.api import make_app  # noqa: E402
+from src.database import DEFAULT_SETTINGS, create_blog_engine  # noqa: E402
+from src.models import Base, User, Post  # noqa: E402
+from src.rendering import render_post  # noqa: E402
+
+
+def seed(engine, posts):
+    Base.metadata.create_all(engine)
+    rendered = render_post("Some *markdown* text. " * 50)
+    start = datetime.datetime(2020, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(insert(User.__table__), [
+            {'id': 1, 'username': 'bench', 'password_hash': 'x'}
+        ])
+        connection.execute(insert(Post.__table__), [
+            {'id': i, 'title': f'Post {i}', 'content': 'x', 'user_id': 1,
+             'created_at': start + datetime.timedelta(minutes=i), **rendered}
+            for i in range(1, posts + 1)
+        ])
+
+
+async def hammer(url, requests, concurrency, conditional):
+    client = tornado.httpclient.AsyncHTTPClient(max_clients=concurrency)
+    headers = {'Accept-Encoding': 'gzip'}
+    if conditional:
+        first = await client.fetch(url)
+        headers['If-None-Match'] = first.headers['ETag']
+    codes = {}
+
+    async def worker(count):
+        for _ in range(count):
+            response = await client.fetch(url, headers=headers,
+                                          raise_error=False)
+            codes[response.code] = codes.get(response.code, 0) + 1
+
+    share = requests // concurrency
+    begin = time.perf_counter()
+    await asyncio.gather(*(worker(share) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - begin
+    return {'requests_per_second': round(share * concurrency / elapsed, 1),
+            'codes': codes}
+
+
+async def run(args, engine):
+    sockets = tornado.netutil.bind_sockets(0, '127.0.0.1')
+    port = sockets[0].getsockname()[1]
+    http = tornado.httpserver.HTTPServer(make_app(engine))
+    http.add_sockets(sockets)
+    results = {}
+    for path in ('/posts', '/posts/1', '/feed.atom'):
+        url = f'http://127.0.0.1:{port}{path}'
+        for conditional in (False, True):
+            name = f"{path} {'304' if conditional else '200'}"
+            results[name] = await hammer(url, args.requests,
+                                         args.concurrency, conditional)
+    http.stop()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--posts', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=2_000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings = dict(DEFAULT_SETTINGS,
+                        url=f"sqlite:///{os.path.join(directory, 'blog.db')}")
+        engine = create_blog_engine(settings)
+        seed(engine, args.posts)
+        results = asyncio.run(run(args, engine))
+        engine.dispose()
+    print(json.dumps({'posts': args.posts, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""
+Time the hot paths of the app against a seeded SQLite database.
+
+Streamlit is replaced with mocks so only our code and the database are
+measured. Results are written as JSON; with --compare, medians are checked
+against a saved baseline and the exit status is 1 on regressions.
+
+Usage:
+    python benchmarks/bench_hot_paths.py --size 100k --output current.json
+    python benchmarks/bench_hot_paths.py --size 100k --compare baseline.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from itertools import count
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('GITHUB_ACTIONS', 'true')  # 管理者パスワードをsecrets以外から読む
+
+import sqlalchemy  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from src.auth_manager import AuthManager  # noqa: E402
+from src.database import DEFAULT_SETTINGS, create_blog_engine  # noqa: E402
+from src.models import Base, User, Post, Tag, post_tags  # noqa: E402
+from src.post_manager import PostManager  # noqa: E402
+from src.principals import Principal  # noqa: E402
+from src.rendering import render_post  # noqa: E402
+
+SIZES = {
+    '1k': (100, 1_000),
+    '100k': (1_000, 100_000),
+    '1m': (10_000, 1_000_000),
+}
+SEED_BATCH = 10_000
+TAG_COUNT = 2_000
+PASSWORD = 'benchmark-password'
+CONTENT_TEMPLATES = [
+    "# Heading\n\n" + "Some *markdown* text with a [link](https://x.y). " * n
+    for n in (5, 40, 200)
+]
+
+
+def seed_tags(engine):
+    """Give every post two of TAG_COUNT tags (counts follow by trigger)."""
+    with engine.connect() as connection:
+        if connection.execute(select(func.count(Tag.id))).scalar():
+            return
+    with engine.begin() as connection:
+        connection.execute(insert(Tag.__table__), [
+            {'id': i + 1, 'name': f'tag{i:05d}', 'post_count': 0}
+            for i in range(TAG_COUNT)
+        ])
+        # 投稿ごとに2つのタグを INSERT ... SELECT でまとめて付ける
+        first = Post.id % TAG_COUNT + 1
+        second = (Post.id * 7 + 3) % TAG_COUNT + 1
+        for tag_id, where in ((first, True), (second, second != first)):
+            connection.execute(insert(post_tags).from_select(
+                ['post_id', 'tag_id', 'created_at'],
+                select(Post.id, tag_id, Post.created_at).where(where)
+            ))
+
+
+def seed(engine, users, posts):
+    """Fill an empty database with users and posts; reuse a seeded one."""
+    Base.metadata.create_all(engine)
+    with engine.connect() as connection:
+        if connection.execute(select(func.count(User.id))).scalar():
+            seed_tags(engine)
+            return
+    password_hash = User.hash_password(PASSWORD)
+    # 本文のレンダリング結果はテンプレートごとに一度だけ計算する
+    rendered = [render_post(template) for template in CONTENT_TEMPLATES]
+    start = datetime.datetime(2020, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(insert(User.__table__), [
+            {'id': i, 'username': f'user{i:07d}',
+             'password_hash': password_hash, 'is_admin': i == 1}
+            for i in range(1, users + 1)
+        ])
+    for offset in range(0, posts, SEED_BATCH):
+        batch = []
+        for i in range(offset, min(offset + SEED_BATCH, posts)):
+            kind = i % len(CONTENT_TEMPLATES)
+            batch.append({
+                'id': i + 1,
+                'title': f'Post {i}',
+                'content': CONTENT_TEMPLATES[kind],
+                'created_at': start + datetime.timedelta(minutes=i),
+                'user_id': i % users + 1,
+                **rendered[kind],
+            })
+        with engine.begin() as connection:
+            connection.execute(insert(Post.__table__), batch)
+    seed_tags(engine)
+
+
+def make_streamlit_stub(session_state, text_inputs=None, button=False):
+    st = MagicMock()
+    st.session_state = session_state
+    st.button.return_value = button
+    st.toggle.return_value = False
+    st.radio.return_value = 'View'
+    st.text_input.return_value = ''
+    st.selectbox.side_effect = lambda label, options, **kwargs: options[0]
+    column = MagicMock()
+    column.button.return_value = False
+    st.columns.return_value = [column] * 5
+    if text_inputs is not None:
+        st.text_input.side_effect = text_inputs
+    return st
+
+
+class Benchmark:
+    def __init__(self, engine, users, repeat):
+        self.engine = engine
+        self.users = users
+        self.repeat = repeat
+        self.SessionLocal = sessionmaker(
+            autoflush=False, expire_on_commit=False, bind=engine
+        )
+        with self.SessionLocal() as session:
+            self.admin = Principal.from_user(session.get(User, 1))
+            self.last_post_id = session.execute(
+                select(func.max(Post.id))
+            ).scalar()
+        self.names = count()
+
+    def measure(self, case):
+        """Run case(session, st) repeat times; return timings in ms."""
+        timings = []
+        for _ in range(self.repeat):
+            with ExitStack() as stack:
+                session = stack.enter_context(self.SessionLocal())
+                st = case.setup(self)
+                stack.enter_context(patch('src.post_manager.st', st))
+                stack.enter_context(patch('src.auth_manager.st', st))
+                begin = time.perf_counter()
+                case.run(self, session, st)
+                timings.append((time.perf_counter() - begin) * 1000)
+        return {
+            'runs': len(timings),
+            'min_ms': round(min(timings), 3),
+            'median_ms': round(statistics.median(timings), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'max_ms': round(max(timings), 3),
+        }
+
+
+class Case:
+    def __init__(self, name, run, setup):
+        self.name = name
+        self.run = run
+        self.setup = setup
+
+
+def _reader(bench):
+    return make_streamlit_stub({'user': None})
+
+
+def _tag_reader(bench):
+    return make_streamlit_stub({'user': None, 'feed_tag': 'tag00042'})
+
+
+def _admin(bench, **kwargs):
+    return make_streamlit_stub({'user': bench.admin}, **kwargs)
+
+
+def _login_inputs(bench):
+    username = f'user{bench.users:07d}'
+    return make_streamlit_stub({}, text_inputs=[username, PASSWORD],
+                               button=True)
+
+
+def _register_inputs(bench):
+    return make_streamlit_stub(
+        {}, text_inputs=[f'bench{next(bench.names)}', PASSWORD, 'admin_pass'],
+        button=True
+    )
+
+
+def _post_inputs(bench):
+    st = _admin(bench, button=True)
+    st.text_input.return_value = 'Benchmark title'
+    st.text_area.return_value = CONTENT_TEMPLATES[1]
+    st.form_submit_button.return_value = True
+    return st
+
+
+def _create_post(bench, session, st):
+    PostManager(session).create_post()
+
+
+def _edit_post(bench, session, st):
+    PostManager(session).edit_post(session.get(Post, bench.last_post_id))
+
+
+def _delete_post(bench, session, st):
+    post = session.execute(
+        select(Post).order_by(Post.id.desc()).limit(1)
+    ).scalar_one()
+    PostManager(session).delete_post(post)
+
+
+CASES = [
+    Case('show_posts',
+         lambda bench, session, st: PostManager(session).show_posts(),
+         _reader),
+    Case('show_posts_tag',
+         lambda bench, session, st: PostManager(session).show_posts(),
+         _tag_reader),
+    Case('manage_users',
+         lambda bench, session, st: PostManager(session).manage_users(),
+         _admin),
+    Case('login',
+         lambda bench, session, st: AuthManager(session).login(),
+         _login_inputs),
+    Case('register',
+         lambda bench, session, st: AuthManager(session).register(),
+         _register_inputs),
+    Case('create_post', _create_post, _post_inputs),
+    Case('edit_post', _edit_post, _post_inputs),
+    Case('delete_post', _delete_post, _post_inputs),
+]
+
+
+def compare(results, baseline, threshold):
+    """Return the cases whose median regressed by more than threshold."""
+    regressions = {}
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        ratio = current['median_ms'] / max(previous['median_ms'], 1e-9)
+        current['baseline_median_ms'] = previous['median_ms']
+        current['ratio'] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions[name] = current['ratio']
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', choices=sorted(SIZES), default='1k')
+    parser.add_argument('--users', type=int, help='override --size')
+    parser.add_argument('--posts', type=int, help='override --size')
+    parser.add_argument('--db', help='database file, reused when seeded')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--cases', nargs='+',
+                        choices=[case.name for case in CASES])
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='baseline results JSON')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown ratio (default 0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    users, posts = SIZES[args.size]
+    users = args.users or users
+    posts = args.posts or posts
+    db = args.db or os.path.join(
+        tempfile.gettempdir(), f'blog_bench_{users}_{posts}.db'
+    )
+    settings = dict(DEFAULT_SETTINGS, url=f'sqlite:///{db}')
+    engine = create_blog_engine(settings)
+    seed(engine, users, posts)
+
+    bench = Benchmark(engine, users, args.repeat)
+    selected = [c for c in CASES if not args.cases or c.name in args.cases]
+    results = {
+        'meta': {
+            'users': users,
+            'posts': posts,
+            'repeat': args.repeat,
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'sqlite': sqlite3.sqlite_version,
+        },
+        'results': {case.name: bench.measure(case) for case in selected},
+    }
+
+    status = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        results['regressions'] = regressions
+        for name, ratio in regressions.items():
+            print(f"REGRESSION {name}: {ratio:.2f}x baseline",
+                  file=sys.stderr)
+        status = 1 if regressions else 0
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    engine.dispose()
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
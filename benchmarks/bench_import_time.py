@@ -0,0 +1,136 @@
+"""
+Measure cold-start import cost with `python -X importtime`.
+
+Each target is imported in a fresh interpreter so nothing is cached in
+sys.modules. The cumulative time of the top-level imports is summed and
+the heaviest packages are listed; with --compare, totals are checked against a
+saved baseline and the exit status is 1 on regressions.
+
+Usage:
+    python benchmarks/bench_import_time.py --output imports.json
+    python benchmarks/bench_import_time.py --compare imports.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    'src.models': 'import src.models',
+    'src.blog_app': 'import src.blog_app',
+    'manage': 'import manage',
+    'pytest-collect': None,
+}
+
+
+def run_importtime(code, cwd):
+    """Import in a fresh interpreter and parse its -X importtime log."""
+    env = dict(os.environ, PYTHONPATH=ROOT, GITHUB_ACTIONS='true')
+    if code is None:
+        command = [sys.executable, '-X', 'importtime', '-m', 'pytest',
+                   '--collect-only', '-q', os.path.join(ROOT, 'tests')]
+    else:
+        command = [sys.executable, '-X', 'importtime', '-c', code]
+    result = subprocess.run(command, cwd=cwd, env=env, capture_output=True,
+                            text=True)
+    return parse_importtime(result.stderr)
+
+
+def parse_importtime(stderr):
+    """
+    Return (total_us, {package: cumulative_us}) from -X importtime output.
+
+    The total sums the top-level imports; each package is charged the
+    largest cumulative time of its modules, i.e. the time of its first,
+    outermost import.
+    """
+    total = 0
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        cumulative = int(cumulative)
+        # 名前の前の空白が1つだけの行がトップレベルのimport
+        if not name.startswith('  '):
+            total += cumulative
+        package = name.strip().split('.')[0]
+        packages[package] = max(packages.get(package, 0), cumulative)
+    return total, packages
+
+
+def measure(code, repeat, top):
+    # 一時ディレクトリで実行し、blog.db が作られないことも確認する
+    with tempfile.TemporaryDirectory() as cwd:
+        runs = [run_importtime(code, cwd) for _ in range(repeat)]
+        created_db = os.path.exists(os.path.join(cwd, 'blog.db'))
+    totals = [total / 1000 for total, _ in runs]
+    heaviest = sorted(runs[-1][1].items(), key=lambda item: -item[1])
+    return {
+        'runs': repeat,
+        'median_ms': round(statistics.median(totals), 3),
+        'min_ms': round(min(totals), 3),
+        'created_database': created_db,
+        'heaviest': [
+            {'package': name, 'cumulative_ms': round(us / 1000, 3)}
+            for name, us in heaviest[:top]
+        ],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--targets', nargs='+', choices=sorted(TARGETS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='baseline results JSON')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown ratio (default 0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    selected = args.targets or list(TARGETS)
+    results = {
+        'meta': {'python': platform.python_version(), 'repeat': args.repeat},
+        'results': {
+            name: measure(TARGETS[name], args.repeat, args.top)
+            for name in selected
+        },
+    }
+
+    status = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+        regressions = {}
+        for name, current in results['results'].items():
+            previous = baseline.get(name)
+            if not previous:
+                continue
+            ratio = current['median_ms'] / max(previous['median_ms'], 1e-9)
+            current['ratio'] = round(ratio, 3)
+            if ratio > 1 + args.threshold:
+                regressions[name] = current['ratio']
+        results['regressions'] = regressions
+        for name, ratio in regressions.items():
+            print(f"REGRESSION {name}: {ratio:.2f}x baseline",
+                  file=sys.stderr)
+        status = 1 if regressions else 0
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Measure login throughput (bcrypt verifications per second) per cost.
+
+Usage:
+    python benchmarks/bench_passwords.py --rounds 10 11 12 --logins 64
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.passwords import PasswordHasher, DEFAULT_WORKERS  # noqa: E402
+
+
+def bench_rounds(rounds, logins, workers):
+    hasher = PasswordHasher(rounds=rounds, max_workers=workers)
+    try:
+        password_hash = hasher.hash('benchmark-password')
+        start = time.perf_counter()
+        futures = [
+            hasher.submit_verify_and_update(
+                'benchmark-password', password_hash
+            )
+            for _ in range(logins)
+        ]
+        assert all(future.result()[0] for future in futures)
+        elapsed = time.perf_counter() - start
+    finally:
+        hasher.shutdown()
+    return {
+        'rounds': rounds,
+        'workers': workers,
+        'logins': logins,
+        'seconds': round(elapsed, 4),
+        'logins_per_second': round(logins / elapsed, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rounds', type=int, nargs='+',
+                        default=[10, 11, 12, 13])
+    parser.add_argument('--logins', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args(argv)
+
+    for rounds in args.rounds:
+        print(json.dumps(bench_rounds(rounds, args.logins, args.workers)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Build, update and query times of the related-posts index.
+
+Posts with random words from a few overlapping topics are inserted into a
+temporary database; the index is built by the first sync, then single
+edits are synced and top-k queries timed. Results are printed as JSON.
+
+Usage:
+    python benchmarks/bench_related.py --posts 100000 --queries 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from src.database import DEFAULT_SETTINGS, create_blog_engine  # noqa: E402
+from src.models import Base, Post, User  # noqa: E402
+from src.post_manager import PostManager  # noqa: E402
+from src.related_posts import RelatedIndex  # noqa: E402
+
+TOPICS = 50
+WORDS_PER_TOPIC = 200
+WORDS_PER_POST = 150
+
+
+def make_text(rng, topic):
+    # 話題の語彙と全体の語彙を混ぜる
+    return ' '.join(
+        f't{topic}w{rng.randrange(WORDS_PER_TOPIC)}' if rng.random() < 0.5
+        else f't{rng.randrange(TOPICS)}w{rng.randrange(WORDS_PER_TOPIC)}'
+        for _ in range(WORDS_PER_POST)
+    )
+
+
+def seed(engine, posts, rng):
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(User.__table__), [
+            {'id': 1, 'username': 'bench', 'password_hash': 'x'}
+        ])
+        connection.execute(insert(Post.__table__), [
+            {'id': i, 'title': f'Post {i}', 'user_id': 1,
+             'content': make_text(rng, i % TOPICS)}
+            for i in range(1, posts + 1)
+        ])
+
+
+def timed_ms(function):
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--posts', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--edits', type=int, default=50)
+    args = parser.parse_args(argv)
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings = dict(DEFAULT_SETTINGS,
+                        url=f"sqlite:///{os.path.join(directory, 'blog.db')}")
+        engine = create_blog_engine(settings)
+        seed(engine, args.posts, rng)
+        root = os.path.join(directory, 'related_index')
+        with sessionmaker(bind=engine)() as session:
+            index = RelatedIndex(root)
+            build_ms = timed_ms(lambda: index.sync(session))
+
+            reloaded = RelatedIndex(root)
+            load_ms = timed_ms(lambda: reloaded.sync(session))
+
+            edit_ms = []
+            for _ in range(args.edits):
+                post_id = rng.randrange(1, args.posts + 1)
+                PostManager.update_post(
+                    session, post_id, f'Edited {post_id}',
+                    make_text(rng, rng.randrange(TOPICS))
+                )
+                session.commit()
+                edit_ms.append(timed_ms(lambda: index.sync(session)))
+
+            # 編集直後の最初の検索は重み付きノルムを計算し直す
+            first_query_ms = timed_ms(lambda: index.related(session, 1))
+            query_ms = [
+                timed_ms(lambda: index.related(
+                    session, rng.randrange(1, args.posts + 1)
+                ))
+                for _ in range(args.queries)
+            ]
+            hits = index.related(session, 1)
+        engine.dispose()
+
+    print(json.dumps({
+        'posts': args.posts,
+        'build_s': round(build_ms / 1000, 2),
+        'load_ms': round(load_ms, 2),
+        'edit_sync_ms': round(statistics.median(edit_ms), 2),
+        'first_query_ms': round(first_query_ms, 2),
+        'query_ms_p50': round(statistics.median(query_ms), 2),
+        'query_ms_p95': round(
+            statistics.quantiles(query_ms, n=20)[-1], 2
+        ),
+        'same_topic': sum(
+            post_id % TOPICS == 1 for post_id, _ in hits
+        ),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare write throughput of direct commits and the group-commit queue.
+
+Usage:
+    python benchmarks/bench_write_queue.py --editors 1 4 16 --writes 50
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from src.database import DEFAULT_SETTINGS, create_blog_engine  # noqa: E402
+from src.models import Base, Post  # noqa: E402
+from src.write_queue import WriteQueue, run_write  # noqa: E402
+
+
+def bench(mode, editors, writes):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_blog_engine(dict(
+            DEFAULT_SETTINGS, url=f"sqlite:///{os.path.join(tmp, 'b.db')}",
+            pool_size=editors + 1,
+        ))
+        Base.metadata.create_all(engine)
+        SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+        writer = WriteQueue(SessionLocal) if mode == 'queue' else None
+        errors = []
+
+        def editor(number):
+            for i in range(writes):
+                with SessionLocal() as session:
+                    try:
+                        run_write(session, writer, lambda s: s.add(Post(
+                            title=f'{number}-{i}', content='benchmark'
+                        )))
+                    except Exception as error:
+                        errors.append(error)
+
+        threads = [
+            threading.Thread(target=editor, args=(n,)) for n in range(editors)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if writer is not None:
+            writer.stop()
+        engine.dispose()
+    total = editors * writes
+    return {
+        'mode': mode,
+        'editors': editors,
+        'writes': total,
+        'errors': len(errors),
+        'seconds': round(elapsed, 4),
+        'writes_per_second': round((total - len(errors)) / elapsed, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--editors', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--writes', type=int, default=50,
+                        help='writes per editor')
+    args = parser.parse_args(argv)
+
+    for editors in args.editors:
+        for mode in ('direct', 'queue'):
+            print(json.dumps(bench(mode, editors, args.writes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+import argparse
+import os
+import sys
+import time
+from sqlalchemy import bindparam, select, update
+from src import bulk_io
+from src.blob_store import get_blob_store
+from src.migrations import DERIVED_COLUMNS, LATEST_VERSION, migrate
+from src.models import (
+    Attachment, Post, get_engine, rebuild_archive, rebuild_search_index
+)
+from src.related_posts import get_related_index
+from src.rendering import render_post
+from src.static_site import DEFAULT_PAGE_SIZE, StaticSiteExporter
+
+BATCH_SIZE = 500
+BLOB_MIN_AGE = 3600
+
+
+def migrate_schema(args):
+    """Create or upgrade the database schema."""
+    version = migrate(get_engine())
+    print(f"Schema is at version {version} (latest {LATEST_VERSION})")
+
+
+def rebuild_search(args):
+    """Rebuild the full-text search index from the posts table."""
+    engine = get_engine()
+    migrate(engine)
+    with engine.begin() as connection:
+        rebuild_search_index(connection)
+    print("Search index rebuilt")
+
+
+def rebuild_archive_counts(args):
+    """Recount the monthly archive from the posts table."""
+    engine = get_engine()
+    migrate(engine)
+    with engine.begin() as connection:
+        rebuild_archive(connection)
+    print("Archive counts rebuilt")
+
+
+def sync_related(args):
+    """Apply changed posts to the related-posts index."""
+    engine = get_engine()
+    migrate(engine)
+    index = get_related_index()
+    if args.full:
+        index.reset()
+    with engine.connect() as connection:
+        applied = index.sync(connection)
+    print(f"Indexed {applied} changed posts")
+
+
+def gc_blobs(args):
+    """Delete stored images that no attachment references any more."""
+    engine = get_engine()
+    migrate(engine)
+    store = get_blob_store()
+    with engine.connect() as connection:
+        referenced = set(connection.execute(
+            select(Attachment.digest).distinct()
+        ).scalars())
+    # アップロード直後でまだコミットされていないファイルは残す
+    cutoff = time.time() - args.min_age
+    removed = 0
+    for digest in list(store.digests()):
+        if digest in referenced:
+            continue
+        if os.path.getmtime(store.path(digest)) > cutoff:
+            continue
+        store.remove(digest)
+        removed += 1
+    print(f"Removed {removed} unreferenced blobs")
+
+
+def backfill_html(args):
+    """Render HTML and excerpts for posts written before they existed."""
+    engine = get_engine()
+    # 古いデータベースには書き込み時に計算する列がない
+    migrate(engine)
+    posts = Post.__table__
+    total = 0
+    last_id = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(posts.c.id, posts.c.content).where(
+                    (posts.c.content_html.is_(None)
+                     | posts.c.excerpt.is_(None)),
+                    posts.c.id > last_id
+                ).order_by(posts.c.id).limit(args.batch_size)
+            ).all()
+            if not rows:
+                break
+            connection.execute(
+                update(posts).where(
+                    posts.c.id == bindparam('post_id')
+                ).values({
+                    name: bindparam(f'new_{name}') for name in DERIVED_COLUMNS
+                }),
+                [
+                    {'post_id': row.id} | {
+                        f'new_{name}': value
+                        for name, value in render_post(row.content).items()
+                    }
+                    for row in rows
+                ]
+            )
+        total += len(rows)
+        last_id = rows[-1].id
+        print(f"Rendered {total} posts")
+    print("Backfill finished")
+
+
+def detect_format(args, path):
+    if args.format:
+        return args.format
+    return 'csv' if path.endswith('.csv') else 'jsonl'
+
+
+def import_data(args):
+    """Stream users or posts from a JSONL/CSV file into the database."""
+    fmt = detect_format(args, args.input)
+    stream = (
+        sys.stdin if args.input == '-'
+        else open(args.input, newline='', encoding='utf-8')
+    )
+    try:
+        engine = get_engine()
+        migrate(engine)
+        total = bulk_io.import_records(
+            engine, args.kind, bulk_io.read_records(stream, fmt),
+            batch_size=args.batch_size,
+            progress=bulk_io.report_progress(args.kind),
+            workers=args.workers,
+        )
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    print(f"Imported {total} {args.kind}", file=sys.stderr)
+
+
+def export_data(args):
+    """Stream users or posts from the database to a JSONL/CSV file."""
+    fmt = detect_format(args, args.output)
+    stream = (
+        sys.stdout if args.output == '-'
+        else open(args.output, 'w', newline='', encoding='utf-8')
+    )
+    try:
+        total = bulk_io.write_records(
+            stream, fmt, args.kind,
+            bulk_io.export_records(get_engine(), args.kind, args.batch_size)
+        )
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    print(f"Exported {total} {args.kind}", file=sys.stderr)
+
+
+def export_site(args):
+    """Write the posts as static HTML pages with an Atom feed."""
+    engine = get_engine()
+    migrate(engine)
+    exporter = StaticSiteExporter(
+        engine, args.output_dir, page_size=args.page_size,
+        base_url=args.base_url
+    )
+    written = exporter.export(full=args.full)
+    print(f"Wrote {len(written)} files, removed {len(exporter.removed)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Blog maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser(
+        "migrate", help="create or upgrade the database schema"
+    ).set_defaults(func=migrate_schema)
+
+    commands.add_parser(
+        "rebuild-search", help="rebuild the full-text search index"
+    ).set_defaults(func=rebuild_search)
+
+    commands.add_parser(
+        "rebuild-archive", help="recount the monthly archive"
+    ).set_defaults(func=rebuild_archive_counts)
+
+    related = commands.add_parser(
+        "sync-related",
+        help="apply changed posts to the related-posts index "
+             "(stop the app first with --full)"
+    )
+    related.add_argument(
+        "--full", action="store_true", help="re-read every post"
+    )
+    related.set_defaults(func=sync_related)
+
+    gc = commands.add_parser(
+        "gc-blobs", help="delete images no post refers to"
+    )
+    gc.add_argument(
+        "--min-age", type=int, default=BLOB_MIN_AGE,
+        help="keep files younger than this many seconds"
+    )
+    gc.set_defaults(func=gc_blobs)
+
+    backfill = commands.add_parser(
+        "backfill-html",
+        help="render stored HTML and excerpts for existing posts"
+    )
+    backfill.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    backfill.set_defaults(func=backfill_html)
+
+    site = commands.add_parser(
+        "export-site",
+        help="write changed posts as static HTML pages and an Atom feed"
+    )
+    site.add_argument("output_dir")
+    site.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    site.add_argument(
+        "--base-url", default="",
+        help="absolute URL of output_dir, used for Atom links"
+    )
+    site.add_argument(
+        "--full", action="store_true", help="rewrite every file"
+    )
+    site.set_defaults(func=export_site)
+
+    for name, func, path in (
+        ("import", import_data, "input"),
+        ("export", export_data, "output"),
+    ):
+        command = commands.add_parser(
+            name, help=f"{name} users or posts as JSONL/CSV"
+        )
+        command.add_argument("kind", choices=sorted(bulk_io.TABLES))
+        command.add_argument(
+            path, nargs="?", default="-", help="file path, '-' for stdio"
+        )
+        command.add_argument("--format", choices=("jsonl", "csv"))
+        command.add_argument(
+            "--batch-size", type=int, default=bulk_io.DEFAULT_BATCH_SIZE
+        )
+        if name == "import":
+            command.add_argument(
+                "--workers", type=int, default=os.cpu_count(),
+                help="processes used to render post Markdown"
+            )
+        command.set_defaults(func=func)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
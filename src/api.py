@@ -0,0 +1,174 @@
+import dataclasses
+import datetime
+import json
+import tornado.web
+from sqlalchemy.orm import Session
+from src.blob_store import get_blob_store
+from src.feed_cache import FeedCache
+from src.models import Post, content_version
+from src.post_repository import PostRepository
+from src.static_site import FEED_SIZE, post_bodies, post_select, render_atom
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+RESPONSE_CACHE_SIZE = 1024
+BLOB_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+BLOB_PATH = r'([0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(?:\.w[0-9]+\.webp)?)'
+
+
+def encode_cursor(row):
+    return f'{row.created_at.isoformat()}_{row.id}'
+
+
+def decode_cursor(cursor):
+    """Parse a cursor from encode_cursor, or raise ValueError."""
+    created_at, post_id = cursor.rsplit('_', 1)
+    return datetime.datetime.fromisoformat(created_at), int(post_id)
+
+
+def _post_json(row):
+    data = dataclasses.asdict(row)
+    data['created_at'] = row.created_at.isoformat()
+    return data
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    """
+    Read-only handler with conditional GET on the blog content version.
+
+    The version row is advanced by database triggers on every post or
+    author change, so one cheap query per request decides whether a
+    client's copy is still valid. Bodies are cached per version.
+    """
+    content_type = 'application/json; charset=utf-8'
+
+    def initialize(self, engine, cache):
+        self.engine = engine
+        self.cache = cache
+
+    def prepare(self):
+        with self.engine.connect() as connection:
+            self.version, self.modified = content_version(connection)
+        self.set_header('Content-Type', self.content_type)
+        # クライアントは毎回再検証する (変更がなければ304で本文なし)
+        self.set_header('Cache-Control', 'public, no-cache')
+        self.set_etag_header()
+        if self.modified is not None:
+            self.set_header('Last-Modified', self.modified)
+        if self.not_modified():
+            self.set_status(304)
+            self.finish()
+
+    def compute_etag(self):
+        # gzipの有無で本文のバイト列が変わるため弱いETagにする
+        return f'W/"{self.version}"'
+
+    def not_modified(self):
+        if self.request.headers.get('If-None-Match'):
+            return self.check_etag_header()
+        since = self.request.headers.get('If-Modified-Since')
+        if since and self.modified is not None:
+            try:
+                since = datetime.datetime.strptime(
+                    since, '%a, %d %b %Y %H:%M:%S GMT'
+                )
+            except ValueError:
+                return False
+            return self.modified <= since
+        return False
+
+    def cached(self, key, loader):
+        return self.cache.get_or_load((self.version, key), loader)
+
+    def write_error(self, status_code, **kwargs):
+        self.set_header('Content-Type', 'application/json; charset=utf-8')
+        self.clear_header('ETag')
+        self.clear_header('Last-Modified')
+        self.finish(json.dumps({'error': self._reason}))
+
+
+class PostsHandler(BaseHandler):
+    """GET /posts?limit=&cursor= — one keyset page, newest first."""
+
+    def get(self):
+        try:
+            limit = int(self.get_argument('limit', DEFAULT_PAGE_SIZE))
+            cursor = self.get_argument('cursor', None)
+            cursor = decode_cursor(cursor) if cursor else None
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason='Invalid limit or cursor')
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        self.write(self.cached(('posts', limit, cursor),
+                               lambda: self.load(limit, cursor)))
+
+    def load(self, limit, cursor):
+        with Session(self.engine) as session:
+            rows, has_older = PostRepository(session).feed_page(limit, cursor)
+        return json.dumps({
+            'posts': [_post_json(row) for row in rows],
+            'next_cursor': encode_cursor(rows[-1]) if has_older else None,
+        })
+
+
+class PostHandler(BaseHandler):
+    """GET /posts/<id> — one post with its rendered HTML body."""
+
+    def get(self, post_id):
+        body = self.cached(('post', int(post_id)),
+                           lambda: self.load(int(post_id)))
+        if body is None:
+            raise tornado.web.HTTPError(404, reason='Post not found')
+        self.write(body)
+
+    def load(self, post_id):
+        with Session(self.engine) as session:
+            repository = PostRepository(session)
+            row = repository.get_post(post_id)
+            if row is None:
+                return None
+            data = _post_json(row)
+            data['content_html'] = repository.post_body(post_id)
+        return json.dumps(data)
+
+
+class FeedHandler(BaseHandler):
+    """GET /feed.atom — Atom feed of the newest posts."""
+    content_type = 'application/atom+xml; charset=utf-8'
+
+    def get(self):
+        base_url = f'{self.request.protocol}://{self.request.host}/'
+        self.write(self.cached(('feed', base_url),
+                               lambda: self.load(base_url)))
+
+    def load(self, base_url):
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                post_select().order_by(
+                    Post.created_at.desc(), Post.id.desc()
+                ).limit(FEED_SIZE)
+            ).all()
+            bodies = post_bodies(connection, [row.id for row in rows])
+        return render_atom(rows, bodies, base_url,
+                           post_path=lambda post_id: f'posts/{post_id}',
+                           feed_path='feed.atom')
+
+
+class BlobHandler(tornado.web.StaticFileHandler):
+    """GET /blobs/<key> — stored images and their resized variants."""
+
+    def set_extra_headers(self, path):
+        # ファイル名が内容のハッシュなので、同じURLの中身は変わらない
+        self.set_header('Cache-Control', BLOB_CACHE_CONTROL)
+
+
+def make_app(engine, cache=None, blob_root=None, **settings):
+    """Build the read-only API application for engine."""
+    options = {'engine': engine,
+               'cache': cache or FeedCache(RESPONSE_CACHE_SIZE)}
+    return tornado.web.Application([
+        (r'/posts', PostsHandler, options),
+        (r'/posts/([0-9]+)', PostHandler, options),
+        (r'/feed\.atom', FeedHandler, options),
+        (r'/blobs/' + BLOB_PATH, BlobHandler,
+         {'path': blob_root or get_blob_store().root}),
+    ], compress_response=True, **settings)
@@ -1,15 +1,27 @@
+import logging
 import streamlit as st
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
 from src.models import User
 import os
+from src.instrumentation import timed
 from src.interface import AuthInterface
+from src.passwords import hasher
+from src.principals import Principal, principal_store
+from src.user_deletion import TOMBSTONE_USERNAME
+from src.write_queue import WriteQueueFull, run_write
+
+logger = logging.getLogger('blog.auth')
 
 
 class AuthManager(AuthInterface):
     """
     Class for managing auhtntification
     """
-    def __init__(self, session):
+    def __init__(self, session, writer=None, principals=None):
         self.session = session
+        self.writer = writer
+        self.principals = principals or principal_store
         self.admin_password = self.load_admin_password()
 
     def load_admin_password(self):
@@ -35,6 +47,9 @@ class AuthManager(AuthInterface):
         ):
             st.error("All fields are required")
             return False
+        if username == TOMBSTONE_USERNAME:
+            st.error("This username is reserved")
+            return False
         return True
 
     def check_existing_user(self, username):
@@ -48,17 +63,57 @@ class AuthManager(AuthInterface):
 
     def create_user(self, username, password):
         """Create a new user and save it to the database."""
-        new_user = User(
-            username=username,
-            password_hash=User.hash_password(password),
-            is_admin=True
-        )
-        self.session.add(new_user)
-        self.session.commit()
+        # ハッシュ計算は書き込みキューの外で行う
+        password_hash = User.hash_password(password)
+
+        def add_user(session):
+            new_user = User(
+                username=username,
+                password_hash=password_hash,
+                is_admin=True
+            )
+            session.add(new_user)
+            session.flush()
+            return Principal.from_user(new_user)
+
+        try:
+            principal = run_write(self.session, self.writer, add_user)
+        except WriteQueueFull:
+            st.error("The server is busy, please try again.")
+            return
+        except TimeoutError:
+            st.error("Saving is taking longer than usual, "
+                     "please reload the page in a moment.")
+            return
         st.success("User registered successfully!")
-        st.session_state['user'] = new_user
+        self.sign_in(principal)
         st.rerun()
 
+    def sign_in(self, principal):
+        """Keep only a signed token for principal in the session."""
+        st.session_state['auth_token'] = self.principals.issue(principal)
+        st.session_state['user'] = principal
+
+    def authenticate(self):
+        """
+        Set st.session_state['user'] to the Principal of the session's
+        token, or None. Runs at the start of every rerun.
+        """
+        token = st.session_state.get('auth_token')
+        principal = None
+        if token:
+            principal = self.principals.resolve(token, self.session)
+            if principal is None:
+                # 削除されたユーザーや期限切れのトークン
+                del st.session_state['auth_token']
+        st.session_state['user'] = principal
+        return principal
+
+    def logout(self):
+        st.session_state.pop('auth_token', None)
+        st.session_state['user'] = None
+
+    @timed
     def register(self):
         """Main method to handle user registration."""
         username, password, admin_password = self.get_user_input()
@@ -71,18 +126,44 @@ class AuthManager(AuthInterface):
             else:
                 self.create_user(username, password)
 
+    @timed
     def login(self):
         st.title("Login")
         username = st.text_input("Username")
         password = st.text_input("Password", type="password")
 
         if st.button("Login"):
-            user = self.session.query(User).filter(
-                User.username == username
+            user = self.session.execute(
+                select(User.id, User.username, User.is_admin,
+                       User.password_hash)
+                .where(User.username == username)
             ).first()
-            if user and user.verify_password(password):
-                st.session_state['user'] = user
+            valid, new_hash = (False, None)
+            if user:
+                valid, new_hash = hasher.verify_and_update(
+                    password, user.password_hash
+                )
+            if valid:
+                if new_hash:
+                    self.upgrade_hash(user.id, user.password_hash, new_hash)
+                self.sign_in(Principal.from_user(user))
                 st.success("Logged in successfully!")
                 st.rerun()
             else:
                 st.error("Invalid username or password")
+
+    def upgrade_hash(self, user_id, old_hash, new_hash):
+        """
+        Store a hash made with the current cost. A failed write only
+        delays the upgrade to the next login.
+        """
+        # パスワードが変更されていれば上書きしない
+        statement = update(User).where(
+            User.id == user_id, User.password_hash == old_hash
+        ).values(password_hash=new_hash)
+        try:
+            run_write(self.session, self.writer,
+                      lambda session: session.execute(statement))
+        except (WriteQueueFull, TimeoutError, SQLAlchemyError):
+            logger.warning("Could not upgrade the password hash of user %d",
+                           user_id, exc_info=True)
@@ -0,0 +1,168 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('blog.blob_store')
+
+CHUNK_SIZE = 1 << 16
+# レスポンシブ表示用の幅。フィードは最小のものだけを使う
+VARIANT_WIDTHS = (320, 640, 1280)
+THUMBNAIL_WIDTH = VARIANT_WIDTHS[0]
+VARIANT_FORMAT = 'webp'
+DEFAULT_WORKERS = min(2, os.cpu_count() or 1)
+
+_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+
+class BlobStore:
+    """
+    Content-addressed file store for uploaded images.
+
+    A file is named by the SHA-256 of its bytes under root/ab/cd/, so the
+    same upload is stored once however many posts use it, and a stored
+    file never changes. Resized WebP variants are written next to it by a
+    small worker pool; the database only keeps digests.
+    """
+    def __init__(self, root, max_workers=None):
+        self.root = root
+        self.max_workers = max_workers or int(
+            os.getenv('BLOG_IMAGE_WORKERS', DEFAULT_WORKERS)
+        )
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='image-variants',
+                )
+            return self._executor
+
+    @staticmethod
+    def key(digest, width=None):
+        """
+        Return the '/'-separated location of a blob or of one of its
+        variants relative to the root, e.g. for building URLs.
+        """
+        if not _DIGEST.match(digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        name = digest if width is None else (
+            f'{digest}.w{width}.{VARIANT_FORMAT}'
+        )
+        return f'{digest[:2]}/{digest[2:4]}/{name}'
+
+    def path(self, digest, width=None):
+        """Return the file path of a blob or of one of its variants."""
+        return os.path.join(self.root, *self.key(digest, width).split('/'))
+
+    def digests(self):
+        """Yield the digest of every stored blob."""
+        for _, _, names in os.walk(self.root):
+            for name in names:
+                if _DIGEST.match(name):
+                    yield name
+
+    def remove(self, digest):
+        """Delete a blob together with its variants."""
+        for width in (None, *VARIANT_WIDTHS):
+            try:
+                os.remove(self.path(digest, width))
+            except FileNotFoundError:
+                pass
+
+    def put(self, stream):
+        """
+        Copy a binary stream into the store; return (digest, size).
+
+        The data is hashed while it is written to a temporary file in the
+        store, which is then renamed into place, so a partially written
+        blob is never visible.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        sha256 = hashlib.sha256()
+        size = 0
+        fd, temporary = tempfile.mkstemp(dir=self.root, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    sha256.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            digest = sha256.hexdigest()
+            path = self.path(digest)
+            if os.path.exists(path):
+                # 同じ内容はすでに保存済み
+                os.remove(temporary)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return digest, size
+
+    def variant(self, digest, width):
+        """Return the path of a variant if it has been generated."""
+        path = self.path(digest, width)
+        return path if os.path.exists(path) else None
+
+    def make_variants(self, digest):
+        """Write the missing resized variants of one image; return them."""
+        from PIL import Image, ImageOps
+
+        written = []
+        with Image.open(self.path(digest)) as image:
+            image = ImageOps.exif_transpose(image)
+            for width in VARIANT_WIDTHS:
+                path = self.path(digest, width)
+                if os.path.exists(path):
+                    continue
+                resized = image.copy()
+                # 元画像より大きくはしない
+                resized.thumbnail((width, width * 4))
+                if resized.mode not in ('RGB', 'RGBA'):
+                    resized = resized.convert('RGBA')
+                temporary = path + '.tmp'
+                resized.save(temporary, VARIANT_FORMAT, quality=80)
+                os.replace(temporary, path)
+                written.append(path)
+        return written
+
+    def submit_variants(self, digest):
+        """Generate the variants in the background; return the Future."""
+        future = self.executor.submit(self.make_variants, digest)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error("Generating image variants failed: %s", error)
+
+
+_blob_store = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """Return the process-wide store rooted at BLOG_BLOB_DIR."""
+    global _blob_store
+    with _blob_store_lock:
+        if _blob_store is None:
+            _blob_store = BlobStore(os.getenv('BLOG_BLOB_DIR', 'blobs'))
+        return _blob_store
@@ -1,41 +1,86 @@
+import json
+import os
 import streamlit as st
-from src.post_manager import PostManager
+from src.post_manager import DEFAULT_PAGE_SIZE, PostManager
 from src.auth_manager import AuthManager
+from src.feed_cache import feed_cache
+from src.instrumentation import timed
+from src.write_queue import get_write_queue
 
 
 class BlogApp:
     def __init__(self, session):
         self.session = session
-        self.auth_manager = AuthManager(session)
-        self.post_manager = PostManager(session)
+        writer = get_write_queue()
+        self.auth_manager = AuthManager(session, writer=writer)
+        self.post_manager = PostManager(
+            session,
+            page_size=int(os.getenv('BLOG_PAGE_SIZE', DEFAULT_PAGE_SIZE)),
+            cache=feed_cache, writer=writer
+        )
 
-        if 'user' not in st.session_state:
-            st.session_state['user'] = None
         if 'edit' not in st.session_state:
             st.session_state['edit'] = None
 
+    @timed
     def run(self):
+        # セッションにはトークンだけを持ち、ユーザーは毎回キャッシュから引く
+        self.auth_manager.authenticate()
+        # ?post=<id> で個別ページを表示する
+        post_id = st.query_params.get("post")
+        if post_id and post_id.isdigit():
+            self.post_manager.show_post(int(post_id))
+            return
+
         if st.session_state['user']:
             st.sidebar.write(
                 f"Logged in as {st.session_state['user'].username}"
             )
             login_option = st.sidebar.radio(
-                "Edit/Logout/Manage Users", ("Edit", "Manage Users")
+                "Edit/Logout/Manage Users", ("Edit", "Search", "Manage Users")
             )
             if login_option == "Edit":
                 self.post_manager.show_posts()
+            if login_option == "Search":
+                self.post_manager.search_posts()
             if login_option == "Manage Users":
                 self.post_manager.manage_users()
             if st.sidebar.button("Logout"):
-                st.session_state['user'] = None
+                self.auth_manager.logout()
                 st.rerun()
+            if st.session_state['user'].is_admin:
+                self.show_instrumentation()
         else:
             login_option = st.sidebar.radio(
-                "Login/Register", ("Reader", "Login", "Register")
+                "Login/Register", ("Reader", "Search", "Login", "Register")
             )
-            if login_option == "Login":
+            if login_option == "Search":
+                self.post_manager.search_posts()
+            elif login_option == "Login":
                 self.auth_manager.login()
             elif login_option == "Register":
                 self.auth_manager.register()
             else:
                 self.post_manager.show_posts()
+
+    def show_instrumentation(self):
+        """Sidebar panel with the SQL and timing stats of the last rerun."""
+        stats = st.session_state.get('rerun_stats')
+        if not stats:
+            return
+        with st.sidebar.expander("Performance (last rerun)"):
+            st.write(
+                f"{stats['wall_ms']} ms total, {stats['queries']} queries, "
+                f"{stats['db_ms']} ms in DB, {stats['rows']} rows"
+            )
+            st.dataframe([
+                {'name': name, **timing}
+                for name, timing in stats['timings'].items()
+            ])
+            for query in stats['slowest']:
+                st.caption(f"{query['ms']} ms")
+                st.code(query['statement'], language='sql')
+            st.download_button(
+                "Export JSON", json.dumps(stats),
+                file_name="rerun_stats.json", mime="application/json"
+            )
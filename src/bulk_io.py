@@ -0,0 +1,170 @@
+import csv
+import datetime
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from sqlalchemy import insert, select
+from src.models import User, Post
+from src.rendering import render_post
+
+DEFAULT_BATCH_SIZE = 5000
+
+# インポート/エクスポート対象の列 (パスワードハッシュはそのまま移行する)
+TABLES = {
+    'users': (User.__table__, ('id', 'username', 'password_hash', 'is_admin')),
+    'posts': (Post.__table__, ('id', 'title', 'content', 'created_at',
+                               'user_id')),
+}
+
+
+def _to_json(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def _parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+def _parse_int(value):
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+def _parse_datetime(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(value)
+
+
+_PARSERS = {
+    'id': _parse_int,
+    'user_id': _parse_int,
+    'is_admin': _parse_bool,
+    'created_at': _parse_datetime,
+}
+
+
+def read_records(stream, fmt):
+    """Yield dicts from a JSONL or CSV stream, one line at a time."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def prepare_record(kind, record):
+    """Convert an input record into insert parameters for the table."""
+    _, columns = TABLES[kind]
+    params = {
+        name: _PARSERS.get(name, lambda v: v)(record.get(name))
+        for name in columns
+    }
+    if params.get('id') is None:
+        params.pop('id')
+    if kind == 'posts':
+        if params['created_at'] is None:
+            params['created_at'] = datetime.datetime.utcnow()
+        params.update(render_post(params['content']))
+    return params
+
+
+def import_records(engine, kind, records, batch_size=DEFAULT_BATCH_SIZE,
+                   progress=None, workers=None):
+    """
+    Insert records in chunked transactions with executemany.
+
+    Each chunk of batch_size rows is one INSERT executed with many
+    parameter sets and committed on its own, so memory stays bounded and
+    an interrupted import keeps the chunks already written. Rendering post
+    Markdown dominates the cost, so with workers > 1 it runs on a process
+    pool. Returns the number of rows inserted.
+    """
+    pool = None
+    if kind == 'posts' and workers and workers > 1:
+        pool = ProcessPoolExecutor(workers)
+    try:
+        return _import_chunks(
+            engine, kind, iter(records), batch_size, progress, pool
+        )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def _import_chunks(engine, kind, records, batch_size, progress, pool):
+    table, _ = TABLES[kind]
+    prepare = partial(prepare_record, kind)
+    total = 0
+    while True:
+        raw = list(islice(records, batch_size))
+        if not raw:
+            return total
+        if pool is None:
+            chunk = [prepare(record) for record in raw]
+        else:
+            chunk = list(pool.map(
+                prepare, raw, chunksize=max(1, batch_size // 64)
+            ))
+        # idの有無で列が揃わないとexecutemanyにできないため分ける
+        with engine.begin() as connection:
+            with_id = [params for params in chunk if 'id' in params]
+            without_id = [params for params in chunk if 'id' not in params]
+            for group in (with_id, without_id):
+                if group:
+                    connection.execute(insert(table), group)
+        total += len(chunk)
+        if progress:
+            progress(total)
+
+
+def export_records(engine, kind, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yield every row of the table as a dict, ordered by id.
+
+    Rows are streamed with a server-side cursor in batches of batch_size,
+    so the table is never held in memory.
+    """
+    table, columns = TABLES[kind]
+    stmt = select(*[table.c[name] for name in columns]).order_by(table.c.id)
+    with engine.connect() as connection:
+        result = connection.execution_options(
+            stream_results=True, yield_per=batch_size
+        ).execute(stmt)
+        for row in result:
+            yield {name: _to_json(value)
+                   for name, value in row._mapping.items()}
+
+
+def write_records(stream, fmt, kind, records):
+    """Write records as JSONL or CSV and return how many were written."""
+    _, columns = TABLES[kind]
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=columns)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    else:
+        for record in records:
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def report_progress(kind):
+    """Return a callback printing import progress to stderr."""
+    def progress(total):
+        print(f"Imported {total} {kind}", file=sys.stderr)
+    return progress
@@ -0,0 +1,135 @@
+import os
+import tomllib
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+
+# 環境変数 (BLOG_DB_<KEY>) または secrets.toml の [Database] で上書きできる
+DEFAULT_SETTINGS = {
+    'url': 'sqlite:///blog.db',
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,       # 負の値はKiB単位 (約20MB)
+    'mmap_size': 268435456,     # 256MB
+    'busy_timeout': 5000,       # ミリ秒
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_timeout': 30,
+    'pool_recycle': 3600,
+}
+
+SQLITE_PRAGMAS = (
+    'journal_mode', 'synchronous', 'cache_size', 'mmap_size',
+    'busy_timeout', 'temp_store', 'foreign_keys',
+)
+
+
+# Streamlitと同じ場所のsecrets.tomlを読む (後に読んだ方が優先)
+SECRETS_PATHS = (
+    os.path.join(os.path.expanduser('~'), '.streamlit', 'secrets.toml'),
+    os.path.join(os.getcwd(), '.streamlit', 'secrets.toml'),
+)
+
+
+def load_secrets(paths=SECRETS_PATHS):
+    """
+    Read the optional [Database] section of the Streamlit secrets.
+
+    The files are parsed directly so that scripts such as manage.py do not
+    need to import streamlit.
+    """
+    secrets = {}
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                secrets.update(tomllib.load(f).get('Database', {}))
+    return secrets
+
+
+def load_settings(secrets=None, environ=None):
+    """
+    Build the database settings.
+
+    Environment variables take precedence over secrets, which take
+    precedence over DEFAULT_SETTINGS. Values are converted to the type of
+    the default.
+    """
+    secrets = load_secrets() if secrets is None else secrets
+    environ = os.environ if environ is None else environ
+    settings = dict(DEFAULT_SETTINGS)
+    for key, default in DEFAULT_SETTINGS.items():
+        value = environ.get(f'BLOG_DB_{key.upper()}', secrets.get(key))
+        if value is not None:
+            settings[key] = type(default)(value)
+    return settings
+
+
+def set_sqlite_pragmas(dbapi_connection, settings):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {pragma}={settings[pragma]}")
+    finally:
+        cursor.close()
+
+
+def create_blog_engine(settings=None):
+    """
+    Create the application engine.
+
+    For SQLite every pooled connection gets the configured pragmas (WAL by
+    default, so readers are not blocked by writers) and connections may be
+    shared across Streamlit script threads. In-memory databases use a single
+    static connection.
+
+    Transactions are begun by SQLAlchemy rather than pysqlite (the
+    documented SAVEPOINT workaround), so nested transactions stay inside
+    the outer one and only its COMMIT makes them durable.
+    """
+    settings = load_settings() if settings is None else settings
+    url = make_url(settings['url'])
+    if url.get_backend_name() != 'sqlite':
+        return create_engine(
+            url,
+            pool_size=settings['pool_size'],
+            max_overflow=settings['max_overflow'],
+            pool_timeout=settings['pool_timeout'],
+            pool_recycle=settings['pool_recycle'],
+            pool_pre_ping=True,
+        )
+
+    if url.database in (None, '', ':memory:'):
+        engine = create_engine(
+            url,
+            connect_args={'check_same_thread': False},
+            poolclass=StaticPool,
+        )
+    else:
+        engine = create_engine(
+            url,
+            connect_args={
+                'check_same_thread': False,
+                'timeout': settings['busy_timeout'] / 1000,
+            },
+            pool_size=settings['pool_size'],
+            max_overflow=settings['max_overflow'],
+            pool_timeout=settings['pool_timeout'],
+            pool_recycle=settings['pool_recycle'],
+        )
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        set_sqlite_pragmas(dbapi_connection, settings)
+        # pysqlite自身のトランザクション管理を止める。そのままでは
+        # SAVEPOINTが暗黙のトランザクションを始め、RELEASEでコミットされる
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def _on_begin(connection):
+        # sqlite_begin='IMMEDIATE' の接続は最初から書き込みロックを取る
+        mode = connection.get_execution_options().get('sqlite_begin', '')
+        connection.exec_driver_sql(f"BEGIN {mode}".strip())
+
+    return engine
@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAXSIZE = 256
+
+
+class FeedCache:
+    """
+    Process-wide LRU cache of feed data shared by all Streamlit sessions.
+
+    Entries are keyed by the current content version, so bumping the version
+    after a write makes every older entry unreachable; they then age out of
+    the LRU order.
+    """
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._version = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._version
+
+    def bump(self):
+        """Mark the blog content as changed."""
+        with self._lock:
+            self._version += 1
+            return self._version
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, calling loader() on a miss.
+
+        The loader runs outside the lock so a slow query does not block
+        readers of other pages.
+        """
+        with self._lock:
+            full_key = (self._version, key)
+            if full_key in self._entries:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return self._entries[full_key]
+            self.misses += 1
+
+        value = loader()
+        with self._lock:
+            self._entries[full_key] = value
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self._version,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# 全セッションで共有するキャッシュ
+feed_cache = FeedCache()
@@ -0,0 +1,169 @@
+import contextvars
+import functools
+import heapq
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+
+logger = logging.getLogger('blog.instrumentation')
+
+SLOWEST_STATEMENTS = 5
+
+# 実行中の再実行の統計 (無効時・再実行外ではNone)
+_current = contextvars.ContextVar('blog_rerun_stats', default=None)
+_enabled = False
+
+
+class RerunStats:
+    """
+    SQL and timing figures collected during one Streamlit rerun.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall_ms = None
+        self.queries = 0
+        self.db_ms = 0.0
+        self.rows = 0
+        self.slowest = []  # (ms, statement) の最小ヒープ
+        self.timings = {}  # name -> [calls, total_ms]
+
+    def record_query(self, statement, elapsed_ms):
+        self.queries += 1
+        self.db_ms += elapsed_ms
+        entry = (elapsed_ms, statement)
+        if len(self.slowest) < SLOWEST_STATEMENTS:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def record_timing(self, name, elapsed_ms):
+        timing = self.timings.setdefault(name, [0, 0.0])
+        timing[0] += 1
+        timing[1] += elapsed_ms
+
+    def finish(self):
+        self.wall_ms = (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self):
+        return {
+            'wall_ms': round(self.wall_ms or 0.0, 3),
+            'queries': self.queries,
+            'db_ms': round(self.db_ms, 3),
+            'rows': self.rows,
+            'slowest': [
+                {'ms': round(ms, 3), 'statement': statement}
+                for ms, statement in sorted(self.slowest, reverse=True)
+            ],
+            'timings': {
+                name: {'calls': calls, 'total_ms': round(total, 3)}
+                for name, (calls, total) in sorted(self.timings.items())
+            },
+        }
+
+
+def is_enabled():
+    return _enabled
+
+
+def current_stats():
+    return _current.get()
+
+
+def _count_row(cursor, row):
+    stats = _current.get()
+    if stats is not None:
+        stats.rows += 1
+    return row
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    if _current.get() is None:
+        return
+    conn.info.setdefault('blog_query_start', []).append(time.perf_counter())
+    # sqlite3では行ごとに呼ばれるrow_factoryで返却行数を数える
+    if hasattr(cursor, 'row_factory'):
+        cursor.row_factory = _count_row
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    stats = _current.get()
+    starts = conn.info.get('blog_query_start')
+    if stats is None or not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    stats.record_query(statement, elapsed_ms)
+    if cursor.description is None and cursor.rowcount > 0:
+        # INSERT/UPDATE/DELETE は影響行数を数える
+        stats.rows += cursor.rowcount
+
+
+def enable(engine):
+    """
+    Attach the cursor hooks to the engine and start collecting stats.
+
+    Nothing is attached until this is called, so a disabled app pays no
+    per-query cost.
+    """
+    global _enabled
+    if not event.contains(engine, 'before_cursor_execute',
+                          _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    _enabled = True
+
+
+def disable(engine):
+    global _enabled
+    if event.contains(engine, 'before_cursor_execute',
+                      _before_cursor_execute):
+        event.remove(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.remove(engine, 'after_cursor_execute', _after_cursor_execute)
+    _enabled = False
+
+
+def configure(engine):
+    """Enable instrumentation when BLOG_INSTRUMENTATION is set."""
+    if os.getenv('BLOG_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes'):
+        enable(engine)
+
+
+@contextmanager
+def rerun():
+    """
+    Collect stats for one rerun and log them as a JSON line at the end.
+
+    Yields the RerunStats, or None when instrumentation is disabled.
+    """
+    if not _enabled:
+        yield None
+        return
+    stats = RerunStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        stats.finish()
+        logger.info(json.dumps(stats.as_dict()))
+
+
+def timed(func):
+    """Record the wall-clock time of func in the current rerun's stats."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = _current.get()
+        if stats is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.record_timing(name, (time.perf_counter() - start) * 1000)
+    return wrapper
@@ -0,0 +1,195 @@
+import logging
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text
+from src.models import (
+    Attachment, Base, DraftChange, Post, PostRevision, Tag, User,
+    content_version_table, create_archive_counts, create_attachment_cleanup,
+    create_content_version, create_related_index_changes,
+    create_revision_cleanup, create_search_index, create_tag_counts,
+    create_tag_image_versioning,
+    post_archive, post_index_changes, post_tags, rebuild_archive,
+    rebuild_search_index
+)
+
+logger = logging.getLogger('blog.migrations')
+
+# 書き込み時に計算する列 (古いデータベースには存在しない)
+DERIVED_COLUMNS = {
+    'content_html': 'TEXT',
+    'excerpt': 'TEXT',
+    'word_count': 'INTEGER',
+    'reading_time': 'INTEGER',
+}
+
+
+def _add_missing_columns(connection, table, columns):
+    existing = {c['name'] for c in inspect(connection).get_columns(table)}
+    for name, type_ in columns.items():
+        if name not in existing:
+            connection.execute(
+                text(f"ALTER TABLE {table} ADD COLUMN {name} {type_}")
+            )
+
+
+def _derived_columns_and_indexes(connection):
+    """Bring a pre-versioning database up to the version 1 schema."""
+    # 当時からあるテーブルだけを作る。後のテーブルやトリガーはそれぞれの
+    # 手順で作成する (metadata.create_all は全部を作ってしまう)
+    User.__table__.create(connection, checkfirst=True)
+    _add_missing_columns(connection, 'posts', DERIVED_COLUMNS)
+    for index in Post.__table__.indexes:
+        index.create(connection, checkfirst=True)
+    if connection.dialect.name == 'sqlite':
+        # 既存の投稿もここで索引される
+        create_search_index(connection)
+
+
+def _post_updated_at(connection):
+    _add_missing_columns(connection, 'posts', {'updated_at': 'DATETIME'})
+    connection.execute(text(
+        "UPDATE posts SET updated_at = created_at WHERE updated_at IS NULL"
+    ))
+
+
+def _content_version(connection):
+    content_version_table.create(connection, checkfirst=True)
+    if connection.dialect.name == 'sqlite':
+        create_content_version(connection)
+
+
+def _tags(connection):
+    Tag.__table__.create(connection, checkfirst=True)
+    post_tags.create(connection, checkfirst=True)
+    if connection.dialect.name == 'sqlite':
+        create_tag_counts(connection)
+
+
+def _archive(connection):
+    post_archive.create(connection, checkfirst=True)
+    if connection.dialect.name == 'sqlite':
+        create_archive_counts(connection)
+        rebuild_archive(connection)
+
+
+def _attachments(connection):
+    Attachment.__table__.create(connection, checkfirst=True)
+    if connection.dialect.name == 'sqlite':
+        create_attachment_cleanup(connection)
+
+
+def _revisions(connection):
+    PostRevision.__table__.create(connection, checkfirst=True)
+    DraftChange.__table__.create(connection, checkfirst=True)
+    if connection.dialect.name == 'sqlite':
+        create_revision_cleanup(connection)
+
+
+def _related_index(connection):
+    post_index_changes.create(connection, checkfirst=True)
+    if connection.dialect.name == 'sqlite':
+        create_related_index_changes(connection)
+    # 既存の投稿は最初の同期でまとめて索引される
+    connection.execute(text(
+        "INSERT OR IGNORE INTO post_index_changes (post_id, seq) "
+        "SELECT id, ROW_NUMBER() OVER (ORDER BY id) FROM posts"
+    ))
+
+
+def _orphaned_posts(connection):
+    """Clear the owner of posts whose user was deleted before user_id was."""
+    # 残ったidは新しいアカウントに再利用され、投稿が乗っ取られてしまう
+    connection.execute(text(
+        "UPDATE posts SET user_id = NULL "
+        "WHERE user_id IS NOT NULL "
+        "AND user_id NOT IN (SELECT id FROM users)"
+    ))
+
+
+def _reindex_search(connection):
+    """
+    Index the posts that migration 1 used to leave out of posts_fts.
+    """
+    if connection.dialect.name == 'sqlite':
+        rebuild_search_index(connection)
+
+
+def _tag_image_versioning(connection):
+    if connection.dialect.name == 'sqlite':
+        create_tag_image_versioning(connection)
+
+
+def _tombstone_flag(connection):
+    # 以前の退会済みアカウントは名前でしか区別できないので印を付けない
+    _add_missing_columns(connection, 'users', {
+        'is_tombstone': 'BOOLEAN NOT NULL DEFAULT 0',
+    })
+
+
+# (バージョン, 説明, 関数) を順番に適用する。新しい変更は末尾に追加する
+MIGRATIONS = [
+    (1, 'derived post columns, indexes and search index',
+     _derived_columns_and_indexes),
+    (2, 'posts.updated_at', _post_updated_at),
+    (3, 'content version for HTTP caching', _content_version),
+    (4, 'tags with trigger-maintained counts', _tags),
+    (5, 'monthly archive counts', _archive),
+    (6, 'image attachments', _attachments),
+    (7, 'post revisions and draft autosave', _revisions),
+    (8, 'change log for the related-posts index', _related_index),
+    (9, 'clear owners of posts whose user is gone', _orphaned_posts),
+    (10, 'reindex posts missed by the search index', _reindex_search),
+    (11, 'content version for tag and image changes', _tag_image_versioning),
+    (12, 'flag for the tombstone account', _tombstone_flag),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# 適用済みのバージョン (1行のみ)。アプリのモデルとは別のメタデータで管理する
+version_table = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, nullable=False),
+)
+
+
+def schema_version(connection):
+    """Return the applied version, 0 for an unversioned database."""
+    if not inspect(connection).has_table('schema_version'):
+        return 0
+    return connection.execute(
+        select(version_table.c.version)
+    ).scalar() or 0
+
+
+def _set_schema_version(connection, version):
+    version_table.create(connection, checkfirst=True)
+    connection.execute(version_table.delete())
+    connection.execute(version_table.insert().values(version=version))
+
+
+def migrate(engine):
+    """
+    Create or upgrade the schema and return the resulting version.
+
+    The version is kept in the schema_version table. A new database gets
+    the current schema in one step; an existing one runs only the migrations
+    newer than its version, each in its own transaction. An up-to-date
+    database costs a single read, so it is cheap to call on every start.
+    """
+    with engine.begin() as connection:
+        version = schema_version(connection)
+        if version >= LATEST_VERSION:
+            return version
+        if not inspect(connection).has_table('posts'):
+            Base.metadata.create_all(connection)
+            _set_schema_version(connection, LATEST_VERSION)
+            logger.info("Created schema version %d", LATEST_VERSION)
+            return LATEST_VERSION
+
+    for number, description, step in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as connection:
+            step(connection)
+            _set_schema_version(connection, number)
+        logger.info("Applied migration %d: %s", number, description)
+        version = number
+    return version
@@ -1,16 +1,17 @@
 import datetime
+import threading
+from contextlib import contextmanager
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Text,
-    DateTime, ForeignKey, Boolean
+    event, text, Column, Integer, String, Text,
+    DateTime, ForeignKey, Boolean, Index, Table
 )
 from sqlalchemy.orm import (
-    declarative_base, relationship, sessionmaker
+    declarative_base, deferred, relationship, sessionmaker, validates
 )
-from passlib.hash import bcrypt
+from src.database import create_blog_engine
+from src.passwords import hasher
+from src.rendering import render_post
 
-# データベース接続の設定
-DATABASE_URL = 'sqlite:///blog.db'
-engine = create_engine(DATABASE_URL)
 Base = declarative_base()
 
 
@@ -24,6 +25,10 @@ class User(Base):
     username = Column(String, unique=True, nullable=False)
     password_hash = Column(String, nullable=False)
     is_admin = Column(Boolean, default=False)
+    # 削除したユーザーの投稿を引き継ぐアカウント。登録やインポートでは作れない
+    is_tombstone = Column(
+        Boolean, nullable=False, default=False, server_default=text('0')
+    )
 
     posts = relationship('Post', back_populates='author')
 
@@ -31,14 +36,27 @@ class User(Base):
         """
         Verify if the provided password matches the stored hash.
         """
-        return bcrypt.verify(password, self.password_hash)
+        return hasher.verify(password, self.password_hash)
+
+    def verify_and_update(self, password):
+        """
+        Verify the password and upgrade an outdated hash in place.
+
+        The caller commits the session to persist the new hash.
+        """
+        valid, new_hash = hasher.verify_and_update(
+            password, self.password_hash
+        )
+        if new_hash:
+            self.password_hash = new_hash
+        return valid
 
     @staticmethod
     def hash_password(password):
         """
         Hash a plaintext password for storage.
         """
-        return bcrypt.hash(password)
+        return hasher.hash(password)
 
 
 class Post(Base):
@@ -49,15 +67,550 @@ class Post(Base):
 
     id = Column(Integer, primary_key=True)
     title = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
+    # 本文は「続きを読む」や個別ページでのみ読み込む
+    content = deferred(Column(Text, nullable=False))
+    # 書き込み時にレンダリングしたHTML (表示時にMarkdownを再解析しない)
+    content_html = deferred(Column(Text))
+    # フィード表示用の要約
+    excerpt = Column(Text)
+    word_count = Column(Integer)
+    reading_time = Column(Integer)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # 静的サイトの差分書き出しとAtomの<updated>に使う
+    updated_at = Column(
+        DateTime, default=datetime.datetime.utcnow,
+        onupdate=datetime.datetime.utcnow
+    )
     user_id = Column(Integer, ForeignKey('users.id'))
 
     author = relationship('User', back_populates='posts')
 
+    # フィードのキーセットページング用 (created_at, id) 複合インデックス
+    __table_args__ = (
+        Index('ix_posts_created_at_id', 'created_at', 'id'),
+        # ユーザーごとの投稿数・最終投稿日時の集計用
+        Index('ix_posts_user_id_created_at', 'user_id', 'created_at'),
+    )
+
+    @validates('content')
+    def _render_content(self, key, content):
+        for name, value in render_post(content).items():
+            setattr(self, name, value)
+        return content
+
+
+# 投稿とタグの関連。created_at は posts からの複製で、
+# (tag_id, created_at, post_id) の索引だけで「タグXの新しい順」を辿れる
+post_tags = Table(
+    'post_tags', Base.metadata,
+    Column('post_id', Integer, ForeignKey('posts.id', ondelete='CASCADE'),
+           primary_key=True),
+    Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True),
+    Column('created_at', DateTime, nullable=False),
+    Index('ix_post_tags_tag_id_created_at', 'tag_id', 'created_at',
+          'post_id'),
+)
+
+
+class Tag(Base):
+    """
+    Tag object model; post_count is kept up to date by triggers.
+    """
+    __tablename__ = 'tags'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+    post_count = Column(Integer, nullable=False, default=0)
+
+    # タグクラウド (投稿数の多い順) 用
+    __table_args__ = (
+        Index('ix_tags_post_count', 'post_count'),
+    )
+
+
+# タグごとの投稿数を関連の追加・削除のたびに増減する (再集計しない)
+TAG_COUNT_DDL = (
+    """
+    CREATE TRIGGER IF NOT EXISTS post_tags_ai AFTER INSERT ON post_tags
+    BEGIN
+        UPDATE tags SET post_count = post_count + 1 WHERE id = new.tag_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS post_tags_ad AFTER DELETE ON post_tags
+    BEGIN
+        UPDATE tags SET post_count = post_count - 1 WHERE id = old.tag_id;
+    END
+    """,
+    # 外部キーが無効な接続でも投稿の削除で関連を消す
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_tags_ad AFTER DELETE ON posts BEGIN
+        DELETE FROM post_tags WHERE post_id = old.id;
+    END
+    """,
+)
+
+
+def create_tag_counts(connection):
+    """
+    Create the triggers that maintain tags.post_count.
+    """
+    for ddl in TAG_COUNT_DDL:
+        connection.execute(text(ddl))
+
+
+class Attachment(Base):
+    """
+    Attachment object model: an uploaded image of a post.
+
+    Only the digest of the file in the blob store is kept here.
+    """
+    __tablename__ = 'attachments'
+
+    id = Column(Integer, primary_key=True)
+    post_id = Column(
+        Integer, ForeignKey('posts.id', ondelete='CASCADE'), nullable=False
+    )
+    digest = Column(String(64), nullable=False)
+    filename = Column(String, nullable=False)
+    content_type = Column(String)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        # 投稿ごとの一覧用
+        Index('ix_attachments_post_id', 'post_id', 'id'),
+        # 参照されていないファイルの削除用
+        Index('ix_attachments_digest', 'digest'),
+    )
+
+
+# 外部キーが無効な接続でも投稿の削除で添付を消す
+ATTACHMENT_DDL = (
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_attachments_ad
+    AFTER DELETE ON posts BEGIN
+        DELETE FROM attachments WHERE post_id = old.id;
+    END
+    """,
+)
+
+
+def create_attachment_cleanup(connection):
+    """
+    Create the trigger that removes the attachments of deleted posts.
+    """
+    for ddl in ATTACHMENT_DDL:
+        connection.execute(text(ddl))
+
+
+class PostRevision(Base):
+    """
+    PostRevision object model: an earlier version of a post.
+
+    Versions are stored newest first as word diffs against the next newer
+    version (the newest against the post itself), with a full snapshot
+    whenever the chain of diffs grows too long. See src/revisions.py.
+    """
+    __tablename__ = 'post_revisions'
+
+    id = Column(Integer, primary_key=True)
+    post_id = Column(
+        Integer, ForeignKey('posts.id', ondelete='CASCADE'), nullable=False
+    )
+    number = Column(Integer, nullable=False)
+    title = Column(String, nullable=False)
+    is_snapshot = Column(Boolean, nullable=False, default=False)
+    data = Column(Text, nullable=False)
+    # 直前のスナップショット以降に積み上がった差分のバイト数
+    chain_size = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_post_revisions_post_id_number', 'post_id', 'number',
+              unique=True),
+    )
+
+
+class DraftChange(Base):
+    """
+    DraftChange object model: one autosave of a user's unpublished post.
+
+    The first change is a snapshot and later ones are word diffs against
+    the previous save; older changes are dropped at each new snapshot.
+    """
+    __tablename__ = 'draft_changes'
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False
+    )
+    number = Column(Integer, nullable=False)
+    title = Column(String, nullable=False)
+    is_snapshot = Column(Boolean, nullable=False, default=False)
+    data = Column(Text, nullable=False)
+    chain_size = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_draft_changes_user_id_number', 'user_id', 'number',
+              unique=True),
+    )
+
+
+# 外部キーが無効な接続でも投稿・ユーザーの削除で履歴と下書きを消す
+REVISION_DDL = (
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_revisions_ad
+    AFTER DELETE ON posts BEGIN
+        DELETE FROM post_revisions WHERE post_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_drafts_ad
+    AFTER DELETE ON users BEGIN
+        DELETE FROM draft_changes WHERE user_id = old.id;
+    END
+    """,
+)
+
+
+def create_revision_cleanup(connection):
+    """
+    Create the triggers that remove revisions and drafts of deleted rows.
+    """
+    for ddl in REVISION_DDL:
+        connection.execute(text(ddl))
+
+
+# 関連記事インデックスに反映する投稿の変更 (投稿ごとに最新の1行)。
+# seq は変更のたびに増え、インデックスは前回の seq 以降だけを読む
+post_index_changes = Table(
+    'post_index_changes', Base.metadata,
+    Column('post_id', Integer, primary_key=True),
+    Column('seq', Integer, nullable=False),
+    Index('ix_post_index_changes_seq', 'seq', unique=True),
+)
+
 
-# テーブルの作成
-Base.metadata.create_all(engine)
+def _enqueue_post_change(row):
+    return (
+        "INSERT INTO post_index_changes (post_id, seq) "
+        f"VALUES ({row}.id, (SELECT COALESCE(MAX(seq), 0) + 1 "
+        "FROM post_index_changes)) "
+        "ON CONFLICT (post_id) DO UPDATE SET seq = excluded.seq;"
+    )
 
-# セッションの作成
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# 派生列 (HTML・要約) の更新はインデックスに関係しないので数えない
+RELATED_INDEX_DDL = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS post_index_changes_ai
+    AFTER INSERT ON posts BEGIN {_enqueue_post_change('new')} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS post_index_changes_au
+    AFTER UPDATE OF title, content ON posts
+    BEGIN {_enqueue_post_change('new')} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS post_index_changes_ad
+    AFTER DELETE ON posts BEGIN {_enqueue_post_change('old')} END
+    """,
+)
+
+
+def create_related_index_changes(connection):
+    """
+    Create the triggers that record changed posts for the related index.
+    """
+    for ddl in RELATED_INDEX_DDL:
+        connection.execute(text(ddl))
+
+
+# 月別アーカイブの投稿数 (month は 'YYYY-MM')。トリガーで増減する
+post_archive = Table(
+    'post_archive', Base.metadata,
+    Column('month', String, primary_key=True),
+    Column('post_count', Integer, nullable=False),
+)
+
+_ARCHIVE_INCREMENT = (
+    "INSERT INTO post_archive (month, post_count) "
+    "VALUES (substr(new.created_at, 1, 7), 1) "
+    "ON CONFLICT (month) DO UPDATE SET post_count = post_count + 1;"
+)
+_ARCHIVE_DECREMENT = (
+    "UPDATE post_archive SET post_count = post_count - 1 "
+    "WHERE month = substr(old.created_at, 1, 7);"
+)
+ARCHIVE_DDL = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS post_archive_ai AFTER INSERT ON posts
+    WHEN new.created_at IS NOT NULL BEGIN {_ARCHIVE_INCREMENT} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS post_archive_ad AFTER DELETE ON posts
+    WHEN old.created_at IS NOT NULL BEGIN {_ARCHIVE_DECREMENT} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS post_archive_au
+    AFTER UPDATE OF created_at ON posts
+    WHEN substr(old.created_at, 1, 7) IS NOT substr(new.created_at, 1, 7)
+    BEGIN {_ARCHIVE_DECREMENT} {_ARCHIVE_INCREMENT} END
+    """,
+)
+
+
+def create_archive_counts(connection):
+    """
+    Create the triggers that maintain post_archive.
+    """
+    for ddl in ARCHIVE_DDL:
+        connection.execute(text(ddl))
+
+
+def rebuild_archive(connection):
+    """
+    Recount post_archive from the posts table.
+    """
+    connection.execute(text("DELETE FROM post_archive"))
+    connection.execute(text(
+        "INSERT INTO post_archive (month, post_count) "
+        "SELECT substr(created_at, 1, 7), count(*) FROM posts "
+        "WHERE created_at IS NOT NULL GROUP BY 1"
+    ))
+    # 数え直した結果を読み込み済みのキャッシュに反映させる
+    connection.execute(text(_BUMP_CONTENT_VERSION))
+
+
+# 全文検索用のFTS5仮想テーブル (posts を外部コンテンツとしてトリガーで同期)
+SEARCH_INDEX_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+        title, content, content='posts', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_au
+    AFTER UPDATE OF title, content ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+)
+
+
+def create_search_index(connection):
+    """
+    Create the posts_fts table and its sync triggers if they are missing.
+
+    A table created next to existing posts is filled from them: the
+    triggers only see later changes, and deleting a row that was never
+    indexed corrupts an external-content index.
+    """
+    exists = connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+        "AND name = 'posts_fts'"
+    )).first()
+    for ddl in SEARCH_INDEX_DDL:
+        connection.execute(text(ddl))
+    # タイトルの一致を本文より重く評価する
+    connection.execute(text(
+        "INSERT INTO posts_fts(posts_fts, rank) "
+        "VALUES ('rank', 'bm25(10.0, 1.0)')"
+    ))
+    if not exists and connection.execute(
+        text("SELECT 1 FROM posts LIMIT 1")
+    ).first():
+        connection.execute(
+            text("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
+        )
+
+
+def drop_search_index(connection):
+    """
+    Drop the posts_fts table together with its triggers.
+    """
+    for trigger in ('posts_fts_ai', 'posts_fts_ad', 'posts_fts_au'):
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    connection.execute(text("DROP TABLE IF EXISTS posts_fts"))
+
+
+def rebuild_search_index(connection):
+    """
+    Re-read every post into posts_fts, e.g. for an existing database.
+    """
+    create_search_index(connection)
+    connection.execute(
+        text("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
+    )
+
+
+@event.listens_for(Post.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_search_index(connection)
+
+
+@event.listens_for(Post.__table__, 'before_drop')
+def _drop_search_index(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        drop_search_index(connection)
+
+
+# ブログ全体のコンテンツバージョン (1行のみ)。投稿・著者名の変更で
+# トリガーが進めるので、HTTPのETag/Last-Modifiedに使える
+content_version_table = Table(
+    'content_version', Base.metadata,
+    Column('version', Integer, nullable=False),
+    Column('updated_at', DateTime, nullable=False),
+)
+
+_BUMP_CONTENT_VERSION = (
+    "UPDATE content_version "
+    "SET version = version + 1, updated_at = CURRENT_TIMESTAMP;"
+)
+CONTENT_VERSION_DDL = (
+    """
+    INSERT INTO content_version (version, updated_at)
+    SELECT 1, CURRENT_TIMESTAMP
+    WHERE NOT EXISTS (SELECT 1 FROM content_version)
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS content_version_post_ai
+    AFTER INSERT ON posts BEGIN {_BUMP_CONTENT_VERSION} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS content_version_post_au
+    AFTER UPDATE ON posts BEGIN {_BUMP_CONTENT_VERSION} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS content_version_post_ad
+    AFTER DELETE ON posts BEGIN {_BUMP_CONTENT_VERSION} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS content_version_user_au
+    AFTER UPDATE OF username ON users BEGIN {_BUMP_CONTENT_VERSION} END
+    """,
+)
+
+
+def create_content_version(connection):
+    """
+    Create the content_version row and the triggers that advance it.
+    """
+    for ddl in CONTENT_VERSION_DDL:
+        connection.execute(text(ddl))
+
+
+# タグや画像だけの変更も表示内容を変えるので、バージョンを進める
+TAG_IMAGE_VERSION_DDL = tuple(
+    f"""
+    CREATE TRIGGER IF NOT EXISTS content_version_{table}_{suffix}
+    AFTER {event_} ON {table} BEGIN {_BUMP_CONTENT_VERSION} END
+    """
+    for table in ('post_tags', 'attachments')
+    for suffix, event_ in (('ai', 'INSERT'), ('ad', 'DELETE'))
+)
+
+
+def create_tag_image_versioning(connection):
+    """
+    Create the triggers that advance content_version when a post's tags
+    or images change.
+    """
+    for ddl in TAG_IMAGE_VERSION_DDL:
+        connection.execute(text(ddl))
+
+
+def content_version(connection):
+    """Return (version, updated_at) of the blog content."""
+    row = connection.execute(
+        content_version_table.select()
+    ).first()
+    return tuple(row) if row else (0, None)
+
+
+@event.listens_for(Base.metadata, 'after_create')
+def _create_triggers(target, connection, **kw):
+    # トリガーは対象テーブルの作成後にしか作れないため全テーブルの後に行う
+    if connection.dialect.name == 'sqlite':
+        create_content_version(connection)
+        create_tag_counts(connection)
+        create_archive_counts(connection)
+        create_attachment_cleanup(connection)
+        create_revision_cleanup(connection)
+        create_related_index_changes(connection)
+        create_tag_image_versioning(connection)
+
+
+# セッションの作成 (エンジンは get_engine() の初回呼び出しで結び付ける)
+# expire_on_commit=False: セッション終了後もセッションステート上の
+# オブジェクトの属性を読めるようにする
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False
+)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Return the application engine, creating it on first use.
+
+    Importing this module has no side effects; the schema is created and
+    upgraded by src/migrations.py, not here.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            # データベース接続の設定 (src/database.py 参照)
+            _engine = create_blog_engine()
+            SessionLocal.configure(bind=_engine)
+        return _engine
+
+
+def __getattr__(name):
+    # 互換性のため `from src.models import engine` を遅延評価で残す
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@contextmanager
+def session_scope(session_factory=None):
+    """
+    Unit of work for one Streamlit rerun.
+
+    Commits on success, rolls back on any exception (including Streamlit's
+    rerun/stop control flow) and always closes the session, so the identity
+    map and the pooled connection never outlive the rerun.
+    """
+    if session_factory is None:
+        get_engine()
+        session_factory = SessionLocal
+    session = session_factory()
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.close()
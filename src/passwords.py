@@ -0,0 +1,85 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# bcryptのコストと同時にハッシュ計算するスレッド数 (環境変数で上書き可能)
+DEFAULT_ROUNDS = 12
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class PasswordHasher:
+    """
+    Hash and verify passwords with bcrypt on a bounded worker pool.
+
+    bcrypt releases the GIL while hashing, so running it on a small pool
+    keeps Streamlit script threads responsive and caps the CPU a burst of
+    logins can take. Hashes made with a different cost are reported by
+    verify_and_update so they can be upgraded on the next login.
+    """
+    def __init__(self, rounds=None, max_workers=None):
+        self.rounds = rounds or int(
+            os.getenv('BLOG_BCRYPT_ROUNDS', DEFAULT_ROUNDS)
+        )
+        self.max_workers = max_workers or int(
+            os.getenv('BLOG_HASH_WORKERS', DEFAULT_WORKERS)
+        )
+        self._context = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def context(self):
+        # passlib/bcrypt の読み込みは最初のハッシュ計算まで遅らせる
+        with self._lock:
+            if self._context is None:
+                from passlib.context import CryptContext
+                self._context = CryptContext(
+                    schemes=['bcrypt'], bcrypt__rounds=self.rounds
+                )
+            return self._context
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='password-hasher',
+                )
+            return self._executor
+
+    def submit_hash(self, password):
+        return self.executor.submit(self.context.hash, password)
+
+    def submit_verify_and_update(self, password, password_hash):
+        return self.executor.submit(
+            self.context.verify_and_update, password, password_hash
+        )
+
+    def hash(self, password):
+        """Hash a plaintext password with the configured cost."""
+        return self.submit_hash(password).result()
+
+    def verify(self, password, password_hash):
+        """Check a password against a stored hash."""
+        return self.verify_and_update(password, password_hash)[0]
+
+    def verify_and_update(self, password, password_hash):
+        """
+        Check a password and return (valid, new_hash).
+
+        new_hash is None unless the password is valid and the stored hash
+        should be replaced, e.g. because its cost differs from the current
+        setting.
+        """
+        return self.submit_verify_and_update(password, password_hash).result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+# アプリ全体で共有するハッシャー
+hasher = PasswordHasher()
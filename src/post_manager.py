@@ -1,100 +1,700 @@
+import functools
+import re
+import time
 import streamlit as st
+from sqlalchemy import delete
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from src.blob_store import THUMBNAIL_WIDTH, VARIANT_WIDTHS, get_blob_store
+from src.instrumentation import timed
 from src.interface import PostInterface
-from src.models import User, Post
+from src.models import Attachment, Post, content_version, session_scope
+from src.post_repository import PostRepository
+from src.principals import principal_store
+from src.related_posts import get_related_index
+from src.tag_repository import TagRepository
+from src.user_repository import UserRepository
+from src import revisions
+from src import tags as tagging
+from src import user_deletion
+from src.write_queue import WriteQueueFull, run_write
+
+DEFAULT_PAGE_SIZE = 10
+TAG_CLOUD_COLUMNS = 5
+IMAGE_TYPES = ('png', 'jpg', 'jpeg', 'gif', 'webp')
+# 下書きの自動保存は最短でもこの秒数おき
+AUTOSAVE_INTERVAL = 5
+_MARKDOWN_SPECIAL = re.compile(r'([\\`*_{}\[\]()#+\-.!|<>~])')
+
+
+class PostNotFound(LookupError):
+    """Raised by a write operation whose post was deleted meanwhile."""
+
+
+def _reset_feed_cursors():
+    # 絞り込みを変えたら1ページ目に戻る
+    st.session_state['feed_cursors'] = []
+
+
+def _escape_markdown(text):
+    return _MARKDOWN_SPECIAL.sub(r'\\\1', text)
+
+
+def _fragment(method):
+    """
+    Render a PostManager method as an st.fragment.
+
+    Interacting with a widget inside reruns only the method, not the whole
+    app. The method's first argument is a stable key such as a post id.
+    Streamlit keeps the closure of a fragment's first run and reuses it for
+    later fragment reruns, so the key is made part of the fragment's name
+    and a fragment rerun passes only the key: the method loads everything
+    else again. A fragment rerun does not go through app.py, so it runs
+    with a short-lived session of its own; writes end with a full
+    st.rerun().
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if get_script_run_ctx(suppress_warning=True) is None:
+            # Streamlitの外 (テストやベンチマーク) ではそのまま呼ぶ
+            return method(self, *args, **kwargs)
+        keys = args[:1]
+
+        def body():
+            ctx = get_script_run_ctx(suppress_warning=True)
+            if not ctx.fragment_ids_this_run:
+                return method(self, *args, **kwargs)
+            # 保存された引数は最初の実行のものなので、キー以外は渡さない
+            with session_scope() as session:
+                return method(self.bind(session), *keys)
+
+        # フラグメントのidは名前と位置で決まる。キーを名前に含め、同じ位置に
+        # 別の行が来たら別のフラグメントにする
+        body.__module__ = method.__module__
+        body.__qualname__ = method.__qualname__ + ''.join(
+            f'[{key}]' for key in keys
+        )
+        return st.fragment(body)()
+    return wrapper
 
 
 class PostManager(PostInterface):
-    def __init__(self, session):
+    def __init__(self, session, page_size=DEFAULT_PAGE_SIZE, cache=None,
+                 writer=None, blob_store=None, principals=None, related=None):
         self.session = session
+        self.page_size = page_size
+        self.cache = cache
+        self.writer = writer
+        self.blob_store = blob_store or get_blob_store()
+        self.principals = principals or principal_store
+        self.related = related or get_related_index()
+        self.repository = PostRepository(session)
+        self.user_repository = UserRepository(session)
+        self.tag_repository = TagRepository(session)
+        self._snapshot = None
+
+    def bind(self, session):
+        """Return a copy of this manager that uses session."""
+        return PostManager(
+            session, self.page_size, self.cache, self.writer,
+            self.blob_store, self.principals, self.related
+        )
+
+    def content_changed(self):
+        """Invalidate cached feed pages after a committed write."""
+        if self.cache is not None:
+            self.cache.bump()
 
+    def write(self, operation):
+        """
+        Commit operation(session) directly or through the write queue, then
+        invalidate the feed. Returns False, after showing an error, if the
+        queue is full, the commit timed out or the post is gone.
+        """
+        try:
+            run_write(self.session, self.writer, operation)
+        except WriteQueueFull:
+            st.error("The server is busy, please try again.")
+            return False
+        except TimeoutError:
+            # キューに残った書き込みは後でコミットされることがある
+            st.error("Saving is taking longer than usual, "
+                     "please reload the page in a moment.")
+            return False
+        except PostNotFound:
+            st.error("This post has been deleted.")
+            self.content_changed()
+            return False
+        self.content_changed()
+        return True
+
+    @timed
+    @_fragment
     def create_post(self):
         st.header("Create a new post")
-        title = st.text_input("Title")
-        content = st.text_area("Content")
+        user_id = st.session_state['user'].id
+        self.restore_draft(user_id)
+        title = st.text_input("Title", key='draft_title')
+        content = st.text_area("Content", key='draft_content')
+        tags = tagging.parse_tags(st.text_input("Tags (comma separated)"))
+        uploads = st.file_uploader(
+            "Images", type=IMAGE_TYPES, accept_multiple_files=True
+        )
+        self.autosave_draft(user_id, title, content)
 
         if st.button("Publish"):
             if title and content:
-                new_post = Post(
-                    title=title,
-                    content=content,
-                    author=st.session_state['user']
-                )
-                self.session.add(new_post)
-                self.session.commit()
+                attachments = self.store_uploads(uploads)
+
+                def publish(session):
+                    self.add_post(
+                        session, user_id, title, content, tags, attachments
+                    )
+                    revisions.discard_draft(session, user_id)
+
+                if not self.write(publish):
+                    return
+                # 次の実行で空の入力欄から始める
+                st.session_state.pop('draft_user', None)
+                st.session_state['feed_cursors'] = []
                 st.success("Post published successfully!")
                 st.rerun()
             else:
                 st.error("Title and Content are required!")
 
+    @timed
     def edit_post(self, post):
+        self.show_history(post)
         with st.form("Edit Post"):
             st.write("Edit Post")
             title = st.text_input("Title", value=post.title)
             content = st.text_area("Content", value=post.content)
+            current = self.tag_repository.tags_for_posts([post.id])
+            tags = tagging.parse_tags(st.text_input(
+                "Tags (comma separated)",
+                value=", ".join(current.get(post.id, ()))
+            ))
+            uploads = st.file_uploader(
+                "Add images", type=IMAGE_TYPES, accept_multiple_files=True,
+                key=f"upload_{post.id}"
+            )
+            images = self.repository.attachments_for_posts([post.id])
+            removed = []
+            if images:
+                removed = st.multiselect(
+                    "Remove images", images[post.id],
+                    format_func=lambda image: image.filename
+                )
             submitted = st.form_submit_button("Submit")
             if submitted:
                 if title and content:
-                    post.title = title
-                    post.content = content
-                    self.session.commit()
+                    post_id = post.id
+                    attachments = self.store_uploads(uploads)
+                    removed_ids = [image.id for image in removed]
+                    if not self.write(
+                        lambda session: self.update_post(
+                            session, post_id, title, content, tags,
+                            attachments, removed_ids
+                        )
+                    ):
+                        return
                     st.success("Post updated successfully!")
                     st.rerun()
                 else:
                     st.error("Title and Content are required!")
 
+    def restore_draft(self, user_id):
+        """
+        Fill the new post inputs with the user's autosaved draft, once per
+        session and user.
+        """
+        if st.session_state.get('draft_user') == user_id:
+            return
+        draft = revisions.load_draft(self.session, user_id)
+        st.session_state['draft_user'] = user_id
+        st.session_state['draft'] = draft
+        st.session_state['draft_saved_at'] = time.monotonic()
+        st.session_state['draft_title'] = draft.title if draft else ""
+        st.session_state['draft_content'] = draft.content if draft else ""
+
+    def autosave_draft(self, user_id, title, content):
+        """
+        Save changes to the new post as a diff against the last save.
+
+        Saves are debounced to one per AUTOSAVE_INTERVAL seconds, so a
+        burst of reruns while typing costs at most one small write.
+        """
+        draft = st.session_state.get('draft')
+        saved = (draft.title, draft.content) if draft else ("", "")
+        if (title, content) == saved:
+            return
+        now = time.monotonic()
+        if now - st.session_state.get('draft_saved_at', 0) < AUTOSAVE_INTERVAL:
+            return
+
+        try:
+            saved = run_write(
+                self.session, self.writer,
+                lambda session: revisions.save_draft(
+                    session, user_id, title, content, draft
+                )
+            )
+        except (WriteQueueFull, TimeoutError):
+            # 次の実行で保存し直す
+            return
+        st.session_state['draft'] = saved
+        st.session_state['draft_saved_at'] = now
+        st.caption(f"Draft saved at {time.strftime('%H:%M:%S')}")
+
+    def show_history(self, post):
+        """List the earlier versions of a post and offer to restore one."""
+        history = revisions.post_revisions(self.session, post.id)
+        if not history:
+            return
+        with st.expander(f"History ({len(history)} earlier versions)"):
+            numbers = {row.number: row for row in history}
+            number = st.selectbox(
+                "Version", list(numbers), key=f"revision_{post.id}",
+                format_func=lambda n: (
+                    f"#{n} · {numbers[n].title} · {numbers[n].created_at}"
+                )
+            )
+            title, content = revisions.load_post_revision(
+                self.session, post.id, number
+            )
+            st.markdown(f"**{title}**")
+            st.text(content)
+            if st.button("Restore this version",
+                         key=f"restore_{post.id}"):
+                post_id = post.id
+                if not self.write(lambda session: self.update_post(
+                    session, post_id, title, content
+                )):
+                    return
+                st.success("Post restored successfully!")
+                st.rerun()
+
+    def store_uploads(self, uploads):
+        """
+        Stream uploaded images into the blob store and queue their
+        resized variants. Returns the Attachment fields for each upload.
+        """
+        attachments = []
+        for upload in uploads or ():
+            digest, size = self.blob_store.put(upload)
+            self.blob_store.submit_variants(digest)
+            attachments.append({
+                'digest': digest, 'filename': upload.name,
+                'content_type': upload.type, 'size': size,
+            })
+        return attachments
+
+    @staticmethod
+    def add_post(session, user_id, title, content, tags=(), attachments=()):
+        post = Post(title=title, content=content, user_id=user_id)
+        session.add(post)
+        # タグの関連には投稿のidとcreated_atが必要
+        session.flush()
+        tagging.set_post_tags(session, post, tags)
+        session.add_all(
+            Attachment(post_id=post.id, **fields) for fields in attachments
+        )
+
+    @staticmethod
+    def update_post(session, post_id, title, content, tags=None,
+                    attachments=(), removed_ids=()):
+        post = session.get(Post, post_id)
+        if post is None:
+            raise PostNotFound(post_id)
+        # 上書きする前の版を差分で残す
+        revisions.record_post_revision(session, post, title, content)
+        post.title = title
+        post.content = content
+        if tags is not None:
+            tagging.set_post_tags(session, post, tags)
+        if removed_ids:
+            session.execute(delete(Attachment).where(
+                Attachment.post_id == post_id,
+                Attachment.id.in_(removed_ids)
+            ))
+        session.add_all(
+            Attachment(post_id=post_id, **fields) for fields in attachments
+        )
+
+    @timed
     def show_posts(self):
         st.title("My Blog")
         if st.session_state['user']:
             self.create_post()
 
-        st.header("Posts")
-        posts = self.session.query(Post).order_by(
-            Post.created_at.desc()
-        ).all()
+        self.show_tag_cloud()
+        self.show_archive()
+        tag = st.session_state.get('feed_tag')
+        month = st.session_state.get('feed_month')
+        if tag:
+            st.header(f"Posts tagged #{tag}")
+            if st.button("Show all posts", key="clear_tag"):
+                self.filter_by_tag(None)
+        elif month:
+            st.header(f"Posts from {month}")
+        else:
+            st.header("Posts")
+        cursors = st.session_state.setdefault('feed_cursors', [])
+        cursor = cursors[-1] if cursors else None
+        posts, has_older = self.fetch_page(cursor, tag, month)
+        post_ids = [post.id for post in posts]
+        tags = self.fetch_tags(post_ids)
+        images = self.fetch_attachments(post_ids)
         for post in posts:
-            st.subheader(post.title)
-            st.write(post.content)
-            if post.author:
-                st.write(
-                    f"Published by {post.author.username} on {post.created_at}"
-                )
+            self.show_post_card(
+                post.id, post, tags.get(post.id, ()), images.get(post.id, ())
+            )
+
+        next_cursor = None
+        if has_older:
+            next_cursor = (posts[-1].created_at, posts[-1].id)
+        self.show_pagination(cursors, next_cursor, 'feed')
+
+    def show_tag_cloud(self):
+        """Render the most used tags as filter buttons."""
+        cloud = self.cached(('tag_cloud',), self.tag_repository.tag_cloud)
+        if not cloud:
+            return
+        columns = st.columns(TAG_CLOUD_COLUMNS)
+        for i, tag in enumerate(cloud):
+            if columns[i % TAG_CLOUD_COLUMNS].button(
+                    f"#{tag.name} ({tag.post_count})", key=f"tag_{tag.name}"):
+                self.filter_by_tag(tag.name)
+
+    def show_archive(self):
+        """Render the months with posts in the sidebar as a feed filter."""
+        months = self.cached(('archive',), self.repository.archive_months)
+        if not months:
+            return
+        counts = {month.month: month.post_count for month in months}
+        options = [None, *counts]
+        if st.session_state.get('feed_month') not in options:
+            st.session_state['feed_month'] = None
+        st.sidebar.selectbox(
+            "Archive", options, key='feed_month',
+            format_func=lambda month: (
+                "All months" if month is None
+                else f"{month} ({counts[month]})"
+            ),
+            on_change=_reset_feed_cursors,
+        )
+
+    def filter_by_tag(self, tag):
+        st.session_state['feed_tag'] = tag
+        st.session_state['feed_cursors'] = []
+        st.rerun()
+
+    @_fragment
+    def show_post_card(self, post_id, post=None, tags=None, images=None):
+        """
+        Render one feed entry: excerpt, metadata and owner actions.
+
+        Each card is a fragment, so toggling "Read more" or editing reruns
+        only this card. The feed passes the rows it fetched for the page;
+        a fragment rerun passes only post_id and the card queries its own
+        row, tags and images.
+        """
+        if post is None:
+            post = self.cached(
+                ('post', post_id), lambda: self.repository.get_post(post_id)
+            )
+            if post is None:
+                return
+        if tags is None:
+            tags = self.fetch_tags([post_id]).get(post_id, ())
+        if images is None:
+            images = self.fetch_attachments([post_id]).get(post_id, ())
+        st.subheader(post.title)
+        if images:
+            # フィードでは縮小版だけを読む (元画像は読まない)
+            thumbnail = self.blob_store.variant(
+                images[0].digest, THUMBNAIL_WIDTH
+            )
+            if thumbnail:
+                st.image(thumbnail, width=THUMBNAIL_WIDTH)
+        if post.excerpt is not None:
+            st.write(post.excerpt)
+            st.caption(
+                f"{post.word_count} words · {post.reading_time} min read · "
+                f"[Permalink](?post={post.id})"
+            )
+        if tags:
+            st.caption(" ".join(f"#{tag}" for tag in tags))
+        if st.toggle("Read more", key=f"more_{post.id}"):
+            st.html(self.fetch_body(post.id))
+            self.show_images(images)
+        author = post.author_name or "deleted user"
+        st.write(f"Published by {author} on {post.created_at}")
+
+        if (st.session_state['user'] and
+                st.session_state['user'].id == post.user_id):
+            if st.radio(
+                    label="Edit?",
+                    options=("View", "Edit"),
+                    key=f"edit_{post.id}"
+            ) == "Edit":
+                editable = self.session.get(Post, post.id)
+                if editable is not None:
+                    self.edit_post(editable)
+            if st.button("Delete", key=f"delete_{post.id}"):
+                self.delete_post(post)
+        st.write("---")
+
+    @timed
+    def show_post(self, post_id):
+        """Render a single post on its own page."""
+        post = self.cached(
+            ('post', post_id), lambda: self.repository.get_post(post_id)
+        )
+        if post is None:
+            st.error("Post not found")
+            return
+        st.title(post.title)
+        author = post.author_name or "deleted user"
+        st.caption(f"Published by {author} on {post.created_at}")
+        st.html(self.fetch_body(post_id))
+        self.show_images(self.fetch_attachments([post_id]).get(post_id, ()))
+        self.show_related(post_id)
+        if st.button("Back to all posts"):
+            st.query_params.clear()
+            st.rerun()
+
+    def show_related(self, post_id):
+        """Link to the posts most similar to one post."""
+        related = self.cached(('related', post_id), lambda: (
+            self.repository.get_posts([
+                related_id for related_id, _ in
+                self.related.related(self.session, post_id)
+            ])
+        ))
+        if not related:
+            return
+        st.subheader("Related posts")
+        for post in related:
+            st.markdown(f"- [{_escape_markdown(post.title)}](?post={post.id})")
+
+    def show_images(self, images):
+        """Show the attachments at the largest generated size."""
+        for image in images:
+            path = next(filter(None, (
+                self.blob_store.variant(image.digest, width)
+                for width in reversed(VARIANT_WIDTHS)
+            )), None)
+            if path:
+                st.image(path, caption=image.filename)
             else:
-                st.write(f"Published by deleted user on {post.created_at}")
-
-            if (st.session_state['user'] and
-                    st.session_state['user'].id == post.user_id):
-                if st.radio(
-                        label="Edit?",
-                        options=("View", "Edit"),
-                        key=f"edit_{post.id}"
-                ) == "Edit":
-                    self.edit_post(post)
-                if st.button("Delete"):
-                    self.delete_post(post)
+                st.caption(f"{image.filename} is being processed")
+
+    def fetch_body(self, post_id):
+        """Load the rendered body of one post on demand."""
+        return self.cached(
+            ('body', post_id), lambda: self.repository.post_body(post_id)
+        )
+
+    def fetch_page(self, cursor=None, tag=None, month=None):
+        """
+        Fetch one page of the feed as read-only rows.
+
+        See PostRepository.feed_page for the cursor and filter semantics.
+        With a cache the page is shared across sessions until the content
+        version changes.
+        """
+        return self.cached(
+            ('feed', self.page_size, cursor, tag, month),
+            lambda: self.repository.feed_page(
+                self.page_size, cursor, tag, month
+            )
+        )
+
+    def fetch_tags(self, post_ids):
+        """Load the tag names of the posts on one page in one query."""
+        return self.cached(
+            ('post_tags', tuple(post_ids)),
+            lambda: self.tag_repository.tags_for_posts(post_ids)
+        )
+
+    def fetch_attachments(self, post_ids):
+        """Load the images of the posts on one page in one query."""
+        return self.cached(
+            ('attachments', tuple(post_ids)),
+            lambda: self.repository.attachments_for_posts(post_ids)
+        )
+
+    def cached(self, key, loader):
+        if self.cache is None:
+            return loader()
+        return self.cache.get_or_load(
+            (self.snapshot_version(), key), loader
+        )
+
+    def snapshot_version(self):
+        """
+        Return the content version seen by the session's current read
+        transaction, the one the cached loaders read from.
+
+        Keying entries on it keeps a rerun whose snapshot predates another
+        session's write from caching old rows as current, and notices
+        writes from other processes. It is read once per transaction.
+        """
+        connection = self.session.connection()
+        transaction = self.session.get_transaction()
+        if self._snapshot is None or self._snapshot[0] is not transaction:
+            self._snapshot = (transaction, content_version(connection)[0])
+        return self._snapshot[1]
+
+    def show_pagination(self, cursors, next_cursor, key,
+                        labels=("Newer posts", "Older posts")):
+        """Render previous/next navigation and keep the cursor stack."""
+        if cursors and st.button(labels[0], key=f"{key}_newer"):
+            cursors.pop()
+            st.rerun()
+        if next_cursor and st.button(labels[1], key=f"{key}_older"):
+            cursors.append(next_cursor)
+            st.rerun()
+
+    @timed
+    def search_posts(self):
+        """Full-text search page with ranked, highlighted results."""
+        st.title("Search")
+        query = st.text_input("Search posts").strip()
+        if st.session_state.get('search_query') != query:
+            st.session_state['search_query'] = query
+            st.session_state['search_cursors'] = []
+        if not query:
+            return
+
+        cursors = st.session_state['search_cursors']
+        cursor = cursors[-1] if cursors else None
+        results, has_more = self.cached(
+            ('search', query, self.page_size, cursor),
+            lambda: self.repository.search(query, self.page_size, cursor)
+        )
+        if not results:
+            st.info("No posts found")
+            return
+        for result in results:
+            st.markdown(f"### {result.title_html}", unsafe_allow_html=True)
+            st.markdown(result.snippet_html, unsafe_allow_html=True)
+            author = result.author_name or "deleted user"
+            st.write(f"Published by {author} on {result.created_at}")
             st.write("---")
 
+        next_cursor = None
+        if has_more:
+            next_cursor = (results[-1].rank, results[-1].id)
+        self.show_pagination(
+            cursors, next_cursor, 'search',
+            labels=("Previous results", "More results")
+        )
+
+    @timed
     def delete_post(self, post):
-        self.session.delete(post)
-        self.session.commit()
+        post_id = post.id
+
+        def remove(session):
+            # 他の編集者が先に削除していれば何もしない
+            existing = session.get(Post, post_id)
+            if existing is not None:
+                session.delete(existing)
+
+        if not self.write(remove):
+            return
         st.success("Post deleted successfully!")
         st.rerun()
 
+    @timed
     def manage_users(self):
         st.title("User Management")
-        if st.session_state['user'].is_admin:
-            users = self.session.query(User).all()
-            for user in users:
-                st.write(f"Username: {user.username}, Admin: {user.is_admin}")
-                pushed = st.button(
-                    f"Delete {user.username}", key=f"delete_user_{user.id}"
-                )
-                if pushed:
-                    user_name = user.username
-                    self.session.delete(user)
-                    self.session.commit()
-                    st.success(f"User {user_name} deleted successfully!")
-                    if st.session_state['user'] == user:
-                        st.session_state['user'] = None
-                    st.rerun()
-        else:
+        if not st.session_state['user'].is_admin:
             st.error("You do not have permission to access this page.")
+            return
+
+        prefix = st.text_input("Search username").strip()
+        if st.session_state.get('user_search') != prefix:
+            st.session_state['user_search'] = prefix
+            st.session_state['user_cursors'] = []
+        cursors = st.session_state['user_cursors']
+        cursor = cursors[-1] if cursors else None
+        users, has_more = self.user_repository.user_page(
+            self.page_size, prefix, cursor
+        )
+
+        policies = user_deletion.POLICIES
+        policy = st.selectbox(
+            "Posts of deleted users", policies,
+            index=policies.index(user_deletion.default_policy()),
+            key='deletion_policy'
+        )
+
+        # 行はフラグメントなので、選択はセッションステートで受け渡す
+        chosen = st.session_state.setdefault('selected_users', set())
+        for user in users:
+            self.show_user_row(user.id, user)
+
+        selected = [user.id for user in users if user.id in chosen]
+        if users and st.button(
+                "Delete selected users", key="delete_selected_users"):
+            if not selected:
+                st.warning("No users selected")
+            else:
+                if not self.delete_users(selected, policy):
+                    return
+                chosen.difference_update(selected)
+                st.success(f"{len(selected)} users deleted successfully!")
+                st.rerun()
+
+        next_cursor = users[-1].username if has_more else None
+        self.show_pagination(
+            cursors, next_cursor, 'users', labels=("Previous", "Next")
+        )
+
+    @_fragment
+    def show_user_row(self, user_id, user=None):
+        """
+        Render one user with selection and delete controls.
+
+        A fragment rerun passes only user_id, so the row is queried again
+        and the deletion policy is read from the page's selectbox state.
+        """
+        if user is None:
+            user = self.user_repository.get_user(user_id)
+            if user is None:
+                return
+        policy = st.session_state.get(
+            'deletion_policy', user_deletion.default_policy()
+        )
+        st.write(f"Username: {user.username}, Admin: {user.is_admin}")
+        st.caption(
+            f"{user.post_count} posts, "
+            f"last post {user.last_post_at or 'never'}"
+        )
+        chosen = st.session_state.setdefault('selected_users', set())
+        if st.checkbox("Select", key=f"select_user_{user.id}"):
+            chosen.add(user.id)
+        else:
+            chosen.discard(user.id)
+        if st.button(f"Delete {user.username}", key=f"delete_user_{user.id}"):
+            if not self.delete_users([user.id], policy):
+                return
+            st.success(f"User {user.username} deleted successfully!")
+            st.rerun()
+
+    def delete_users(self, user_ids, policy=None):
+        """
+        Delete users with the given post policy and log out the current
+        user if included. Returns False if the write failed.
+        """
+        if not self.write(lambda session: user_deletion.delete_users(
+            session, user_ids, policy
+        )):
+            return False
+        # 削除されたユーザーのセッションは次の実行でログアウトになる
+        self.principals.invalidate(user_ids)
+        if st.session_state['user'].id in user_ids:
+            st.session_state.pop('auth_token', None)
+            st.session_state['user'] = None
+        return True
@@ -0,0 +1,246 @@
+import datetime
+import html
+from dataclasses import dataclass
+from sqlalchemy import select, text, tuple_, DateTime
+from src.models import (
+    Attachment, Tag, User, Post, post_archive, post_tags
+)
+from src.rendering import render_markdown
+
+# FTS5のハイライト用マーカー (HTMLエスケープ後に<mark>へ置換する)
+_MARK_OPEN = '\x02'
+_MARK_CLOSE = '\x03'
+
+
+@dataclass(frozen=True, slots=True)
+class PostRow:
+    """
+    Read-only projection of a post as shown in the feed.
+
+    The body is not part of the row; see PostRepository.post_body.
+    """
+    id: int
+    title: str
+    excerpt: str | None
+    word_count: int | None
+    reading_time: int | None
+    created_at: datetime.datetime
+    user_id: int | None
+    author_name: str | None
+
+
+@dataclass(frozen=True, slots=True)
+class SearchResult:
+    """
+    A ranked search hit with HTML-escaped, highlighted title and snippet.
+    """
+    id: int
+    title_html: str
+    snippet_html: str
+    created_at: datetime.datetime
+    author_name: str | None
+    rank: float
+
+
+@dataclass(frozen=True, slots=True)
+class AttachmentRow:
+    """
+    An image attached to a post, referenced by its blob digest.
+    """
+    id: int
+    digest: str
+    filename: str
+
+
+@dataclass(frozen=True, slots=True)
+class ArchiveMonth:
+    """
+    Number of posts published in one month ('YYYY-MM').
+    """
+    month: str
+    post_count: int
+
+
+def month_range(month):
+    """Return the [start, end) datetimes of a 'YYYY-MM' month."""
+    start = datetime.datetime.strptime(month, '%Y-%m')
+    end = (start + datetime.timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def build_match_query(query):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word is quoted so user input cannot inject FTS5 syntax; the
+    words are implicitly AND-ed.
+    """
+    terms = [
+        '"' + term.replace('"', '""') + '"' for term in query.split()
+    ]
+    return ' '.join(terms)
+
+
+def _highlight_html(value):
+    return html.escape(value).replace(
+        _MARK_OPEN, '<mark>'
+    ).replace(
+        _MARK_CLOSE, '</mark>'
+    )
+
+
+class PostRepository:
+    """
+    Read-side queries for posts.
+
+    Returns PostRow projections instead of ORM instances, so reading the feed
+    neither fills the identity map nor triggers lazy author loads.
+    """
+    def __init__(self, session):
+        self.session = session
+
+    @staticmethod
+    def _row_select():
+        return select(
+            Post.id, Post.title, Post.excerpt, Post.word_count,
+            Post.reading_time, Post.created_at, Post.user_id, User.username
+        ).outerjoin(
+            User, Post.user_id == User.id
+        )
+
+    def get_post(self, post_id):
+        """Return the PostRow for one post, or None."""
+        row = self.session.execute(
+            self._row_select().where(Post.id == post_id)
+        ).first()
+        return PostRow(*row) if row else None
+
+    def get_posts(self, post_ids):
+        """Return the PostRows of post_ids in the same order, in one query."""
+        rows = {
+            row.id: PostRow(*row) for row in self.session.execute(
+                self._row_select().where(Post.id.in_(post_ids))
+            )
+        }
+        return [rows[post_id] for post_id in post_ids if post_id in rows]
+
+    def post_body(self, post_id):
+        """
+        Return the rendered HTML body of one post, or None.
+
+        Rows written before content_html existed are rendered here.
+        """
+        row = self.session.execute(
+            select(Post.content_html, Post.content).where(Post.id == post_id)
+        ).first()
+        if row is None:
+            return None
+        return row.content_html or render_markdown(row.content)
+
+    def feed_page(self, page_size, cursor=None, tag=None, month=None):
+        """
+        Fetch one page of the feed, newest first, in a single statement.
+
+        The cursor is the (created_at, id) of the last row on the previous
+        page, so the query walks ix_posts_created_at_id instead of using
+        OFFSET. With a tag name the page is seeked on
+        ix_post_tags_tag_id_created_at instead. A 'YYYY-MM' month bounds
+        created_at on the same index. Returns the rows and whether older
+        posts exist.
+        """
+        if tag is None:
+            created_at, post_id = Post.created_at, Post.id
+            stmt = self._row_select()
+        else:
+            created_at, post_id = post_tags.c.created_at, post_tags.c.post_id
+            tag_id = select(Tag.id).where(Tag.name == tag).scalar_subquery()
+            stmt = self._row_select().join(
+                post_tags, post_tags.c.post_id == Post.id
+            ).where(post_tags.c.tag_id == tag_id)
+        stmt = stmt.order_by(created_at.desc(), post_id.desc())
+        if month is not None:
+            start, end = month_range(month)
+            stmt = stmt.where(created_at >= start, created_at < end)
+        if cursor is not None:
+            stmt = stmt.where(tuple_(created_at, post_id) < cursor)
+        rows = self.session.execute(stmt.limit(page_size + 1)).all()
+        posts = [PostRow(*row) for row in rows[:page_size]]
+        return posts, len(rows) > page_size
+
+    def attachments_for_posts(self, post_ids):
+        """Return {post_id: (AttachmentRow...)} in upload order."""
+        attachments = {}
+        if not post_ids:
+            return attachments
+        rows = self.session.execute(
+            select(
+                Attachment.post_id, Attachment.id, Attachment.digest,
+                Attachment.filename
+            ).where(
+                Attachment.post_id.in_(post_ids)
+            ).order_by(Attachment.post_id, Attachment.id)
+        ).all()
+        for post_id, *row in rows:
+            attachments.setdefault(post_id, []).append(AttachmentRow(*row))
+        return {post_id: tuple(rows) for post_id, rows in attachments.items()}
+
+    def archive_months(self):
+        """
+        Return the months that have posts, newest first.
+
+        Reads the trigger-maintained post_archive table, which has one row
+        per month, instead of grouping posts.created_at.
+        """
+        rows = self.session.execute(
+            select(post_archive.c.month, post_archive.c.post_count).where(
+                post_archive.c.post_count > 0
+            ).order_by(post_archive.c.month.desc())
+        ).all()
+        return [ArchiveMonth(*row) for row in rows]
+
+    def search(self, query, page_size, cursor=None):
+        """
+        Full-text search over post titles and contents, best match first.
+
+        Results are ranked by bm25 and paged with a (rank, id) cursor taken
+        from the last result of the previous page. Returns the results and
+        whether more results exist.
+        """
+        match = build_match_query(query)
+        if not match:
+            return [], False
+        where = "posts_fts MATCH :match"
+        params = {
+            'match': match, 'open': _MARK_OPEN, 'close': _MARK_CLOSE,
+            'limit': page_size + 1,
+        }
+        if cursor is not None:
+            where += " AND (posts_fts.rank, posts_fts.rowid) > (:rank, :id)"
+            params['rank'], params['id'] = cursor
+        stmt = text(f"""
+            SELECT posts_fts.rowid,
+                   highlight(posts_fts, 0, :open, :close),
+                   snippet(posts_fts, 1, :open, :close, '…', 24),
+                   posts.created_at,
+                   users.username,
+                   posts_fts.rank
+            FROM posts_fts
+            JOIN posts ON posts.id = posts_fts.rowid
+            LEFT JOIN users ON users.id = posts.user_id
+            WHERE {where}
+            ORDER BY posts_fts.rank, posts_fts.rowid
+            LIMIT :limit
+        """).columns(created_at=DateTime)
+        rows = self.session.execute(stmt, params).all()
+        results = [
+            SearchResult(
+                id=row[0],
+                title_html=_highlight_html(row[1]),
+                snippet_html=_highlight_html(row[2]),
+                created_at=row[3],
+                author_name=row[4],
+                rank=row[5],
+            )
+            for row in rows[:page_size]
+        ]
+        return results, len(rows) > page_size
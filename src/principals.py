@@ -0,0 +1,129 @@
+import base64
+import dataclasses
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from cachetools import TTLCache
+from sqlalchemy import select
+from src.models import User
+
+PRINCIPAL_CACHE_SIZE = 1024
+# アプリの外 (manage.py など) での削除もこの秒数以内に反映される
+PRINCIPAL_TTL = 300
+TOKEN_MAX_AGE = 7 * 24 * 60 * 60
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    The signed-in user as the app sees it: plain values, no ORM state.
+    """
+    id: int
+    username: str
+    is_admin: bool
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, bool(user.is_admin))
+
+
+class PrincipalStore:
+    """
+    Issues signed session tokens and maps them back to principals.
+
+    Streamlit sessions keep only the token. Principals are held in a
+    process-wide TTL/LRU cache keyed by user id, so resolving the token
+    on a rerun normally costs no query; a miss loads one users row.
+    Deleting users must call invalidate() so their sessions end.
+    """
+    def __init__(self, secret=None, maxsize=PRINCIPAL_CACHE_SIZE,
+                 ttl=PRINCIPAL_TTL, max_age=TOKEN_MAX_AGE):
+        # 未設定ならプロセスごとの鍵 (セッション自体もプロセス内にしかない)
+        self.secret = (
+            secret or os.getenv('BLOG_SECRET_KEY', '').encode()
+            or secrets.token_bytes(32)
+        )
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._principals = TTLCache(maxsize, ttl)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _signature(self, user_id, username, issued):
+        # ユーザー名も署名に含め、idが再利用されても別人として扱う
+        payload = f'{user_id}.{username}.{issued}'.encode()
+        digest = hmac.new(self.secret, payload, hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+    def issue(self, principal):
+        """Cache principal and return a token for its session."""
+        with self._lock:
+            self._principals[principal.id] = principal
+        issued = int(time.time())
+        signature = self._signature(principal.id, principal.username, issued)
+        return f'{principal.id}.{issued}.{signature}'
+
+    def resolve(self, token, session):
+        """
+        Return the Principal of token, or None if the token is invalid or
+        expired or its user no longer exists.
+        """
+        try:
+            user_id, issued, signature = token.split('.')
+            user_id, issued = int(user_id), int(issued)
+        except (AttributeError, ValueError):
+            return None
+        if time.time() - issued > self.max_age:
+            return None
+        principal = self._principal(user_id, session)
+        if principal is None or not hmac.compare_digest(
+            signature, self._signature(user_id, principal.username, issued)
+        ):
+            return None
+        return principal
+
+    def _principal(self, user_id, session):
+        with self._lock:
+            principal = self._principals.get(user_id)
+            generation = self._generation
+            if principal is not None:
+                self.hits += 1
+                return principal
+            self.misses += 1
+
+        row = session.execute(
+            select(User.id, User.username, User.is_admin)
+            .where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        principal = Principal(row.id, row.username, bool(row.is_admin))
+        with self._lock:
+            # 読み込み中に無効化されていたら古い値をキャッシュしない
+            if generation == self._generation:
+                self._principals[user_id] = principal
+        return principal
+
+    def invalidate(self, user_ids):
+        """Forget cached principals, e.g. after deleting their users."""
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                self._principals.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._principals),
+                'maxsize': self._principals.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# 全セッションで共有する
+principal_store = PrincipalStore()
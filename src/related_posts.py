@@ -0,0 +1,293 @@
+import json
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from sqlalchemy import select
+from src.models import Post, post_index_changes
+
+# ハッシュで単語を割り当てる次元数 (2の累乗)。10万件で約200MB
+DIMENSIONS = 512
+INITIAL_CAPACITY = 1024
+SYNC_BATCH_SIZE = 500
+DEFAULT_RELATED = 5
+# タイトルの単語は本文より重く数える
+TITLE_WEIGHT = 3
+# 重み付きノルムをまとめて計算する行数 (一時配列の大きさを抑える)
+NORM_CHUNK = 16384
+
+_WORD = re.compile(r'\w+')
+
+
+def vectorize(title, content, dimensions=DIMENSIONS):
+    """
+    Hash the words of a post into a unit-length float32 vector.
+
+    Each word adds 1 + log(count) to one of dimensions buckets, with a
+    sign taken from the same hash so that collisions tend to cancel out
+    instead of piling up. crc32 keeps the buckets stable across processes.
+    """
+    # numpyは読み込みに時間がかかるので、使うときに読み込む
+    import numpy as np
+
+    counts = Counter(_WORD.findall(content.lower()))
+    for word in _WORD.findall(title.lower()):
+        counts[word] += TITLE_WEIGHT
+    vector = np.zeros(dimensions, np.float32)
+    if not counts:
+        return vector
+    hashes = np.fromiter(
+        (zlib.crc32(word.encode()) for word in counts), np.uint32,
+        len(counts)
+    )
+    counted = np.fromiter(counts.values(), np.float32, len(counts))
+    weights = 1 + np.log(counted)
+    signs = np.where(hashes & 0x80000000, 1, -1).astype(np.float32)
+    np.add.at(vector, hashes % dimensions, signs * weights)
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+
+class RelatedIndex:
+    """
+    Hashed TF-IDF vectors of all posts for "related posts" lookups.
+
+    The vectors are one float32 matrix with a row per post, stored under
+    root as .npy files and memory-mapped when loaded, so starting the app
+    does not read the whole index. Triggers record every changed post in
+    post_index_changes; sync() applies only the changes since the last
+    one. IDF weights come from per-bucket document counts kept alongside
+    and are applied when querying, so an update never rewrites other rows.
+    Without a root the index lives in memory only.
+    """
+    def __init__(self, root=None, dimensions=DIMENSIONS):
+        self.root = root
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def _array(self, name, shape, dtype):
+        import numpy as np
+        from numpy.lib.format import open_memmap
+
+        if self.root is None:
+            return np.zeros(shape, dtype)
+        os.makedirs(self.root, exist_ok=True)
+        temporary = self._path(name + '.tmp')
+        array = open_memmap(temporary, 'w+', dtype, shape)
+        array.flush()
+        os.replace(temporary, self._path(name))
+        return array
+
+    def _load(self):
+        if self._loaded:
+            return
+        import numpy as np
+
+        self._loaded = True
+        if self.root is not None:
+            try:
+                with open(self._path('state.json')) as f:
+                    state = json.load(f)
+                vectors = np.load(self._path('vectors.npy'), mmap_mode='r+')
+                post_ids = np.load(self._path('post_ids.npy'), mmap_mode='r+')
+            except (OSError, ValueError):
+                state = None
+            # 途中で止まった拡張などで形が合わなければ作り直す
+            if state and state['dimensions'] == self.dimensions and (
+                vectors.shape == (len(post_ids), self.dimensions)
+            ):
+                self._open(vectors, post_ids, state['seq'],
+                           np.array(state['df'], np.int64))
+                return
+        self.reset()
+
+    def _open(self, vectors, post_ids, seq, df):
+        import numpy as np
+
+        self.vectors = vectors
+        self.post_ids = post_ids
+        self.seq = seq
+        self.df = df
+        self.rows = {
+            int(post_id): row
+            for row, post_id in enumerate(post_ids) if post_id
+        }
+        # 小さい行から使うよう逆順に積む。使用中の行は先頭に詰まる
+        self.free = np.flatnonzero(post_ids == 0)[::-1].tolist()
+        self.end = max(self.rows.values(), default=-1) + 1
+        self._norms = None
+
+    def reset(self):
+        """Empty the index; the next sync() re-reads every post."""
+        import numpy as np
+
+        self._loaded = True
+        self._open(
+            self._array('vectors.npy', (INITIAL_CAPACITY, self.dimensions),
+                        np.float32),
+            self._array('post_ids.npy', (INITIAL_CAPACITY,), np.int64),
+            0, np.zeros(self.dimensions, np.int64),
+        )
+        self._save()
+
+    def _save(self):
+        if self.root is None:
+            return
+        self.vectors.flush()
+        self.post_ids.flush()
+        # 行を書いてから状態を置き換える。途中で止まっても同じ変更を
+        # 適用し直すだけで済む
+        temporary = self._path('state.json.tmp')
+        with open(temporary, 'w') as f:
+            json.dump({'dimensions': self.dimensions, 'seq': self.seq,
+                       'df': self.df.tolist()}, f)
+        os.replace(temporary, self._path('state.json'))
+
+    def _grow(self):
+        import numpy as np
+
+        capacity = len(self.post_ids)
+        vectors = self._array(
+            'vectors.npy', (capacity * 2, self.dimensions), np.float32
+        )
+        vectors[:capacity] = self.vectors
+        post_ids = self._array('post_ids.npy', (capacity * 2,), np.int64)
+        post_ids[:capacity] = self.post_ids
+        self.vectors, self.post_ids = vectors, post_ids
+        self.free.extend(range(capacity * 2 - 1, capacity - 1, -1))
+
+    def _put(self, post_id, vector):
+        row = self.rows.get(post_id)
+        if row is None:
+            if not self.free:
+                self._grow()
+            row = self.free.pop()
+            self.rows[post_id] = row
+            self.post_ids[row] = post_id
+            self.end = max(self.end, row + 1)
+        else:
+            self.df -= self.vectors[row] != 0
+        self.vectors[row] = vector
+        self.df += vector != 0
+
+    def _remove(self, post_id):
+        row = self.rows.pop(post_id, None)
+        if row is None:
+            return
+        self.df -= self.vectors[row] != 0
+        self.vectors[row] = 0
+        self.post_ids[row] = 0
+        self.free.append(row)
+
+    def sync(self, session):
+        """
+        Apply the posts created, edited or deleted since the last sync and
+        return how many were applied. Costs one indexed query when nothing
+        changed.
+        """
+        with self._lock:
+            self._load()
+            applied = 0
+            while True:
+                changes = session.execute(
+                    select(post_index_changes.c.post_id,
+                           post_index_changes.c.seq)
+                    .where(post_index_changes.c.seq > self.seq)
+                    .order_by(post_index_changes.c.seq)
+                    .limit(SYNC_BATCH_SIZE)
+                ).all()
+                if not changes:
+                    break
+                post_ids = [change.post_id for change in changes]
+                posts = {
+                    row.id: row for row in session.execute(
+                        select(Post.id, Post.title, Post.content)
+                        .where(Post.id.in_(post_ids))
+                    )
+                }
+                for post_id in post_ids:
+                    post = posts.get(post_id)
+                    if post is None:
+                        self._remove(post_id)
+                    else:
+                        self._put(post_id, vectorize(
+                            post.title, post.content, self.dimensions
+                        ))
+                self.seq = changes[-1].seq
+                applied += len(changes)
+            if applied:
+                self._norms = None
+                self._save()
+            return applied
+
+    def _weighted_norms(self, weights):
+        import numpy as np
+
+        if self._norms is None:
+            norms = np.empty(self.end, np.float32)
+            for start in range(0, self.end, NORM_CHUNK):
+                block = self.vectors[start:min(start + NORM_CHUNK, self.end)]
+                norms[start:start + NORM_CHUNK] = np.sqrt(
+                    (block * block) @ weights
+                )
+            self._norms = norms
+        return self._norms
+
+    def related(self, session, post_id, k=DEFAULT_RELATED):
+        """
+        Return up to k (post_id, score) pairs for the posts most similar
+        to post_id, best first.
+
+        The score is the cosine similarity of the IDF-weighted vectors,
+        computed for every post with one matrix-vector product over the
+        used rows.
+        """
+        import numpy as np
+
+        self.sync(session)
+        with self._lock:
+            row = self.rows.get(post_id)
+            k = min(k, len(self.rows) - 1)
+            if row is None or k <= 0:
+                return []
+            idf = np.log(
+                (1 + len(self.rows)) / (1 + self.df)
+            ).astype(np.float32) + 1
+            weights = idf * idf
+            norms = self._weighted_norms(weights)
+            if not norms[row]:
+                return []
+            vectors = np.asarray(self.vectors[:self.end])
+            scores = vectors @ (vectors[row] * weights)
+            np.divide(scores, norms * norms[row], out=scores,
+                      where=norms > 0)
+            scores[self.post_ids[:self.end] == 0] = -np.inf
+            scores[row] = -np.inf
+            top = np.argpartition(scores, -k)[-k:]
+            top = top[np.argsort(scores[top])[::-1]]
+            return [
+                (int(self.post_ids[i]), float(scores[i]))
+                for i in top if scores[i] > 0
+            ]
+
+
+_related_index = None
+_related_index_lock = threading.Lock()
+
+
+def get_related_index():
+    """Return the process-wide index stored under BLOG_RELATED_DIR."""
+    global _related_index
+    with _related_index_lock:
+        if _related_index is None:
+            _related_index = RelatedIndex(
+                os.getenv('BLOG_RELATED_DIR', 'related_index')
+            )
+        return _related_index
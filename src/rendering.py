@@ -0,0 +1,55 @@
+import html
+import math
+import re
+
+EXCERPT_LENGTH = 280
+WORDS_PER_MINUTE = 200
+
+_TAG = re.compile(r'<[^>]+>')
+
+_markdown = None
+
+
+def render_markdown(content):
+    """
+    Render post Markdown to sanitized HTML.
+
+    Called once when a post is written; the feed displays the stored
+    result instead of parsing Markdown on every rerun.
+    """
+    global _markdown
+    if _markdown is None:
+        # 初回のレンダリングまで markdown_it を読み込まない
+        from markdown_it import MarkdownIt
+        # 生のHTMLは無効化してエスケープする (javascript: などのリンクも拒否される)
+        _markdown = MarkdownIt('commonmark', {'html': False})
+    return _markdown.render(content or '')
+
+
+def summarize(content_html):
+    """
+    Build the (excerpt, word_count, reading_time) shown in the feed.
+
+    The excerpt is plain text cut at a word boundary; reading_time is in
+    minutes.
+    """
+    plain = ' '.join(html.unescape(_TAG.sub(' ', content_html)).split())
+    word_count = len(plain.split())
+    reading_time = max(1, math.ceil(word_count / WORDS_PER_MINUTE))
+    if len(plain) > EXCERPT_LENGTH:
+        plain = plain[:EXCERPT_LENGTH].rsplit(' ', 1)[0] + '…'
+    return plain, word_count, reading_time
+
+
+def render_post(content):
+    """
+    Compute every column derived from a post body at write time.
+    """
+    content_html = render_markdown(content)
+    excerpt, word_count, reading_time = summarize(content_html)
+    return {
+        'content_html': content_html,
+        'excerpt': excerpt,
+        'word_count': word_count,
+        'reading_time': reading_time,
+    }
@@ -0,0 +1,255 @@
+import dataclasses
+import datetime
+import json
+import re
+from difflib import SequenceMatcher
+from sqlalchemy import delete, func, select
+from src.models import DraftChange, Post, PostRevision
+
+# 単語 (と後ろの空白) 単位で差分を取る。連結すると元の文字列に戻る
+_TOKEN = re.compile(r'\S+\s*|\s+')
+# 差分をこの数だけ辿ったら全文を保存する (復元にかかる手間の上限)
+MAX_CHAIN_LENGTH = 500
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class RevisionRow:
+    """
+    An earlier version of a post, without its content.
+    """
+    number: int
+    title: str
+    created_at: datetime.datetime
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Draft:
+    """
+    The last autosaved state of a user's unpublished post.
+    """
+    number: int
+    title: str
+    content: str
+
+
+def tokenize(text):
+    return _TOKEN.findall(text)
+
+
+def make_delta(old, new):
+    """
+    Encode new as word edits of old.
+
+    The result is a compact JSON list: a positive number copies that many
+    words of old, a negative number skips them and a string is inserted.
+    """
+    a, b = tokenize(old), tokenize(new)
+    # 編集は局所的なことが多いので、共通の先頭と末尾は比較せずに写す
+    shortest = min(len(a), len(b))
+    head = 0
+    while head < shortest and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < shortest - head and a[-1 - tail] == b[-1 - tail]:
+        tail += 1
+    ops = [head] if head else []
+    matcher = SequenceMatcher(
+        None, a[head:len(a) - tail], b[head:len(b) - tail], autojunk=False
+    )
+    middle = matcher.b
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append(''.join(middle[j1:j2]))
+    if tail:
+        ops.append(tail)
+    return json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+
+
+def _apply(tokens, delta):
+    result = []
+    position = 0
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            # 挿入は単語の区切りに揃っているので分割しても同じ単語列になる
+            result.extend(tokenize(op))
+        elif op > 0:
+            result.extend(tokens[position:position + op])
+            position += op
+        else:
+            position -= op
+    return result
+
+
+def apply_delta(old, delta):
+    """Rebuild the text that make_delta(old, ...) was given."""
+    return ''.join(_apply(tokenize(old), delta))
+
+
+def _needs_snapshot(chain_size, chain_length, content):
+    # 差分の合計が全文より大きくなったら全文の方が安い
+    return chain_size > len(content) or chain_length >= MAX_CHAIN_LENGTH
+
+
+def record_post_revision(session, post, title, content):
+    """
+    Keep the current version of post before it is changed to title and
+    content. Call it before assigning the new values; does not commit.
+
+    Versions are stored as diffs that turn the next newer version back
+    into the older one, so the post itself needs no extra copy and an
+    edit only costs the size of what changed. A full snapshot is stored
+    instead once the diffs since the last snapshot add up to more than
+    the text, or MAX_CHAIN_LENGTH of them would have to be applied.
+    """
+    if post.title == title and post.content == content:
+        return None
+    newest = session.execute(
+        select(PostRevision.number, PostRevision.is_snapshot,
+               PostRevision.chain_size)
+        .where(PostRevision.post_id == post.id)
+        .order_by(PostRevision.number.desc()).limit(1)
+    ).first()
+    number = newest.number + 1 if newest else 1
+    last_snapshot = session.execute(
+        select(func.max(PostRevision.number)).where(
+            PostRevision.post_id == post.id, PostRevision.is_snapshot
+        )
+    ).scalar() or 0
+    delta = make_delta(content, post.content)
+    chain_size = len(delta)
+    if newest and not newest.is_snapshot:
+        chain_size += newest.chain_size
+    revision = PostRevision(post_id=post.id, number=number, title=post.title)
+    if _needs_snapshot(chain_size, number - last_snapshot, post.content):
+        revision.is_snapshot, revision.data = True, post.content
+        revision.chain_size = 0
+    else:
+        revision.is_snapshot, revision.data = False, delta
+        revision.chain_size = chain_size
+    session.add(revision)
+    return revision
+
+
+def post_revisions(session, post_id):
+    """Return the earlier versions of a post, newest first."""
+    rows = session.execute(
+        select(PostRevision.number, PostRevision.title,
+               PostRevision.created_at)
+        .where(PostRevision.post_id == post_id)
+        .order_by(PostRevision.number.desc())
+    ).all()
+    return [RevisionRow(*row) for row in rows]
+
+
+def load_post_revision(session, post_id, number):
+    """
+    Rebuild version number of a post; return (title, content) or None.
+
+    Starts from the nearest newer snapshot, or from the post itself, and
+    applies the diffs down to number.
+    """
+    snapshot = session.execute(
+        select(func.min(PostRevision.number)).where(
+            PostRevision.post_id == post_id, PostRevision.is_snapshot,
+            PostRevision.number >= number
+        )
+    ).scalar()
+    query = select(
+        PostRevision.number, PostRevision.title, PostRevision.is_snapshot,
+        PostRevision.data
+    ).where(
+        PostRevision.post_id == post_id, PostRevision.number >= number
+    )
+    if snapshot is not None:
+        query = query.where(PostRevision.number <= snapshot)
+    rows = session.execute(
+        query.order_by(PostRevision.number.desc())
+    ).all()
+    if not rows or rows[-1].number != number:
+        return None
+    if snapshot is None:
+        tokens = tokenize(session.execute(
+            select(Post.content).where(Post.id == post_id)
+        ).scalar_one())
+    for row in rows:
+        if row.is_snapshot:
+            tokens = tokenize(row.data)
+        else:
+            tokens = _apply(tokens, row.data)
+    return rows[-1].title, ''.join(tokens)
+
+
+def load_draft(session, user_id):
+    """Return the autosaved Draft of a user, or None."""
+    snapshot = select(func.max(DraftChange.number)).where(
+        DraftChange.user_id == user_id, DraftChange.is_snapshot
+    ).scalar_subquery()
+    rows = session.execute(
+        select(DraftChange.number, DraftChange.title,
+               DraftChange.is_snapshot, DraftChange.data)
+        .where(DraftChange.user_id == user_id,
+               DraftChange.number >= snapshot)
+        .order_by(DraftChange.number)
+    ).all()
+    if not rows:
+        return None
+    for row in rows:
+        if row.is_snapshot:
+            tokens = tokenize(row.data)
+        else:
+            tokens = _apply(tokens, row.data)
+    return Draft(rows[-1].number, rows[-1].title, ''.join(tokens))
+
+
+def save_draft(session, user_id, title, content, previous=None):
+    """
+    Autosave a draft as a diff against previous, the Draft this session
+    saved or loaded last; return the new Draft. Does not commit.
+
+    A snapshot is written instead when there is no previous save, when
+    another session saved in between or when the diffs have grown past
+    the text, and the changes before it are deleted.
+    """
+    newest = session.execute(
+        select(DraftChange.number, DraftChange.chain_size)
+        .where(DraftChange.user_id == user_id)
+        .order_by(DraftChange.number.desc()).limit(1)
+    ).first()
+    number = newest.number + 1 if newest else 1
+    change = DraftChange(user_id=user_id, number=number, title=title)
+    snapshot = (previous is None or newest is None
+                or newest.number != previous.number)
+    if not snapshot:
+        change.data = make_delta(previous.content, content)
+        change.chain_size = newest.chain_size + len(change.data)
+        # スナップショットより前の変更は削除済み
+        first = session.execute(
+            select(func.min(DraftChange.number))
+            .where(DraftChange.user_id == user_id)
+        ).scalar()
+        snapshot = _needs_snapshot(
+            change.chain_size, number - first, content
+        )
+    if snapshot:
+        change.is_snapshot, change.data, change.chain_size = (
+            True, content, 0
+        )
+        session.execute(delete(DraftChange).where(
+            DraftChange.user_id == user_id, DraftChange.number < number
+        ))
+    else:
+        change.is_snapshot = False
+    session.add(change)
+    return Draft(number, title, content)
+
+
+def discard_draft(session, user_id):
+    """Delete the autosaved draft of a user. Does not commit."""
+    session.execute(
+        delete(DraftChange).where(DraftChange.user_id == user_id)
+    )
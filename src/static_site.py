@@ -0,0 +1,312 @@
+import collections
+import datetime
+import hashlib
+import html
+import json
+import math
+import os
+from sqlalchemy import func, select
+from src.models import User, Post
+
+DEFAULT_PAGE_SIZE = 10
+FEED_SIZE = 20
+BODY_BATCH_SIZE = 500
+STREAM_BATCH_SIZE = 5000
+MANIFEST_NAME = '.manifest.json'
+# テンプレートを変えたら上げる (全ページが書き直される)
+TEMPLATE_VERSION = 1
+
+SITE_TITLE = 'Blog'
+
+
+def _page_name(number):
+    return f'page-{number}.html'
+
+
+def _post_path(post_id):
+    return f'posts/{post_id}.html'
+
+
+def _author(row):
+    return row.author_name or 'deleted user'
+
+
+def _layout(title, body, root=''):
+    return (
+        '<!DOCTYPE html>\n'
+        '<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+        f'<title>{html.escape(title)}</title>\n'
+        '<link rel="alternate" type="application/atom+xml" '
+        f'href="{root}atom.xml">\n'
+        f'</head>\n<body>\n{body}</body>\n</html>\n'
+    )
+
+
+def render_post_page(row, content_html):
+    """Render the standalone page of one post."""
+    body = (
+        f'<p><a href="../index.html">{html.escape(SITE_TITLE)}</a></p>\n'
+        f'<article>\n<h1>{html.escape(row.title)}</h1>\n'
+        f'<p>Published by {html.escape(_author(row))} on '
+        f'{row.created_at:%Y-%m-%d %H:%M}</p>\n'
+        f'{content_html or ""}</article>\n'
+    )
+    return _layout(row.title, body, root='../')
+
+
+def render_index_page(rows, number, pages):
+    """
+    Render index page `number` of `pages`; rows are oldest first.
+
+    Page 1 holds the oldest posts, so adding a post only changes the
+    newest page and every older page keeps its URL and its content.
+    """
+    cards = []
+    for row in reversed(rows):
+        cards.append(
+            f'<article>\n<h2><a href="{_post_path(row.id)}">'
+            f'{html.escape(row.title)}</a></h2>\n'
+            f'<p>{html.escape(row.excerpt or "")}</p>\n'
+            f'<p>{row.word_count or 0} words · {row.reading_time or 1} min '
+            f'read · Published by {html.escape(_author(row))} on '
+            f'{row.created_at:%Y-%m-%d %H:%M}</p>\n</article>\n'
+        )
+    links = []
+    if number < pages:
+        links.append(f'<a href="{_page_name(number + 1)}">Newer posts</a>')
+    if number > 1:
+        links.append(f'<a href="{_page_name(number - 1)}">Older posts</a>')
+    body = (
+        f'<h1>{html.escape(SITE_TITLE)}</h1>\n' + ''.join(cards)
+        + f'<nav>{" ".join(links)}</nav>\n'
+    )
+    return _layout(SITE_TITLE, body)
+
+
+def _atom_time(value):
+    return value.replace(tzinfo=datetime.timezone.utc).isoformat()
+
+
+def render_atom(rows, bodies, base_url, post_path=_post_path,
+                feed_path='atom.xml'):
+    """
+    Render the Atom feed of the newest posts; rows are newest first.
+
+    post_path(id) and feed_path are joined to base_url for the links.
+    """
+    updated = max(
+        (row.updated_at or row.created_at for row in rows),
+        default=datetime.datetime(1970, 1, 1)
+    )
+    entries = []
+    for row in rows:
+        link = html.escape(base_url + post_path(row.id), quote=True)
+        entries.append(
+            '<entry>\n'
+            f'<id>urn:blog:post:{row.id}</id>\n'
+            f'<title>{html.escape(row.title)}</title>\n'
+            f'<link href="{link}"/>\n'
+            f'<published>{_atom_time(row.created_at)}</published>\n'
+            f'<updated>{_atom_time(row.updated_at or row.created_at)}'
+            '</updated>\n'
+            f'<author><name>{html.escape(_author(row))}</name></author>\n'
+            f'<summary>{html.escape(row.excerpt or "")}</summary>\n'
+            '<content type="html">'
+            f'{html.escape(bodies.get(row.id) or "")}</content>\n'
+            '</entry>\n'
+        )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+        '<id>urn:blog:feed</id>\n'
+        f'<title>{html.escape(SITE_TITLE)}</title>\n'
+        f'<link rel="self" href="{html.escape(base_url + feed_path)}"/>\n'
+        f'<updated>{_atom_time(updated)}</updated>\n'
+        + ''.join(entries) + '</feed>\n'
+    )
+
+
+def _digest(*parts):
+    return hashlib.sha256(
+        '\x1f'.join(str(part) for part in parts).encode('utf-8')
+    ).hexdigest()[:32]
+
+
+def fingerprint(row):
+    """
+    Hash of everything a post contributes to the generated pages.
+
+    updated_at changes whenever the post is written, so the body itself
+    does not have to be read to detect a change.
+    """
+    return _digest(
+        TEMPLATE_VERSION, row.title, row.excerpt, row.word_count,
+        row.reading_time, row.created_at, row.updated_at, row.author_name
+    )
+
+
+def post_select():
+    """Columns of a post needed by the pages and the feed, without body."""
+    return select(
+        Post.id, Post.title, Post.excerpt, Post.word_count,
+        Post.reading_time, Post.created_at, Post.updated_at,
+        Post.user_id, User.username.label('author_name')
+    ).outerjoin(User, Post.user_id == User.id)
+
+
+def post_bodies(connection, post_ids):
+    """Return {id: content_html} for the given posts."""
+    bodies = {}
+    for start in range(0, len(post_ids), BODY_BATCH_SIZE):
+        chunk = post_ids[start:start + BODY_BATCH_SIZE]
+        bodies.update(connection.execute(
+            select(Post.id, Post.content_html).where(Post.id.in_(chunk))
+        ).all())
+    return bodies
+
+
+class StaticSiteExporter:
+    """
+    Write the published posts as static HTML pages and an Atom feed.
+
+    A manifest of per-post and per-page fingerprints is kept next to the
+    files; a later export only rewrites the posts whose fingerprint
+    changed, the index pages containing them, and the feed, and removes
+    the pages of deleted posts.
+    """
+    def __init__(self, engine, output_dir, page_size=DEFAULT_PAGE_SIZE,
+                 base_url=''):
+        self.engine = engine
+        self.output_dir = output_dir
+        self.page_size = page_size
+        self.base_url = base_url.rstrip('/') + '/' if base_url else ''
+        self.written = []
+        self.removed = []
+
+    def _load_manifest(self):
+        try:
+            with open(self._path(MANIFEST_NAME), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _path(self, name):
+        return os.path.join(self.output_dir, name)
+
+    def _replace(self, name, content):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 書き込み途中のファイルを配信しないよう置き換えで反映する
+        temporary = path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temporary, path)
+
+    def _write(self, name, content):
+        self._replace(name, content)
+        self.written.append(name)
+
+    def _remove(self, name):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            return
+        self.removed.append(name)
+
+    def export(self, full=False):
+        """
+        Bring the output directory up to date; return the files written.
+
+        With full=True every file is rewritten regardless of the manifest.
+        """
+        self.written, self.removed = [], []
+        previous = self._load_manifest()
+        # ページ割りが変わった場合も全体を書き直す
+        stale = full or previous.get('page_size') != self.page_size
+        manifest = {} if stale else previous
+        old_posts = manifest.get('posts', {})
+        old_pages = manifest.get('pages', {})
+        posts, pages = {}, {}
+        changed = []
+        newest = collections.deque(maxlen=FEED_SIZE)
+
+        with self.engine.connect() as connection, \
+                self.engine.connect() as body_connection:
+            total = connection.execute(
+                select(func.count()).select_from(Post)
+            ).scalar()
+            page_count = max(1, math.ceil(total / self.page_size))
+            result = connection.execution_options(
+                stream_results=True, yield_per=STREAM_BATCH_SIZE
+            ).execute(
+                post_select().order_by(Post.created_at, Post.id)
+            )
+            page_rows = []
+            number = 1
+            for row in result:
+                key = str(row.id)
+                posts[key] = fingerprint(row)
+                if old_posts.get(key) != posts[key]:
+                    changed.append(row)
+                    if len(changed) == BODY_BATCH_SIZE:
+                        self._export_posts(body_connection, changed)
+                        changed = []
+                newest.append(row)
+                page_rows.append(row)
+                if len(page_rows) == self.page_size:
+                    self._export_page(number, page_count, page_rows,
+                                      old_pages, pages, posts)
+                    page_rows = []
+                    number += 1
+            if page_rows or total == 0:
+                self._export_page(number, page_count, page_rows,
+                                  old_pages, pages, posts)
+
+            self._export_posts(body_connection, changed)
+
+            feed_rows = list(reversed(newest))
+            feed = _digest(self.base_url,
+                           *(posts[str(row.id)] for row in feed_rows))
+            if manifest.get('feed') != feed:
+                bodies = post_bodies(body_connection,
+                                     [row.id for row in feed_rows])
+                self._write('atom.xml',
+                            render_atom(feed_rows, bodies, self.base_url))
+
+        top = str(page_count)
+        index = _digest(page_count, pages[top])
+        if manifest.get('index') != index:
+            with open(self._path(_page_name(page_count)),
+                      encoding='utf-8') as f:
+                self._write('index.html', f.read())
+
+        for key in previous.get('posts', {}).keys() - posts.keys():
+            self._remove(_post_path(key))
+        for key in previous.get('pages', {}).keys() - pages.keys():
+            self._remove(_page_name(key))
+
+        self._replace(MANIFEST_NAME, json.dumps({
+            'page_size': self.page_size,
+            'posts': posts,
+            'pages': pages,
+            'feed': feed,
+            'index': index,
+        }))
+        return self.written
+
+    def _export_posts(self, connection, rows):
+        bodies = post_bodies(connection, [row.id for row in rows])
+        for row in rows:
+            self._write(_post_path(row.id),
+                        render_post_page(row, bodies.get(row.id)))
+
+    def _export_page(self, number, page_count, rows, old_pages, pages,
+                     posts):
+        key = str(number)
+        pages[key] = _digest(
+            TEMPLATE_VERSION, number < page_count, number > 1,
+            *(posts[str(row.id)] for row in rows)
+        )
+        if old_pages.get(key) != pages[key]:
+            self._write(_page_name(number),
+                        render_index_page(rows, number, page_count))
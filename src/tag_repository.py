@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+from sqlalchemy import select
+from src.models import Tag, post_tags
+
+TAG_CLOUD_SIZE = 50
+
+
+@dataclass(frozen=True, slots=True)
+class TagRow:
+    """
+    Read-only projection of a tag with its post count.
+    """
+    name: str
+    post_count: int
+
+
+class TagRepository:
+    """
+    Read-side queries for tags.
+    """
+    def __init__(self, session):
+        self.session = session
+
+    def tag_cloud(self, limit=TAG_CLOUD_SIZE):
+        """
+        Return the limit most used tags, alphabetically.
+
+        Counts are read from tags.post_count, which triggers keep current,
+        so this walks ix_tags_post_count instead of counting post_tags.
+        """
+        rows = self.session.execute(
+            select(Tag.name, Tag.post_count).where(
+                Tag.post_count > 0
+            ).order_by(Tag.post_count.desc(), Tag.id.desc()).limit(limit)
+        ).all()
+        return sorted((TagRow(*row) for row in rows), key=lambda t: t.name)
+
+    def tags_for_posts(self, post_ids):
+        """Return {post_id: (tag names...)} for the given posts."""
+        tags = {}
+        if not post_ids:
+            return tags
+        rows = self.session.execute(
+            select(post_tags.c.post_id, Tag.name).join(
+                Tag, Tag.id == post_tags.c.tag_id
+            ).where(
+                post_tags.c.post_id.in_(post_ids)
+            ).order_by(post_tags.c.post_id, Tag.name)
+        ).all()
+        for post_id, name in rows:
+            tags.setdefault(post_id, []).append(name)
+        return {post_id: tuple(names) for post_id, names in tags.items()}
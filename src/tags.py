@@ -0,0 +1,68 @@
+import re
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models import Tag, post_tags
+
+MAX_TAGS = 10
+MAX_TAG_LENGTH = 30
+
+_SEPARATOR = re.compile(r'[,\n]')
+
+
+def normalize_tag(name):
+    """Lower-case a tag, drop a leading '#' and join words with '-'."""
+    name = '-'.join(name.strip().lstrip('#').lower().split())
+    return name[:MAX_TAG_LENGTH]
+
+
+def parse_tags(value):
+    """
+    Split comma-separated tag input into unique normalized names, keeping
+    the given order and at most MAX_TAGS.
+    """
+    names = []
+    for part in _SEPARATOR.split(value or ''):
+        name = normalize_tag(part)
+        if name and name not in names:
+            names.append(name)
+    return names[:MAX_TAGS]
+
+
+def _tag_ids(session, names):
+    """Return {name: id}, creating the tags that do not exist yet."""
+    if not names:
+        return {}
+    # 同時に同じタグが作られても一意制約違反にならないようにする
+    session.execute(
+        sqlite_insert(Tag).values([
+            {'name': name, 'post_count': 0} for name in names
+        ]).on_conflict_do_nothing(index_elements=['name'])
+    )
+    return dict(session.execute(
+        select(Tag.name, Tag.id).where(Tag.name.in_(names))
+    ).all())
+
+
+def set_post_tags(session, post, names):
+    """
+    Replace the tags of a flushed post with names.
+
+    Only the difference is written; tags.post_count follows through the
+    post_tags triggers. Does not commit.
+    """
+    ids = _tag_ids(session, names)
+    current = set(session.execute(
+        select(post_tags.c.tag_id).where(post_tags.c.post_id == post.id)
+    ).scalars())
+    wanted = set(ids.values())
+    if current - wanted:
+        session.execute(delete(post_tags).where(
+            post_tags.c.post_id == post.id,
+            post_tags.c.tag_id.in_(current - wanted)
+        ))
+    if wanted - current:
+        session.execute(insert(post_tags), [
+            {'post_id': post.id, 'tag_id': tag_id,
+             'created_at': post.created_at}
+            for tag_id in wanted - current
+        ])
@@ -0,0 +1,92 @@
+import os
+import secrets
+from sqlalchemy import delete, select, update
+from src.models import User, Post
+
+# 削除したユーザーの投稿の扱い
+CASCADE = 'cascade'        # 投稿も削除する
+REASSIGN = 'reassign'      # 退会済みアカウントに付け替える
+ANONYMIZE = 'anonymize'    # 投稿は残し、作成者をNULLにする
+POLICIES = (ANONYMIZE, REASSIGN, CASCADE)
+
+TOMBSTONE_USERNAME = 'deleted-user'
+
+
+def default_policy():
+    policy = os.getenv('BLOG_USER_DELETION_POLICY', ANONYMIZE)
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown user deletion policy: {policy}")
+    return policy
+
+
+def tombstone_user_id(session):
+    """
+    Return the id of the tombstone account, creating it if needed.
+
+    The account is found by its is_tombstone flag, not its name, so a user
+    who registered the same name cannot receive reassigned posts.
+    """
+    user_id = session.execute(
+        select(User.id).where(User.is_tombstone.is_(True))
+    ).scalar()
+    if user_id is None:
+        username = TOMBSTONE_USERNAME
+        if session.execute(
+            select(User.id).where(User.username == username)
+        ).first():
+            # 名前が予約される前に登録されたアカウントとは別にする
+            username = f"{TOMBSTONE_USERNAME}-{secrets.token_hex(4)}"
+        # 誰も知らないパスワードでログインできないようにする
+        tombstone = User(
+            username=username,
+            password_hash=User.hash_password(secrets.token_urlsafe(32)),
+            is_admin=False,
+            is_tombstone=True,
+        )
+        session.add(tombstone)
+        session.flush()
+        user_id = tombstone.id
+    return user_id
+
+
+def delete_users(session, user_ids, policy=None):
+    """
+    Delete users and deal with their posts using set-based statements.
+
+    The posts are updated or deleted with one statement, then the users are
+    deleted with another, so the cost does not depend on how many posts
+    the users wrote. Nothing is committed; the caller owns the
+    transaction. Returns the number of users deleted.
+    """
+    policy = policy or default_policy()
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown user deletion policy: {policy}")
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+
+    owned_posts = Post.user_id.in_(user_ids)
+    if policy == CASCADE:
+        session.execute(
+            delete(Post).where(owned_posts),
+            execution_options={'synchronize_session': False},
+        )
+    else:
+        if policy == REASSIGN:
+            new_owner = tombstone_user_id(session)
+            # 退会済みアカウント自体は削除しない
+            user_ids = [uid for uid in user_ids if uid != new_owner]
+            owned_posts = Post.user_id.in_(user_ids)
+        else:
+            new_owner = None
+        session.execute(
+            update(Post).where(owned_posts).values(user_id=new_owner),
+            execution_options={'synchronize_session': False},
+        )
+    result = session.execute(
+        delete(User).where(User.id.in_(user_ids)),
+        execution_options={'synchronize_session': False},
+    )
+    # 読み込み済みのオブジェクトを古い状態のまま使わない
+    session.expire_all()
+    return result.rowcount
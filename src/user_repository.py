@@ -0,0 +1,71 @@
+import datetime
+from dataclasses import dataclass
+from sqlalchemy import func, select
+from src.models import User, Post
+
+# 前方一致検索の上限 (これより大きい文字は存在しない)
+_MAX_CHAR = '\U0010ffff'
+
+
+@dataclass(frozen=True, slots=True)
+class UserRow:
+    """
+    Read-only projection of a user with aggregated post statistics.
+    """
+    id: int
+    username: str
+    is_admin: bool
+    post_count: int
+    last_post_at: datetime.datetime | None
+
+
+class UserRepository:
+    """
+    Read-side queries for the user management page.
+    """
+    def __init__(self, session):
+        self.session = session
+
+    def get_user(self, user_id):
+        """Return the UserRow of one user, or None."""
+        row = self.session.execute(
+            select(
+                User.id, User.username, User.is_admin,
+                func.count(Post.id), func.max(Post.created_at)
+            ).outerjoin(
+                Post, Post.user_id == User.id
+            ).where(
+                User.id == user_id
+            ).group_by(User.id, User.username, User.is_admin)
+        ).first()
+        return UserRow(*row) if row else None
+
+    def user_page(self, page_size, prefix='', cursor=None):
+        """
+        Fetch one page of users ordered by username, in one statement.
+
+        prefix is matched as a range on the unique username index, and the
+        cursor is the last username of the previous page. Post counts and
+        last-post dates are aggregated only for the users of the page.
+        Returns the rows and whether more users exist.
+        """
+        users = select(User.id, User.username, User.is_admin)
+        if prefix:
+            users = users.where(
+                User.username >= prefix, User.username < prefix + _MAX_CHAR
+            )
+        if cursor is not None:
+            users = users.where(User.username > cursor)
+        page = users.order_by(User.username).limit(page_size + 1).subquery()
+
+        stmt = select(
+            page.c.id, page.c.username, page.c.is_admin,
+            func.count(Post.id), func.max(Post.created_at)
+        ).outerjoin(
+            Post, Post.user_id == page.c.id
+        ).group_by(
+            page.c.id, page.c.username, page.c.is_admin
+        ).order_by(page.c.username)
+        rows = self.session.execute(stmt).all()
+        users = [UserRow(*row) for row in rows[:page_size]]
+        return users, len(rows) > page_size
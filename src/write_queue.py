@@ -0,0 +1,170 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from src.models import SessionLocal, get_engine
+
+logger = logging.getLogger('blog.write_queue')
+
+DEFAULT_MAXSIZE = 1000
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_PUT_TIMEOUT = 5.0
+DEFAULT_RESULT_TIMEOUT = 30.0
+
+_STOP = object()
+
+
+class WriteQueueFull(Exception):
+    """Raised when the write queue stays full for longer than put_timeout."""
+
+
+class WriteQueue:
+    """
+    Single-writer queue that group-commits database writes.
+
+    Callers submit operations, i.e. functions taking a session, and get a
+    Future. One writer thread drains the queue and runs up to batch_size
+    pending operations in one transaction, each inside a SAVEPOINT so a
+    failing operation only fails its own Future. Futures are resolved after
+    the commit, so a result means the write is durable.
+    """
+    def __init__(self, session_factory, maxsize=DEFAULT_MAXSIZE,
+                 batch_size=DEFAULT_BATCH_SIZE,
+                 put_timeout=DEFAULT_PUT_TIMEOUT):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self.batches = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='blog-writer', daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Finish the pending writes and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def submit(self, operation):
+        """
+        Queue operation(session) and return a Future for its result.
+
+        Blocks for at most put_timeout when the queue is full, then raises
+        WriteQueueFull.
+        """
+        self.start()
+        future = Future()
+        try:
+            self._queue.put((operation, future), timeout=self.put_timeout)
+        except queue.Full:
+            raise WriteQueueFull("Too many pending writes") from None
+        return future
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        while batch[-1] is not _STOP and len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if batch:
+                self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch):
+        session = self.session_factory()
+        done = []
+        try:
+            # 読み取りの前に書き込みロックを取り、途中で他の書き込みに
+            # 先を越されて失敗しないようにする
+            session.connection(
+                execution_options={'sqlite_begin': 'IMMEDIATE'}
+            )
+            for operation, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with session.begin_nested():
+                        result = operation(session)
+                except Exception as error:
+                    future.set_exception(error)
+                else:
+                    done.append((future, result))
+            session.commit()
+        except Exception as error:
+            logger.exception("Group commit failed")
+            session.rollback()
+            for future, _ in done:
+                future.set_exception(error)
+            return
+        finally:
+            session.close()
+            self.batches += 1
+        for future, result in done:
+            future.set_result(result)
+
+
+def run_write(session, writer, operation):
+    """
+    Apply a write operation and commit it.
+
+    Without a writer the operation runs on the caller's session; with one
+    it is queued and this waits for the group commit. Errors raised by the
+    operation are re-raised here, and TimeoutError if the queue does not
+    commit it within DEFAULT_RESULT_TIMEOUT seconds.
+    """
+    if writer is None:
+        # 読み取り中のスナップショットを終え、書き込みロックを取ってから
+        # 始める (古いスナップショットからの書き込みは待たずに失敗する)
+        session.commit()
+        session.connection(execution_options={'sqlite_begin': 'IMMEDIATE'})
+        try:
+            result = operation(session)
+            session.commit()
+        except BaseException:
+            # 書き込みロックを持ったまま描画を続けないよう、すぐに戻す
+            session.rollback()
+            raise
+        return result
+    return writer.submit(operation).result(timeout=DEFAULT_RESULT_TIMEOUT)
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue():
+    """
+    Return the process-wide write queue, or None if BLOG_WRITE_QUEUE=0.
+    """
+    global _write_queue
+    if os.getenv('BLOG_WRITE_QUEUE', '1').lower() in ('0', 'false', 'no'):
+        return None
+    with _write_queue_lock:
+        if _write_queue is None:
+            get_engine()  # SessionLocal をエンジンに結び付ける
+            _write_queue = WriteQueue(SessionLocal).start()
+            atexit.register(_write_queue.stop)
+        return _write_queue
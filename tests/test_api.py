@@ -0,0 +1,119 @@
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from tornado.testing import AsyncHTTPTestCase
+
+from src.api import BLOB_CACHE_CONTROL, make_app
+from src.blob_store import BlobStore
+from src.models import Base, User, Post
+
+
+class APITest(AsyncHTTPTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(
+            f"sqlite:///{os.path.join(self.directory.name, 'blog.db')}"
+        )
+        Base.metadata.create_all(bind=self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        with self.Session() as session:
+            session.add(User(id=1, username='alice', password_hash='x'))
+            start = datetime.datetime(2024, 1, 1)
+            for i in range(1, 4):
+                session.add(Post(
+                    id=i, title=f'Post {i}', content='word ' * 300,
+                    user_id=1, created_at=start + datetime.timedelta(days=i)
+                ))
+            session.commit()
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def get_app(self):
+        self.store = BlobStore(os.path.join(self.directory.name, 'blobs'))
+        return make_app(self.engine, blob_root=self.store.root)
+
+    def get_json(self, path, **kwargs):
+        response = self.fetch(path, **kwargs)
+        return response, json.loads(response.body)
+
+    def test_posts_keyset_pages(self):
+        """Test that /posts pages newest first with a next cursor."""
+        response, first = self.get_json('/posts?limit=2')
+        assert response.code == 200
+        assert [p['id'] for p in first['posts']] == [3, 2]
+        assert first['posts'][0]['author_name'] == 'alice'
+
+        _, second = self.get_json(
+            f"/posts?limit=2&cursor={first['next_cursor']}"
+        )
+        assert [p['id'] for p in second['posts']] == [1]
+        assert second['next_cursor'] is None
+
+    def test_post_and_missing_post(self):
+        """Test that /posts/<id> returns the rendered body and 404s for
+        unknown ids."""
+        response, post = self.get_json('/posts/2')
+        assert post['content_html'].startswith('<p>word word')
+
+        response, error = self.get_json('/posts/99')
+        assert response.code == 404
+        assert error == {'error': 'Post not found'}
+
+    def test_conditional_get(self):
+        """Test that an unchanged version answers 304 and a write changes
+        the ETag."""
+        response = self.fetch('/posts')
+        etag = response.headers['ETag']
+        assert 'Last-Modified' in response.headers
+
+        cached = self.fetch('/posts', headers={'If-None-Match': etag})
+        assert cached.code == 304
+        assert cached.body == b''
+        since = self.fetch('/feed.atom', headers={
+            'If-Modified-Since': response.headers['Last-Modified']
+        })
+        assert since.code == 304
+
+        with self.Session() as session:
+            session.get(Post, 1).title = 'Renamed'
+            session.commit()
+        changed = self.fetch('/posts', headers={'If-None-Match': etag})
+        assert changed.code == 200
+        assert changed.headers['ETag'] != etag
+        assert b'Renamed' in changed.body
+
+    def test_gzip_and_feed(self):
+        """Test that responses are gzipped and the feed links to the API."""
+        response = self.fetch('/feed.atom', decompress_response=False,
+                              headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Content-Type'].startswith(
+            'application/atom+xml'
+        )
+        feed = gzip.decompress(response.body).decode('utf-8')
+        link = f'http://127.0.0.1:{self.get_http_port()}/posts/3'
+        assert f'<link href="{link}"/>' in feed
+
+    def test_blobs_are_immutable(self):
+        """Test that stored files are served with long-lived caching and
+        that other paths under /blobs/ are not served."""
+        digest, _ = self.store.put(io.BytesIO(b'image bytes'))
+
+        response = self.fetch(f'/blobs/{self.store.key(digest)}')
+        assert response.code == 200
+        assert response.body == b'image bytes'
+        assert response.headers['Cache-Control'] == BLOB_CACHE_CONTROL
+
+        assert self.fetch(f'/blobs/{digest}').code == 404
+        missing = self.store.key(digest, 320)
+        assert self.fetch(f'/blobs/{missing}').code == 404
@@ -92,6 +92,13 @@ def test_validate_input(mock_st, session):
     valid = auth_manager.validate_input('user1', 'password1', 'wrong_pass')
     assert valid is False
 
+    # 退会済みアカウントの名前は登録できない
+    valid = auth_manager.validate_input(
+        'deleted-user', 'password1', 'admin_pass'
+    )
+    assert valid is False
+    mock_st.error.assert_called_with("This username is reserved")
+
 
 def test_check_existing_user(session):
     """Test checking if a user already exists."""
@@ -175,3 +182,65 @@ def test_login(mock_check_existing_user, mock_create_user, mock_st, session):
 
     assert 'user' in mock_st.session_state
     assert mock_st.session_state['user'].username == 'testuser'
+
+
+@patch('src.auth_manager.st')
+def test_login_keeps_only_a_token(mock_st, session):
+    """Test that login stores a signed token and that a later rerun
+    resolves it to an immutable principal."""
+    from src.principals import Principal, PrincipalStore
+
+    session.add(User(username='testuser',
+                     password_hash=User.hash_password('password')))
+    session.commit()
+    mock_st.text_input = MagicMock(side_effect=['testuser', 'password'])
+    mock_st.button = MagicMock(return_value=True)
+    mock_st.session_state = {}
+    principals = PrincipalStore(secret=b'secret')
+    auth_manager = AuthManager(session, principals=principals)
+    auth_manager.login()
+
+    token = mock_st.session_state['auth_token']
+    mock_st.session_state = {'auth_token': token}
+    principal = auth_manager.authenticate()
+    assert isinstance(principal, Principal)
+    assert principal.username == 'testuser'
+    assert mock_st.session_state['user'] is principal
+
+    mock_st.session_state['auth_token'] = token + 'x'
+    assert auth_manager.authenticate() is None
+    assert 'auth_token' not in mock_st.session_state
+
+    mock_st.session_state['auth_token'] = token
+    auth_manager.logout()
+    assert mock_st.session_state == {'user': None}
+
+
+@patch('src.auth_manager.st')
+def test_login_upgrades_outdated_hash(mock_st, session, monkeypatch):
+    """Test that login stores a rehash through a write, and that a failed
+    write does not fail the login."""
+    from src import auth_manager as module
+    from src.passwords import PasswordHasher
+    from src.write_queue import WriteQueueFull
+
+    monkeypatch.setattr(module, 'hasher', PasswordHasher(rounds=5))
+    user = User(username='testuser',
+                password_hash=PasswordHasher(rounds=4).hash('password'))
+    session.add(user)
+    session.commit()
+    mock_st.session_state = {}
+
+    writer = MagicMock()
+    writer.submit.side_effect = WriteQueueFull
+    mock_st.text_input = MagicMock(side_effect=['testuser', 'password'])
+    AuthManager(session, writer=writer).login()
+    mock_st.error.assert_not_called()
+    assert mock_st.session_state['user'].username == 'testuser'
+    session.refresh(user)
+    assert user.password_hash.startswith('$2b$04$')
+
+    mock_st.text_input = MagicMock(side_effect=['testuser', 'password'])
+    AuthManager(session).login()
+    session.refresh(user)
+    assert user.password_hash.startswith('$2b$05$')
@@ -0,0 +1,64 @@
+import hashlib
+import io
+import os
+import pytest
+from PIL import Image
+from src import blob_store
+from src.blob_store import BlobStore
+
+
+def _png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BlobStore(str(tmp_path / 'blobs'), max_workers=1)
+    yield store
+    store.shutdown()
+
+
+def test_put_is_content_addressed(store, monkeypatch):
+    """Test that uploads are streamed in chunks, named by their hash and
+    stored once."""
+    monkeypatch.setattr(blob_store, 'CHUNK_SIZE', 4)
+    data = b'0123456789'
+
+    digest, size = store.put(io.BytesIO(data))
+    again, _ = store.put(io.BytesIO(data))
+
+    assert digest == again == hashlib.sha256(data).hexdigest()
+    assert size == 10
+    assert store.key(digest) == f'{digest[:2]}/{digest[2:4]}/{digest}'
+    with open(store.path(digest), 'rb') as f:
+        assert f.read() == data
+    assert list(store.digests()) == [digest]
+    # 一時ファイルは残らない
+    assert not [name for name in os.listdir(store.root)
+                if name.endswith('.upload')]
+
+
+def test_key_rejects_invalid_digest():
+    """Test that only SHA-256 hex digests map to paths."""
+    with pytest.raises(ValueError):
+        BlobStore.key('../../etc/passwd')
+
+
+def test_variants_are_generated_in_background(store):
+    """Test that resized WebP variants are written without upscaling."""
+    digest, _ = store.put(io.BytesIO(_png(800, 400)))
+    assert store.variant(digest, 320) is None
+
+    store.submit_variants(digest).result()
+
+    with Image.open(store.variant(digest, 320)) as image:
+        assert image.format == 'WEBP'
+        assert image.size == (320, 160)
+    with Image.open(store.variant(digest, 1280)) as image:
+        assert image.size == (800, 400)
+
+    store.remove(digest)
+    assert list(store.digests()) == []
+    assert store.variant(digest, 320) is None
@@ -0,0 +1,15 @@
+from unittest.mock import patch
+from src.blog_app import BlogApp
+
+
+@patch('src.blog_app.st')
+def test_page_size_from_environment(mock_st, monkeypatch):
+    """Test that BLOG_PAGE_SIZE sets the page size of the feed."""
+    monkeypatch.setenv('GITHUB_ACTIONS', 'true')
+    monkeypatch.setenv('BLOG_WRITE_QUEUE', '0')
+    monkeypatch.setenv('BLOG_PAGE_SIZE', '25')
+    mock_st.session_state = {}
+
+    app = BlogApp(session=None)
+
+    assert app.post_manager.page_size == 25
@@ -0,0 +1,102 @@
+import threading
+import time
+import pytest
+from sqlalchemy import text
+
+from src.database import (
+    DEFAULT_SETTINGS, create_blog_engine, load_secrets, load_settings
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    settings = dict(DEFAULT_SETTINGS)
+    settings['url'] = f"sqlite:///{tmp_path / 'blog.db'}"
+    # ブロックされた場合にすぐ失敗するよう短くする
+    settings['busy_timeout'] = 200
+    engine = create_blog_engine(settings)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE posts (id INTEGER PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO posts (id) VALUES (1), (2), (3)"))
+    yield engine
+    engine.dispose()
+
+
+def test_load_settings_precedence():
+    """Test that environment variables override secrets and defaults."""
+    settings = load_settings(
+        secrets={'url': 'sqlite:///secret.db', 'busy_timeout': 100},
+        environ={'BLOG_DB_BUSY_TIMEOUT': '250'},
+    )
+
+    assert settings['url'] == 'sqlite:///secret.db'
+    assert settings['busy_timeout'] == 250
+    assert settings['synchronous'] == DEFAULT_SETTINGS['synchronous']
+
+
+def test_pragmas_applied(engine):
+    """Test that pooled connections get the configured pragmas."""
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 200
+        assert conn.execute(text("PRAGMA temp_store")).scalar() == 2
+
+
+def test_writer_not_blocked_by_open_reader(engine):
+    """Test that a commit succeeds while a reader is mid-query."""
+    with engine.connect() as reader:
+        result = reader.execute(text("SELECT id FROM posts ORDER BY id"))
+        assert result.fetchone() == (1,)
+
+        start = time.monotonic()
+        with engine.begin() as writer:
+            writer.execute(text("INSERT INTO posts (id) VALUES (4)"))
+        assert time.monotonic() - start < 0.2
+
+        # 読み取り側は開始時点のスナップショットを読み続ける
+        assert [row[0] for row in result] == [2, 3]
+
+
+def test_reader_not_blocked_by_open_writer(engine):
+    """Test that readers do not stall while a write is in progress."""
+    written = threading.Event()
+    release = threading.Event()
+
+    def write():
+        with engine.begin() as writer:
+            writer.execute(text("INSERT INTO posts (id) VALUES (5)"))
+            written.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    try:
+        assert written.wait(5)
+        start = time.monotonic()
+        with engine.connect() as reader:
+            count = reader.execute(text("SELECT count(*) FROM posts")).scalar()
+        assert time.monotonic() - start < 0.2
+        assert count == 3
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_load_secrets(tmp_path):
+    """Test reading the [Database] section from secrets files."""
+    global_secrets = tmp_path / 'global.toml'
+    global_secrets.write_text(
+        '[Database]\nurl = "sqlite:///global.db"\nbusy_timeout = 100\n'
+    )
+    local_secrets = tmp_path / 'local.toml'
+    local_secrets.write_text(
+        '[AdminPassword]\nadmin_password = "x"\n'
+        '[Database]\nurl = "sqlite:///local.db"\n'
+    )
+
+    secrets = load_secrets(
+        [str(global_secrets), str(local_secrets), str(tmp_path / 'missing')]
+    )
+
+    assert secrets == {'url': 'sqlite:///local.db', 'busy_timeout': 100}
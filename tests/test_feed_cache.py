@@ -0,0 +1,40 @@
+from unittest.mock import MagicMock
+from src.feed_cache import FeedCache
+
+
+def test_get_or_load_hit_and_miss():
+    """Test that a second lookup is served from the cache."""
+    cache = FeedCache()
+    loader = MagicMock(return_value='page')
+
+    assert cache.get_or_load('key', loader) == 'page'
+    assert cache.get_or_load('key', loader) == 'page'
+
+    loader.assert_called_once()
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_bump_invalidates_entries():
+    """Test that bumping the version forces a reload."""
+    cache = FeedCache()
+    cache.get_or_load('key', lambda: 'old')
+
+    cache.bump()
+
+    assert cache.get_or_load('key', lambda: 'new') == 'new'
+    assert cache.version == 1
+
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted first."""
+    cache = FeedCache(maxsize=2)
+    cache.get_or_load('a', lambda: 1)
+    cache.get_or_load('b', lambda: 2)
+    cache.get_or_load('a', lambda: 1)  # aを最近使用にする
+    cache.get_or_load('c', lambda: 3)
+
+    loader = MagicMock(return_value=2)
+    cache.get_or_load('b', loader)
+    loader.assert_called_once()
+    assert cache.stats()['size'] == 2
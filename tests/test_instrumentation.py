@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import create_engine, event, text
+
+from src import instrumentation
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite:///:memory:')
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO items (id) VALUES (1), (2), (3)"))
+    yield engine
+    instrumentation.disable(engine)
+    engine.dispose()
+
+
+@instrumentation.timed
+def load_items(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT id FROM items")).all()
+
+
+def test_rerun_collects_queries_rows_and_timings(engine):
+    """Test that one rerun records queries, rows and entry points."""
+    instrumentation.enable(engine)
+
+    with instrumentation.rerun() as stats:
+        assert load_items(engine) == [(1,), (2,), (3,)]
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM items WHERE id > 1"))
+
+    result = stats.as_dict()
+    assert result['queries'] == 2
+    assert result['rows'] == 5  # 3行の取得 + 2行の削除
+    assert result['wall_ms'] >= result['db_ms'] >= 0
+    assert len(result['slowest']) == 2
+    assert result['timings']['load_items']['calls'] == 1
+    assert instrumentation.current_stats() is None
+
+
+def test_disabled_attaches_nothing(engine):
+    """Test that a disabled app has no cursor hooks and no stats."""
+    assert not event.contains(
+        engine, 'before_cursor_execute',
+        instrumentation._before_cursor_execute
+    )
+    with instrumentation.rerun() as stats:
+        assert stats is None
+        assert load_items(engine) == [(1,), (2,), (3,)]
+
+
+def test_slowest_keeps_top_statements():
+    """Test that only the slowest statements are kept."""
+    stats = instrumentation.RerunStats()
+    for ms in range(10):
+        stats.record_query(f"SELECT {ms}", float(ms))
+
+    slowest = stats.as_dict()['slowest']
+    assert [q['ms'] for q in slowest] == [9.0, 8.0, 7.0, 6.0, 5.0]
+    assert stats.queries == 10
@@ -0,0 +1,136 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+import manage
+
+
+@pytest.fixture
+def legacy_engine(tmp_path, monkeypatch):
+    """A database created before content_html and posts_fts existed."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE posts (id INTEGER PRIMARY KEY, title VARCHAR, "
+            "content TEXT, created_at DATETIME, user_id INTEGER)"
+        ))
+        conn.execute(text(
+            "INSERT INTO posts (title, content) VALUES "
+            "('First', '**bold**'), ('Second', '# Heading')"
+        ))
+    monkeypatch.setattr(manage, 'get_engine', lambda: engine)
+    yield engine
+    engine.dispose()
+
+
+def test_backfill_html(legacy_engine):
+    """Test that existing posts get rendered HTML in batches."""
+    manage.main(['backfill-html', '--batch-size', '1'])
+
+    with legacy_engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT content_html FROM posts ORDER BY id"
+        )).scalars().all()
+    assert rows == [
+        '<p><strong>bold</strong></p>\n', '<h1>Heading</h1>\n'
+    ]
+    with legacy_engine.connect() as conn:
+        summaries = conn.execute(text(
+            "SELECT excerpt, word_count, reading_time FROM posts ORDER BY id"
+        )).all()
+    assert summaries == [('bold', 1, 1), ('Heading', 1, 1)]
+
+
+def test_rebuild_search(legacy_engine):
+    """Test that rebuilding indexes posts of an existing database."""
+    manage.main(['rebuild-search'])
+
+    with legacy_engine.connect() as conn:
+        ids = conn.execute(text(
+            "SELECT rowid FROM posts_fts WHERE posts_fts MATCH 'heading'"
+        )).scalars().all()
+    assert ids == [2]
+
+
+def test_rebuild_archive(legacy_engine):
+    """Test that archive counts are recounted from the posts table."""
+    with legacy_engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE posts SET created_at = '2024-05-01 10:00:00'"
+        ))
+    manage.main(['migrate'])
+    with legacy_engine.begin() as conn:
+        conn.execute(text("UPDATE post_archive SET post_count = 99"))
+
+    manage.main(['rebuild-archive'])
+
+    with legacy_engine.connect() as conn:
+        archive = conn.execute(text("SELECT * FROM post_archive")).all()
+    assert archive == [('2024-05', 2)]
+
+
+def test_import_export_commands(tmp_path, monkeypatch):
+    """Test the import/export commands with JSONL files."""
+    from src.models import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'blog.db'}")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(manage, 'get_engine', lambda: engine)
+    source = tmp_path / 'posts.jsonl'
+    source.write_text(
+        '{"title": "Imported", "content": "Body"}\n', encoding='utf-8'
+    )
+    target = tmp_path / 'out.csv'
+
+    manage.main(['import', 'posts', str(source)])
+    manage.main(['export', 'posts', str(target)])
+
+    lines = target.read_text(encoding='utf-8').splitlines()
+    assert lines[0] == 'id,title,content,created_at,user_id'
+    assert lines[1].startswith('1,Imported,Body,')
+    engine.dispose()
+
+
+def test_gc_blobs(tmp_path, monkeypatch):
+    """Test that only unreferenced blobs past the grace period are
+    deleted."""
+    import io
+    from sqlalchemy.orm import Session
+    from src.blob_store import BlobStore
+    from src.models import Attachment, Base, Post, User
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'blog.db'}")
+    Base.metadata.create_all(bind=engine)
+    store = BlobStore(str(tmp_path / 'blobs'))
+    monkeypatch.setattr(manage, 'get_engine', lambda: engine)
+    monkeypatch.setattr(manage, 'get_blob_store', lambda: store)
+    kept, _ = store.put(io.BytesIO(b'kept'))
+    orphan, _ = store.put(io.BytesIO(b'orphan'))
+    with Session(engine) as session:
+        session.add(User(id=1, username='alice', password_hash='x'))
+        session.add(Post(id=1, title='t', content='c', user_id=1))
+        session.add(Attachment(post_id=1, digest=kept, filename='a.png',
+                               content_type='image/png', size=4))
+        session.commit()
+
+    manage.main(['gc-blobs'])
+    assert sorted(store.digests()) == sorted([kept, orphan])
+
+    manage.main(['gc-blobs', '--min-age', '0'])
+    assert list(store.digests()) == [kept]
+    engine.dispose()
+
+
+def test_sync_related(legacy_engine, tmp_path, monkeypatch):
+    """Test that posts from before the related index are indexed by the
+    first sync and that --full re-reads them."""
+    from src.related_posts import RelatedIndex
+
+    index = RelatedIndex(str(tmp_path / 'related'))
+    monkeypatch.setattr(manage, 'get_related_index', lambda: index)
+
+    manage.main(['sync-related'])
+    assert sorted(index.rows) == [1, 2]
+    assert index.sync(legacy_engine.connect()) == 0
+
+    manage.main(['sync-related', '--full'])
+    assert sorted(index.rows) == [1, 2]
@@ -0,0 +1,209 @@
+import os
+import subprocess
+import sys
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.orm import sessionmaker
+
+from src.migrations import (
+    LATEST_VERSION, MIGRATIONS, migrate, schema_version
+)
+from src.models import Post
+from src.post_repository import PostRepository
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'blog.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_migrate_new_database(engine):
+    """Test that a new database gets the current schema and version."""
+    assert migrate(engine) == LATEST_VERSION
+
+    tables = inspect(engine).get_table_names()
+    assert {'users', 'posts', 'posts_fts', 'schema_version'} <= set(tables)
+    with engine.connect() as conn:
+        assert schema_version(conn) == LATEST_VERSION
+
+
+def test_migrate_legacy_database(engine):
+    """Test that an unversioned database is upgraded in place."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE posts (id INTEGER PRIMARY KEY, title VARCHAR, "
+            "content TEXT, created_at DATETIME, user_id INTEGER)"
+        ))
+        conn.execute(text(
+            "INSERT INTO posts (title, content, created_at) "
+            "VALUES ('Old', 'Body', '2020-01-01 00:00:00')"
+        ))
+
+    assert migrate(engine) == LATEST_VERSION
+
+    columns = {c['name'] for c in inspect(engine).get_columns('posts')}
+    assert {'content_html', 'excerpt', 'word_count'} <= columns
+    indexes = {i['name'] for i in inspect(engine).get_indexes('posts')}
+    assert 'ix_posts_created_at_id' in indexes
+    with engine.connect() as conn:
+        row = conn.execute(text(
+            "SELECT title, updated_at FROM posts"
+        )).one()
+        assert row == ('Old', '2020-01-01 00:00:00')
+        archive = conn.execute(text("SELECT * FROM post_archive")).all()
+        assert archive == [('2020-01', 1)]
+        assert inspect(conn).has_table('users')
+
+    # 既存の投稿も検索でき、編集・削除しても索引が壊れない
+    session = sessionmaker(bind=engine)()
+    repository = PostRepository(session)
+    assert len(repository.search('body', 10)[0]) == 1
+    post = session.scalars(select(Post)).one()
+    post.content = 'Edited'
+    session.commit()
+    assert repository.search('body', 10)[0] == []
+    assert len(repository.search('edited', 10)[0]) == 1
+    session.delete(post)
+    session.commit()
+    assert repository.search('edited', 10)[0] == []
+    session.close()
+
+
+def _create_legacy_posts(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE posts (id INTEGER PRIMARY KEY, title VARCHAR, "
+            "content TEXT, created_at DATETIME, user_id INTEGER)"
+        ))
+
+
+def _schema(engine):
+    with engine.connect() as conn:
+        return set(conn.execute(text(
+            "SELECT type, name FROM sqlite_master "
+            "WHERE name NOT LIKE 'sqlite_%'"
+        )).all())
+
+
+def test_first_migration_is_self_contained(engine):
+    """Test that migration 1 creates only the tables of version 1, leaving
+    later tables and triggers to their own steps."""
+    _create_legacy_posts(engine)
+    _, _, step = MIGRATIONS[0]
+
+    with engine.begin() as conn:
+        step(conn)
+
+    tables = set(inspect(engine).get_table_names())
+    assert {'users', 'posts', 'posts_fts'} <= tables
+    assert not tables & {
+        'tags', 'post_tags', 'post_archive', 'content_version',
+        'attachments', 'post_revisions', 'draft_changes',
+        'post_index_changes',
+    }
+
+
+def test_migrated_schema_matches_new_database(engine, tmp_path):
+    """Test that upgrading step by step gives the tables, indexes and
+    triggers of a new database."""
+    _create_legacy_posts(engine)
+    new = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+
+    migrate(engine)
+    migrate(new)
+
+    assert _schema(engine) == _schema(new)
+    new.dispose()
+
+
+def test_migrate_reindexes_search(engine):
+    """Test that a database upgraded without indexing its existing posts
+    gets them indexed."""
+    _create_legacy_posts(engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO posts (title, content) VALUES ('Old', 'Body')"
+        ))
+        for _, _, step in MIGRATIONS[:9]:
+            step(conn)
+        # 以前の手順1と同じく、既存の投稿が索引にない状態にする
+        conn.execute(text(
+            "INSERT INTO posts_fts(posts_fts) VALUES ('delete-all')"
+        ))
+        conn.execute(text(
+            "CREATE TABLE schema_version (version INTEGER NOT NULL)"
+        ))
+        conn.execute(text("INSERT INTO schema_version VALUES (9)"))
+
+    migrate(engine)
+
+    with engine.connect() as conn:
+        ids = conn.execute(text(
+            "SELECT rowid FROM posts_fts WHERE posts_fts MATCH 'body'"
+        )).scalars().all()
+    assert ids == [1]
+
+
+def test_migrate_clears_orphaned_post_owners(engine):
+    """Test that posts of users deleted before ownership was cleared on
+    deletion lose their dangling user_id."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR, "
+            "password_hash VARCHAR, is_admin BOOLEAN)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE posts (id INTEGER PRIMARY KEY, title VARCHAR, "
+            "content TEXT, created_at DATETIME, user_id INTEGER)"
+        ))
+        conn.execute(text(
+            "INSERT INTO users (id, username, password_hash, is_admin) "
+            "VALUES (1, 'alice', 'x', 0)"
+        ))
+        conn.execute(text(
+            "INSERT INTO posts (id, title, content, created_at, user_id) "
+            "VALUES (1, 'Kept', 'Body', '2020-01-01 00:00:00', 1), "
+            "(2, 'Orphan', 'Body', '2020-01-02 00:00:00', 99)"
+        ))
+
+    migrate(engine)
+
+    with engine.connect() as conn:
+        owners = conn.execute(text(
+            "SELECT id, user_id FROM posts ORDER BY id"
+        )).all()
+    assert owners == [(1, 1), (2, None)]
+
+
+def test_migrate_is_idempotent(engine):
+    """Test that running migrate again leaves the version unchanged."""
+    migrate(engine)
+
+    assert migrate(engine) == LATEST_VERSION
+    with engine.connect() as conn:
+        versions = conn.execute(text(
+            "SELECT version FROM schema_version"
+        )).scalars().all()
+    assert versions == [LATEST_VERSION]
+
+
+def test_import_has_no_side_effects(tmp_path):
+    """Test that importing the app modules neither touches the database
+    nor loads the heavy optional libraries."""
+    code = (
+        "import sys, src.models, src.post_manager, src.auth_manager\n"
+        "print(sorted(m for m in ('passlib', 'markdown_it', 'numpy')"
+        " if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=tmp_path, capture_output=True,
+        text=True, check=True,
+        env=dict(os.environ, PYTHONPATH=REPO_ROOT),
+    )
+
+    assert result.stdout.strip() == '[]'
+    assert not (tmp_path / 'blog.db').exists()
@@ -2,7 +2,7 @@ import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from src.models import Base, User, Post
+from src.models import Base, User, Post, session_scope
 
 
 # テスト用のSQLiteインメモリデータベースを使用
@@ -96,3 +96,95 @@ def test_user_post_relationship(session):
     assert len(retrieved_user.posts) == 2  # ユーザーが2つの投稿を持っていることを確認
     assert retrieved_user.posts[0].title == "Test Post 1"
     assert retrieved_user.posts[1].title == "Test Post 2"
+
+
+def test_verify_and_update_rehashes(session, monkeypatch):
+    """
+    Test that logging in with an outdated hash stores an upgraded one.
+    """
+    from src.passwords import PasswordHasher
+    from src import models
+
+    monkeypatch.setattr(models, 'hasher', PasswordHasher(rounds=4))
+    user = User(username="testuser",
+                password_hash=User.hash_password("password"))
+    session.add(user)
+    session.commit()
+
+    monkeypatch.setattr(models, 'hasher', PasswordHasher(rounds=5))
+    assert user.verify_and_update("password")
+    session.commit()
+
+    assert user.password_hash.startswith('$2b$05$')
+    assert user.verify_password("password")
+
+
+def test_session_scope_commits_and_closes():
+    """
+    Test that session_scope commits the unit of work and closes the session.
+    """
+    Base.metadata.create_all(bind=engine)
+    try:
+        with session_scope(SessionLocal) as session:
+            session.add(User(username="scoped", password_hash="x"))
+        assert session.get_bind() is engine
+        assert len(session.identity_map) == 0  # close済み
+
+        with session_scope(SessionLocal) as session:
+            assert session.query(User).filter_by(
+                username="scoped").count() == 1
+    finally:
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_session_scope_rolls_back_on_error():
+    """
+    Test that an exception in the rerun rolls the unit of work back.
+    """
+    Base.metadata.create_all(bind=engine)
+    try:
+        with pytest.raises(RuntimeError):
+            with session_scope(SessionLocal) as session:
+                session.add(User(username="rolled_back", password_hash="x"))
+                session.flush()
+                raise RuntimeError("rerun")
+
+        with session_scope(SessionLocal) as session:
+            assert session.query(User).filter_by(
+                username="rolled_back").count() == 0
+    finally:
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_post_renders_content_html(session):
+    """
+    Test that Markdown is rendered once when the content is written.
+    """
+    post = Post(title="Markdown", content="**bold** <script>")
+    session.add(post)
+    session.commit()
+    assert post.content_html == (
+        "<p><strong>bold</strong> &lt;script&gt;</p>\n"
+    )
+
+    post.content = "_edited_"
+    session.commit()
+    assert post.content_html == "<p><em>edited</em></p>\n"
+
+
+def test_post_content_is_deferred(session):
+    """
+    Test that loading a post does not read its body until accessed.
+    """
+    session.add(Post(title="Long", content="word " * 500))
+    session.commit()
+    session.expunge_all()
+
+    post = session.query(Post).first()
+    assert 'content' not in post.__dict__
+    assert 'content_html' not in post.__dict__
+    assert post.word_count == 500
+    assert post.reading_time == 3
+    assert post.excerpt.endswith('…')
+
+    assert post.content.startswith('word')
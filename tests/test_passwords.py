@@ -0,0 +1,38 @@
+from src.passwords import PasswordHasher
+
+
+def test_hash_and_verify():
+    """Test hashing with the configured cost on the worker pool."""
+    hasher = PasswordHasher(rounds=4, max_workers=2)
+    try:
+        password_hash = hasher.hash('secret')
+
+        assert password_hash.startswith('$2b$04$')
+        assert hasher.verify('secret', password_hash)
+        assert not hasher.verify('wrong', password_hash)
+    finally:
+        hasher.shutdown()
+
+
+def test_verify_and_update_upgrades_cost():
+    """Test that a hash with an outdated cost is replaced on login."""
+    old_hasher = PasswordHasher(rounds=4, max_workers=1)
+    new_hasher = PasswordHasher(rounds=5, max_workers=1)
+    try:
+        old_hash = old_hasher.hash('secret')
+
+        valid, new_hash = new_hasher.verify_and_update('secret', old_hash)
+        assert valid is True
+        assert new_hash.startswith('$2b$05$')
+
+        # 新しいハッシュは更新不要
+        assert new_hasher.verify_and_update('secret', new_hash) == (
+            True, None
+        )
+        # パスワードが違う場合は更新しない
+        assert new_hasher.verify_and_update('wrong', old_hash) == (
+            False, None
+        )
+    finally:
+        old_hasher.shutdown()
+        new_hasher.shutdown()
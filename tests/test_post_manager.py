@@ -1,6 +1,11 @@
+import contextlib
+import datetime
 import pytest
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock, call
+from src.feed_cache import FeedCache
 from src.post_manager import PostManager
+from src.tag_repository import TagRow
 from src.models import User, Post
 from werkzeug.security import generate_password_hash
 
@@ -144,8 +149,12 @@ def test_manage_users(mock_st, session):
 
     mock_st.session_state = {'user': admin_user}
     mock_st.write = MagicMock()
+    mock_st.text_input = MagicMock(return_value='')
+    mock_st.checkbox = MagicMock(return_value=False)
+    mock_st.selectbox = MagicMock(return_value='anonymize')
     # ボタンの状態をシミュレート。状態のリストは予想される回数をカバーするようにする。
-    mock_st.button = MagicMock(side_effect=[False, True] * 2)  # 必要な回数だけリストを増やす
+    # 各行の削除ボタンの後に一括削除ボタンが続く
+    mock_st.button = MagicMock(side_effect=[False, True, False, False, False])
     mock_st.success = MagicMock()
     mock_st.rerun = MagicMock()
 
@@ -165,3 +174,465 @@ def test_manage_users(mock_st, session):
     mock_st.success.assert_has_calls([
         call('User user deleted successfully!')
     ])
+
+
+def _add_posts(session, user, count):
+    """Add posts with strictly increasing timestamps."""
+    base = datetime.datetime(2024, 1, 1)
+    posts = [
+        Post(title=f'Post {i}', content=f'Content {i}', author=user,
+             created_at=base + datetime.timedelta(minutes=i))
+        for i in range(count)
+    ]
+    session.add_all(posts)
+    session.commit()
+    return posts
+
+
+def test_fetch_page_keyset(session):
+    """Test that pages seek past the cursor without overlap."""
+    user = User(username='testuser',
+                password_hash=generate_password_hash('password'))
+    session.add(user)
+    _add_posts(session, user, 5)
+
+    post_manager = PostManager(session, page_size=2)
+    first, has_older = post_manager.fetch_page()
+    assert [p.title for p in first] == ['Post 4', 'Post 3']
+    assert has_older is True
+
+    cursor = (first[-1].created_at, first[-1].id)
+    second, has_older = post_manager.fetch_page(cursor)
+    assert [p.title for p in second] == ['Post 2', 'Post 1']
+    assert has_older is True
+
+    cursor = (second[-1].created_at, second[-1].id)
+    last, has_older = post_manager.fetch_page(cursor)
+    assert [p.title for p in last] == ['Post 0']
+    assert has_older is False
+
+
+@patch('src.post_manager.st')
+def test_show_posts_older_navigation(mock_st, session):
+    """Test that "Older posts" pushes the cursor into session_state."""
+    user = User(username='testuser',
+                password_hash=generate_password_hash('password'))
+    session.add(user)
+    _add_posts(session, user, 3)
+
+    mock_st.session_state = {'user': None}
+    mock_st.button = MagicMock(return_value=True)
+    mock_st.rerun = MagicMock()
+
+    post_manager = PostManager(session, page_size=2)
+    post_manager.show_posts()
+
+    cursors = mock_st.session_state['feed_cursors']
+    assert len(cursors) == 1
+    assert cursors[0][1] == session.query(Post).filter_by(
+        title='Post 1').first().id
+    mock_st.rerun.assert_called_once()
+
+
+@patch('src.post_manager.st')
+def test_delete_post_bumps_feed_cache(mock_st, session):
+    """Test that writes invalidate the shared feed cache."""
+    user = User(username='testuser',
+                password_hash=generate_password_hash('password'))
+    session.add(user)
+    _add_posts(session, user, 1)
+
+    cache = FeedCache()
+    post_manager = PostManager(session, cache=cache)
+    rows, _ = post_manager.fetch_page()
+    assert post_manager.fetch_page()[0] == rows
+
+    post_manager.delete_post(session.query(Post).first())
+
+    assert cache.version == 1
+    assert post_manager.fetch_page()[0] == []
+
+
+def test_cache_ignores_rows_from_an_older_snapshot(tmp_path):
+    """Test that a rerun reading before another session's write does not
+    cache its old rows as the new feed."""
+    from sqlalchemy.orm import sessionmaker
+    from src.database import DEFAULT_SETTINGS, create_blog_engine
+    from src.models import Base
+
+    engine = create_blog_engine(dict(
+        DEFAULT_SETTINGS, url=f"sqlite:///{tmp_path / 'blog.db'}"
+    ))
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    cache = FeedCache()
+    reader, writer = Session(), Session()
+    # 読み取りのスナップショットを書き込みより前に始める
+    assert reader.query(User).all() == []
+
+    user = User(username='testuser', password_hash='x')
+    writer.add(user)
+    _add_posts(writer, user, 1)
+    cache.bump()
+
+    assert PostManager(reader, cache=cache).fetch_page()[0] == []
+    fresh = Session()
+    assert len(PostManager(fresh, cache=cache).fetch_page()[0]) == 1
+    # 別プロセスの書き込みもキャッシュを無効にする
+    fresh.commit()
+    _add_posts(writer, user, 1)
+    assert len(PostManager(fresh, cache=cache).fetch_page()[0]) == 2
+    for session in (reader, writer, fresh):
+        session.close()
+    engine.dispose()
+
+
+@patch('src.post_manager.st')
+def test_search_posts(mock_st, session):
+    """Test rendering search results."""
+    user = User(username='testuser',
+                password_hash=generate_password_hash('password'))
+    session.add(user)
+    _add_posts(session, user, 2)
+
+    mock_st.session_state = {'user': None}
+    mock_st.text_input = MagicMock(return_value='Content 1')
+    mock_st.button = MagicMock(return_value=False)
+
+    post_manager = PostManager(session)
+    post_manager.search_posts()
+
+    mock_st.markdown.assert_any_call(
+        '### Post <mark>1</mark>', unsafe_allow_html=True
+    )
+    assert mock_st.session_state['search_query'] == 'Content 1'
+
+
+@patch('src.post_manager.st')
+def test_manage_users_bulk_delete(mock_st, session):
+    """Test deleting the selected users at once."""
+    admin_user = User(username='admin',
+                      password_hash=generate_password_hash('password'),
+                      is_admin=True)
+    session.add_all([admin_user] + [
+        User(username=f'user{i}', password_hash='x') for i in range(3)
+    ])
+    session.commit()
+
+    mock_st.session_state = {'user': admin_user}
+    mock_st.text_input = MagicMock(return_value='user')
+    mock_st.checkbox = MagicMock(return_value=True)
+    mock_st.selectbox = MagicMock(return_value='cascade')
+    # 各行の削除ボタンは押さず、一括削除ボタンだけ押す
+    mock_st.button = MagicMock(side_effect=[False, False, False, True])
+    mock_st.rerun = MagicMock()
+
+    post_manager = PostManager(session)
+    post_manager.manage_users()
+
+    assert [u.username for u in session.query(User).all()] == ['admin']
+    mock_st.success.assert_called_once_with("3 users deleted successfully!")
+    assert mock_st.session_state['user'] is admin_user
+
+
+@patch('src.post_manager.st')
+def test_create_post_with_tags_and_filter(mock_st, session):
+    """Test that tags entered with a post show up in the tag cloud and
+    that choosing a tag filters the feed."""
+    user = User(username='testuser', password_hash='x')
+    session.add(user)
+    _add_posts(session, user, 2)
+
+    mock_st.session_state = {'user': user}
+    mock_st.text_input = MagicMock(side_effect=['Tagged', 'Python, SQL'])
+    mock_st.text_area = MagicMock(return_value='Body')
+    mock_st.button = MagicMock(return_value=True)
+    post_manager = PostManager(session)
+    post_manager.create_post()
+
+    assert post_manager.tag_repository.tag_cloud() == [
+        TagRow('python', 1), TagRow('sql', 1)
+    ]
+
+    column = MagicMock()
+    column.button.side_effect = [True, False]
+    mock_st.columns = MagicMock(return_value=[column] * 5)
+    post_manager.show_tag_cloud()
+    assert mock_st.session_state['feed_tag'] == 'python'
+
+    posts, has_older = post_manager.fetch_page(tag='python')
+    assert [post.title for post in posts] == ['Tagged']
+    assert has_older is False
+
+
+@patch('src.post_manager.st')
+def test_create_post_with_image(mock_st, session, tmp_path):
+    """Test that an uploaded image is stored by digest and the feed card
+    shows only its thumbnail."""
+    import io
+    from PIL import Image
+    from src.blob_store import BlobStore
+
+    user = User(username='testuser', password_hash='x')
+    session.add(user)
+    session.commit()
+    upload = io.BytesIO()
+    Image.new('RGB', (1000, 500), 'blue').save(upload, 'PNG')
+    upload.seek(0)
+    upload.name, upload.type = 'photo.png', 'image/png'
+
+    mock_st.session_state = {'user': user}
+    mock_st.text_input = MagicMock(side_effect=['Photo', ''])
+    mock_st.text_area = MagicMock(return_value='Body')
+    mock_st.file_uploader = MagicMock(return_value=[upload])
+    mock_st.button = MagicMock(return_value=True)
+    store = BlobStore(str(tmp_path), max_workers=1)
+    post_manager = PostManager(session, blob_store=store)
+    post_manager.create_post()
+    store.shutdown()
+
+    (post,), _ = post_manager.fetch_page()
+    images = post_manager.fetch_attachments([post.id])[post.id]
+    assert [image.filename for image in images] == ['photo.png']
+
+    mock_st.toggle = MagicMock(return_value=False)
+    post_manager.show_post_card(post.id, post, images=images)
+    mock_st.image.assert_called_once_with(
+        store.variant(images[0].digest, 320), width=320
+    )
+
+
+@patch('src.post_manager.st')
+def test_create_post_autosaves_draft(mock_st, session):
+    """Test that drafts are saved at most once per interval, restored in
+    a new session and discarded on publish."""
+    from src import revisions
+
+    user = User(username='testuser', password_hash='x')
+    session.add(user)
+    session.commit()
+    mock_st.session_state = {'user': user}
+    mock_st.text_input = MagicMock(return_value='Draft title')
+    mock_st.text_area = MagicMock(return_value='Half written')
+    mock_st.button = MagicMock(return_value=False)
+    post_manager = PostManager(session)
+
+    post_manager.create_post()
+    assert revisions.load_draft(session, user.id) is None
+
+    mock_st.session_state['draft_saved_at'] -= 60
+    post_manager.create_post()
+    assert revisions.load_draft(session, user.id) == revisions.Draft(
+        1, 'Draft title', 'Half written'
+    )
+
+    mock_st.session_state = {'user': user}
+    mock_st.button = MagicMock(return_value=True)
+    post_manager.create_post()
+    assert mock_st.session_state['draft_content'] == 'Half written'
+    assert session.query(Post).filter_by(title='Draft title').count() == 1
+    assert revisions.load_draft(session, user.id) is None
+
+
+@patch('src.post_manager.st')
+def test_delete_users_invalidates_principals(mock_st, session):
+    """Test that deleted users' cached principals are dropped and that
+    deleting oneself signs out."""
+    from src.principals import Principal
+
+    user = User(username='testuser', password_hash='x')
+    session.add(user)
+    session.commit()
+    principal = Principal.from_user(user)
+    mock_st.session_state = {'user': principal, 'auth_token': 'token'}
+    principals = MagicMock()
+
+    PostManager(session, principals=principals).delete_users([principal.id])
+
+    principals.invalidate.assert_called_once_with([principal.id])
+    assert mock_st.session_state == {'user': None}
+
+
+@patch('src.post_manager.st')
+def test_failed_user_deletion_is_not_reported_as_done(mock_st, session):
+    """Test that a full write queue shows an error instead of success."""
+    from src.principals import Principal
+    from src.write_queue import WriteQueueFull
+
+    user = User(username='testuser', password_hash='x')
+    session.add(user)
+    session.commit()
+    mock_st.session_state = {'user': Principal.from_user(user)}
+    mock_st.checkbox = MagicMock(return_value=False)
+    mock_st.button = MagicMock(return_value=True)
+    writer = MagicMock()
+    writer.submit.side_effect = WriteQueueFull
+    principals = MagicMock()
+
+    PostManager(session, writer=writer, principals=principals).show_user_row(
+        user.id
+    )
+
+    mock_st.error.assert_called_once_with(
+        "The server is busy, please try again."
+    )
+    mock_st.success.assert_not_called()
+    mock_st.rerun.assert_not_called()
+    principals.invalidate.assert_not_called()
+    assert session.get(User, user.id) is not None
+
+
+@patch('src.post_manager.st')
+def test_write_timeout_shows_error(mock_st, session):
+    """Test that a write the queue did not commit in time is reported."""
+    writer = MagicMock()
+    writer.submit.return_value.result.side_effect = TimeoutError
+
+    assert not PostManager(session, writer=writer).write(lambda s: None)
+    mock_st.error.assert_called_once()
+
+
+@patch('src.post_manager.st')
+def test_update_and_delete_of_deleted_post(mock_st, session):
+    """Test writes to a post another editor deleted meanwhile."""
+    user = User(username='testuser', password_hash='x')
+    session.add(user)
+    session.commit()
+    post = Post(title='Gone', content='Content', author=user)
+    session.add(post)
+    session.commit()
+    post_id = post.id
+    session.delete(post)
+    session.commit()
+    post_manager = PostManager(session)
+
+    assert not post_manager.write(lambda s: post_manager.update_post(
+        s, post_id, 'Title', 'Content'
+    ))
+    mock_st.error.assert_called_once_with("This post has been deleted.")
+
+    # 削除済みの投稿の削除はそのまま成功とする
+    post_manager.delete_post(SimpleNamespace(id=post_id))
+    mock_st.success.assert_called_once_with("Post deleted successfully!")
+
+
+class _FragmentRuns:
+    """
+    Stand-in for Streamlit's fragment storage: like Streamlit, it keeps
+    the closure of a fragment's first run and reruns that one later.
+    """
+    def __init__(self, session):
+        self.ctx = SimpleNamespace(fragment_ids_this_run=[])
+        self.stored = {}
+        self.patches = (
+            patch('src.post_manager.get_script_run_ctx',
+                  lambda **kwargs: self.ctx),
+            patch('src.post_manager.session_scope',
+                  lambda: contextlib.nullcontext(session)),
+        )
+
+    def fragment(self, body):
+        def run():
+            self.stored.setdefault(body.__qualname__, body)
+            return body()
+        return run
+
+    def rerun(self, name):
+        self.ctx.fragment_ids_this_run = [name]
+        return self.stored[name]()
+
+    def __enter__(self):
+        for p in self.patches:
+            p.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        for p in self.patches:
+            p.stop()
+
+
+@patch('src.post_manager.st')
+def test_user_row_fragment_rerun_reads_current_policy(mock_st, session):
+    """Test that a row rerun uses the policy chosen after the row was first
+    rendered, and a session of its own."""
+    from src.principals import Principal
+    from src.user_repository import UserRepository
+
+    admin = User(username='admin', password_hash='x', is_admin=True)
+    user = User(username='testuser', password_hash='x')
+    session.add_all([admin, user])
+    session.add(Post(title='T', content='C', author=user))
+    session.commit()
+    row = UserRepository(session).get_user(user.id)
+    mock_st.session_state = {
+        'user': Principal.from_user(admin), 'deletion_policy': 'anonymize'
+    }
+    mock_st.checkbox.return_value = False
+    mock_st.button.return_value = False
+    # 最初の実行のセッションはもう閉じられている
+    stale = MagicMock()
+
+    with _FragmentRuns(session) as runs:
+        mock_st.fragment = runs.fragment
+        PostManager(stale, principals=MagicMock()).show_user_row(user.id, row)
+        # 全体の再実行で方針を変えてから行の削除ボタンを押す
+        mock_st.session_state['deletion_policy'] = 'cascade'
+        mock_st.button.return_value = True
+        runs.rerun(f'PostManager.show_user_row[{user.id}]')
+
+    stale.execute.assert_not_called()
+    assert session.query(User).filter_by(username='testuser').count() == 0
+    assert session.query(Post).count() == 0
+    mock_st.rerun.assert_called_once()
+
+
+@patch('src.post_manager.st')
+def test_post_card_fragment_rerun_requeries_its_row(mock_st, session):
+    """Test that a card rerun shows its post as it is now, and that another
+    post in the same place is a different fragment."""
+    user = User(username='testuser', password_hash='x')
+    session.add(user)
+    session.add_all([Post(title='First', content='C', author=user),
+                     Post(title='Second', content='C', author=user)])
+    session.commit()
+    manager = PostManager(session)
+    (second, first), _ = manager.fetch_page()
+    mock_st.session_state = {'user': None}
+    mock_st.toggle.return_value = False
+
+    with _FragmentRuns(session) as runs:
+        mock_st.fragment = runs.fragment
+        manager.show_post_card(first.id, first, (), ())
+        session.get(Post, first.id).title = 'First, edited'
+        session.commit()
+        # 次のページで同じ位置に別の投稿が来ても、元のカードは上書きされない
+        manager.show_post_card(second.id, second, (), ())
+        mock_st.subheader.reset_mock()
+        runs.rerun(f'PostManager.show_post_card[{first.id}]')
+
+    mock_st.subheader.assert_called_once_with('First, edited')
+
+
+@patch('src.post_manager.st')
+def test_show_post_links_related_posts(mock_st, session):
+    """Test that a post page links to similar posts with escaped titles."""
+    from src.related_posts import RelatedIndex
+
+    user = User(username='testuser', password_hash='x')
+    session.add(user)
+    session.add_all([
+        Post(title='Sourdough', content='flour yeast dough oven',
+             author=user),
+        Post(title='[Rye] *bread*', content='flour yeast dough loaf',
+             author=user),
+        Post(title='Cats', content='kitten purr whiskers', author=user),
+    ])
+    session.commit()
+    mock_st.button.return_value = False
+
+    PostManager(session, related=RelatedIndex()).show_post(1)
+
+    mock_st.subheader.assert_called_once_with("Related posts")
+    mock_st.markdown.assert_called_once_with(
+        r"- [\[Rye\] \*bread\*](?post=2)"
+    )
@@ -0,0 +1,247 @@
+import datetime
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src import tags
+from src.models import Base, User, Post
+from src.post_repository import ArchiveMonth, PostRepository, PostRow
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def session(engine):
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def _seed(session, authors, posts_per_author):
+    base = datetime.datetime(2024, 1, 1)
+    minute = 0
+    for i in range(authors):
+        user = User(username=f'user{i}', password_hash='x')
+        session.add(user)
+        for _ in range(posts_per_author):
+            session.add(Post(
+                title=f'Post {minute}', content='Content', author=user,
+                created_at=base + datetime.timedelta(minutes=minute)
+            ))
+            minute += 1
+    session.commit()
+    session.expunge_all()
+
+
+def test_feed_page_returns_rows_with_authors(session):
+    """Test that the feed is projected into PostRow with author names."""
+    _seed(session, authors=2, posts_per_author=2)
+
+    rows, has_older = PostRepository(session).feed_page(page_size=10)
+
+    assert has_older is False
+    assert all(isinstance(row, PostRow) for row in rows)
+    assert [row.title for row in rows] == [
+        'Post 3', 'Post 2', 'Post 1', 'Post 0'
+    ]
+    assert [row.author_name for row in rows] == [
+        'user1', 'user1', 'user0', 'user0'
+    ]
+    # ORMインスタンスがidentity mapに入らないことを確認
+    assert len(session.identity_map) == 0
+
+
+def test_feed_page_single_statement(engine, session):
+    """Test that the query count does not grow with the page size."""
+    _seed(session, authors=5, posts_per_author=4)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        rows, _ = PostRepository(session).feed_page(page_size=20)
+        assert {row.author_name for row in rows} == {
+            f'user{i}' for i in range(5)
+        }
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+    assert len(statements) == 1
+
+
+def test_feed_page_deleted_author(session):
+    """Test that posts of deleted users keep a None author name."""
+    session.add(Post(title='Orphan', content='Content', user_id=None))
+    session.commit()
+
+    rows, _ = PostRepository(session).feed_page(page_size=10)
+
+    assert rows[0].author_name is None
+
+
+def test_feed_page_by_tag(session):
+    """Test that a tag page seeks only the tagged posts, newest first."""
+    _seed(session, authors=1, posts_per_author=5)
+    for post in session.query(Post).filter(Post.id % 2 == 1):
+        tags.set_post_tags(session, post, ['odd'])
+    session.commit()
+    repository = PostRepository(session)
+
+    rows, has_older = repository.feed_page(page_size=2, tag='odd')
+    assert [row.title for row in rows] == ['Post 4', 'Post 2']
+    assert has_older is True
+
+    cursor = (rows[-1].created_at, rows[-1].id)
+    rows, has_older = repository.feed_page(2, cursor, tag='odd')
+    assert [row.title for row in rows] == ['Post 0']
+    assert has_older is False
+    assert repository.feed_page(2, tag='missing') == ([], False)
+
+
+def test_archive_counts_follow_writes(session):
+    """Test that monthly counts are maintained on insert, move and delete
+    and that a month page seeks within that month."""
+    user = User(username='writer', password_hash='x')
+    posts = [
+        Post(title=f'Post {i}', content='C', author=user,
+             created_at=datetime.datetime(2024, month, 10 + i))
+        for i, month in enumerate([1, 1, 2, 3])
+    ]
+    session.add_all(posts)
+    session.commit()
+    repository = PostRepository(session)
+    assert repository.archive_months() == [
+        ArchiveMonth('2024-03', 1), ArchiveMonth('2024-02', 1),
+        ArchiveMonth('2024-01', 2),
+    ]
+
+    posts[1].created_at = datetime.datetime(2024, 2, 1)
+    session.delete(posts[3])
+    session.commit()
+    assert repository.archive_months() == [
+        ArchiveMonth('2024-02', 2), ArchiveMonth('2024-01', 1),
+    ]
+
+    rows, has_older = repository.feed_page(10, month='2024-02')
+    assert [row.title for row in rows] == ['Post 2', 'Post 1']
+    assert has_older is False
+
+
+def test_search_ranks_and_highlights(session):
+    """Test that search results are ranked and highlighted."""
+    user = User(username='writer', password_hash='x')
+    session.add_all([
+        Post(title='Gardening tips', content='Water <b>plants</b> daily.',
+             author=user),
+        Post(title='Cooking', content='Gardening is relaxing.', author=user),
+        Post(title='Travel', content='Nothing relevant here.', author=user),
+    ])
+    session.commit()
+
+    results, has_more = PostRepository(session).search('gardening', 10)
+
+    assert has_more is False
+    assert [r.title_html for r in results] == [
+        '<mark>Gardening</mark> tips', 'Cooking'
+    ]
+    assert results[1].snippet_html == '<mark>Gardening</mark> is relaxing.'
+    assert results[0].author_name == 'writer'
+
+
+def test_search_escapes_html_and_query_syntax(session):
+    """Test that user input cannot break FTS5 or inject HTML."""
+    session.add(Post(title='Tags', content='Use <b>bold</b> "quotes"'))
+    session.commit()
+
+    results, _ = PostRepository(session).search('bold "quotes', 10)
+
+    assert results[0].snippet_html == (
+        'Use &lt;b&gt;<mark>bold</mark>&lt;/b&gt; &quot;<mark>quotes</mark>'
+        '&quot;'
+    )
+
+
+def test_search_paginates_with_rank_cursor(session):
+    """Test that search pages do not overlap."""
+    for i in range(5):
+        session.add(Post(title=f'Note {i}', content='needle'))
+    session.commit()
+    repository = PostRepository(session)
+
+    first, has_more = repository.search('needle', 3)
+    cursor = (first[-1].rank, first[-1].id)
+    second, has_more_second = repository.search('needle', 3, cursor)
+
+    assert has_more is True
+    assert has_more_second is False
+    ids = [r.id for r in first + second]
+    assert sorted(ids) == sorted(set(ids))
+    assert len(ids) == 5
+
+
+def test_search_index_follows_updates_and_deletes(session):
+    """Test that the triggers keep posts_fts in sync."""
+    post = Post(title='Draft', content='old words')
+    session.add(post)
+    session.commit()
+    repository = PostRepository(session)
+
+    post.content = 'new words'
+    session.commit()
+    assert repository.search('old', 10)[0] == []
+    assert len(repository.search('new', 10)[0]) == 1
+
+    session.delete(post)
+    session.commit()
+    assert repository.search('new', 10)[0] == []
+
+
+def test_search_index_created_on_existing_posts(engine):
+    """Test that an index added to a table with posts indexes them, so
+    they can be found, edited and deleted."""
+    from src.models import create_search_index, drop_search_index
+
+    with engine.begin() as connection:
+        # 検索がなかった頃のデータベースを再現する
+        drop_search_index(connection)
+        connection.execute(Post.__table__.insert().values(
+            title='Fruit', content='apple'
+        ))
+        create_search_index(connection)
+    session = sessionmaker(bind=engine)()
+    repository = PostRepository(session)
+
+    assert len(repository.search('apple', 10)[0]) == 1
+    post = session.get(Post, 1)
+    post.content = 'banana'
+    session.commit()
+    assert repository.search('apple', 10)[0] == []
+    assert len(repository.search('banana', 10)[0]) == 1
+    session.delete(post)
+    session.commit()
+    assert repository.search('banana', 10)[0] == []
+    session.close()
+
+
+def test_post_body_loaded_on_demand(session):
+    """Test that the feed omits bodies and post_body loads one."""
+    session.add(Post(title='Article', content='Full *body*'))
+    session.commit()
+    repository = PostRepository(session)
+
+    rows, _ = repository.feed_page(page_size=10)
+    assert not hasattr(rows[0], 'content')
+    assert rows[0].excerpt == 'Full body'
+
+    assert repository.post_body(rows[0].id) == '<p>Full <em>body</em></p>\n'
+    assert repository.get_post(rows[0].id) == rows[0]
+    assert repository.post_body(rows[0].id + 1) is None
@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from src import user_deletion
+from src.database import DEFAULT_SETTINGS, create_blog_engine
+from src.models import Base, User
+from src.principals import Principal, PrincipalStore
+
+
+@pytest.fixture
+def engine():
+    engine = create_blog_engine(dict(DEFAULT_SETTINGS, url='sqlite://'))
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def queries(engine):
+    statements = []
+    event.listen(
+        engine, 'before_cursor_execute',
+        lambda conn, cursor, statement, *args: statements.append(statement)
+    )
+    return statements
+
+
+@pytest.fixture
+def alice(session):
+    user = User(username='alice', password_hash='x', is_admin=True)
+    session.add(user)
+    session.commit()
+    return Principal.from_user(user)
+
+
+def test_resolve_cached_principal_without_queries(session, alice, queries):
+    """Test that a signed-in session resolves without touching users."""
+    store = PrincipalStore(secret=b'secret')
+    token = store.issue(alice)
+
+    assert store.resolve(token, session) == alice
+    assert store.resolve(token, session) == alice
+    assert queries == []
+    assert store.stats()['hits'] == 2
+
+
+def test_resolve_loads_principal_once(session, alice, queries):
+    """Test that a cache miss loads one users row and caches it."""
+    token = PrincipalStore(secret=b'secret').issue(alice)
+    # 同じ鍵を持つ別のプロセス (キャッシュは空)
+    store = PrincipalStore(secret=b'secret')
+
+    assert store.resolve(token, session) == alice
+    assert store.resolve(token, session) == alice
+    assert len(queries) == 1
+
+
+@pytest.mark.parametrize('token', [
+    None, '', 'garbage', '1.2', '1.x.y', '1.9999999999.AAAA',
+])
+def test_resolve_rejects_bad_tokens(session, alice, token):
+    """Test that malformed or unsigned tokens resolve to nobody."""
+    assert PrincipalStore(secret=b'secret').resolve(token, session) is None
+
+
+def test_resolve_rejects_other_keys_and_expired_tokens(session, alice):
+    """Test that tokens need the same key and expire after max_age."""
+    token = PrincipalStore(secret=b'other').issue(alice)
+    assert PrincipalStore(secret=b'secret').resolve(token, session) is None
+
+    expired = PrincipalStore(secret=b'secret', max_age=-1)
+    assert expired.resolve(expired.issue(alice), session) is None
+
+
+def test_deleted_user_is_signed_out(session, alice):
+    """Test that invalidating a deleted user ends their sessions, also
+    when a new user gets the same id."""
+    store = PrincipalStore(secret=b'secret')
+    token = store.issue(alice)
+
+    user_deletion.delete_users(session, [alice.id], user_deletion.CASCADE)
+    session.commit()
+    store.invalidate([alice.id])
+    assert store.resolve(token, session) is None
+
+    session.add(User(id=alice.id, username='mallory', password_hash='x'))
+    session.commit()
+    assert store.resolve(token, session) is None
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from src import related_posts
+from src.database import DEFAULT_SETTINGS, create_blog_engine
+from src.models import Base, Post, User, post_index_changes
+from src.post_manager import PostManager
+from src.related_posts import RelatedIndex
+
+TOPICS = {
+    'cats': 'cat kitten purr whiskers litter meow feline',
+    'python': 'python numpy pandas interpreter module import pip',
+    'bread': 'flour yeast dough oven knead loaf sourdough',
+}
+
+
+@pytest.fixture
+def session():
+    engine = create_blog_engine(dict(DEFAULT_SETTINGS, url='sqlite://'))
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id=1, username='author', password_hash='x'))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _add_posts(session, count=3):
+    """Add count posts per topic; return {topic: [post ids]}."""
+    ids = {}
+    for topic, words in TOPICS.items():
+        for n in range(count):
+            post = Post(title=f'{topic} {n}', user_id=1,
+                        content=f'{words} {words.split()[n]} post number')
+            session.add(post)
+            session.flush()
+            ids.setdefault(topic, []).append(post.id)
+    session.commit()
+    return ids
+
+
+def test_vectorize_is_stable_unit_vector():
+    """Test that vectors are normalised and do not depend on the
+    process (no randomised hashing)."""
+    vector = related_posts.vectorize('Title', 'some words some more')
+
+    assert vector.dtype == np.float32
+    assert np.isclose(np.linalg.norm(vector), 1)
+    assert np.array_equal(
+        vector, related_posts.vectorize('title', 'Some words some more')
+    )
+    assert not related_posts.vectorize('', '').any()
+
+
+def test_related_finds_same_topic(session):
+    """Test that the most similar posts share the topic of the post."""
+    ids = _add_posts(session)
+    index = RelatedIndex()
+
+    related = index.related(session, ids['cats'][0], k=2)
+
+    assert sorted(post_id for post_id, _ in related) == ids['cats'][1:]
+    assert related[0][1] >= related[1][1] > 0
+    assert index.related(session, 12345) == []
+
+
+def test_sync_is_incremental(session):
+    """Test that only changed posts are applied, including edits and
+    deletions from outside the app."""
+    ids = _add_posts(session)
+    index = RelatedIndex()
+    assert index.sync(session) == 9
+    assert index.sync(session) == 0
+
+    # ネコの投稿をパンの話に書き換える
+    cat = ids['cats'][2]
+    PostManager.update_post(session, cat, 'bread', TOPICS['bread'])
+    session.delete(session.get(Post, ids['bread'][0]))
+    session.commit()
+
+    assert index.sync(session) == 2
+    related = [post_id for post_id, _ in index.related(session, cat, k=2)]
+    assert sorted(related) == ids['bread'][1:]
+    assert ids['bread'][0] not in index.rows
+    # 投稿ごとに最新の変更1行だけが残る
+    assert session.execute(
+        select(func.count()).select_from(post_index_changes)
+    ).scalar() == 9
+
+
+def test_index_is_persisted_and_grows(session, tmp_path, monkeypatch):
+    """Test that a reopened index memory-maps the saved vectors and that
+    the matrix grows past its initial capacity."""
+    monkeypatch.setattr(related_posts, 'INITIAL_CAPACITY', 2)
+    ids = _add_posts(session)
+    root = str(tmp_path / 'related')
+    index = RelatedIndex(root)
+    expected = index.related(session, ids['python'][0])
+
+    reopened = RelatedIndex(root)
+    assert reopened.sync(session) == 0
+    assert isinstance(reopened.vectors, np.memmap)
+    assert len(reopened.post_ids) == 16
+    assert reopened.related(session, ids['python'][0]) == expected
+
+    # 次元数が変わったインデックスは作り直す
+    resized = RelatedIndex(root, dimensions=64)
+    assert resized.sync(session) == 9
@@ -0,0 +1,171 @@
+import random
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from src import revisions, user_deletion
+from src.database import DEFAULT_SETTINGS, create_blog_engine
+from src.models import Base, DraftChange, Post, PostRevision, User
+from src.post_manager import PostManager
+
+WORDS = 'alpha beta gamma delta epsilon zeta eta theta iota kappa'.split()
+
+
+@pytest.fixture
+def session():
+    # 外部キー制約を有効にしたアプリと同じ設定のエンジン
+    engine = create_blog_engine(dict(DEFAULT_SETTINGS, url='sqlite://'))
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def author(session):
+    author = User(username='author', password_hash='x')
+    session.add(author)
+    session.commit()
+    return author
+
+
+def _edit(text, rng):
+    """Replace, insert or delete one word somewhere in text."""
+    words = text.split(' ')
+    i = rng.randrange(len(words))
+    action = rng.choice(('replace', 'insert', 'delete'))
+    if action == 'replace':
+        words[i] = rng.choice(WORDS)
+    elif action == 'insert':
+        words.insert(i, rng.choice(WORDS) + '\n')
+    elif len(words) > 1:
+        del words[i]
+    return ' '.join(words)
+
+
+@pytest.mark.parametrize('old, new', [
+    ('', ''),
+    ('', 'new text'),
+    ('  leading and trailing  ', 'leading\n\nand  trailing'),
+    ('one two three', 'one three two four'),
+    ('日本語の 文章 です', '日本語の 長い 文章 です'),
+])
+def test_delta_round_trip(old, new):
+    """Test that applying a delta rebuilds the new text exactly."""
+    assert revisions.apply_delta(old, revisions.make_delta(old, new)) == new
+
+
+def test_delta_is_small_for_small_edits():
+    """Test that a one-word edit of a long text stores only that word."""
+    text = ' '.join(WORDS * 300)
+    edited = text.replace('theta', 'THETA', 1)
+
+    delta = revisions.make_delta(text, edited)
+
+    assert revisions.apply_delta(text, delta) == edited
+    assert len(delta) < 40
+
+
+def _edit_post(session, author, words, edits, rng):
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    post = Post(title='v1', content=text, author=author)
+    session.add(post)
+    session.commit()
+    versions = [('v1', text)]
+    for n in range(2, edits + 2):
+        text = _edit(text, rng)
+        PostManager.update_post(session, post.id, f'v{n}', text)
+        session.commit()
+        versions.append((f'v{n}', text))
+    return post.id, versions
+
+
+def test_post_revisions_rebuild_every_version(session, author, monkeypatch):
+    """Test that every earlier version is rebuilt exactly, from the post
+    itself or from the nearest newer snapshot."""
+    monkeypatch.setattr(revisions, 'MAX_CHAIN_LENGTH', 20)
+    post_id, versions = _edit_post(session, author, 500, 80, random.Random(7))
+
+    history = revisions.post_revisions(session, post_id)
+    assert [row.number for row in history] == list(range(80, 0, -1))
+    for number in range(1, 81):
+        assert revisions.load_post_revision(
+            session, post_id, number
+        ) == versions[number - 1]
+    assert revisions.load_post_revision(session, post_id, 81) is None
+    snapshots = session.execute(
+        select(PostRevision.number).where(PostRevision.is_snapshot)
+    ).scalars().all()
+    assert snapshots == [20, 40, 60, 80]
+
+
+def test_post_revisions_storage_is_small(session, author):
+    """Test that a hundred edits of a long post cost a small fraction of
+    its size."""
+    post_id, versions = _edit_post(
+        session, author, 3000, 100, random.Random(11)
+    )
+
+    stored = session.execute(
+        select(func.sum(func.length(PostRevision.data)))
+    ).scalar()
+    assert stored < len(versions[-1][1]) / 4
+
+
+def test_unchanged_edit_adds_no_revision(session, author):
+    """Test that saving without changes does not record a version."""
+    post = Post(title='T', content='Body', author=author)
+    session.add(post)
+    session.commit()
+
+    PostManager.update_post(session, post.id, 'T', 'Body', tags=['x'])
+    session.commit()
+
+    assert revisions.post_revisions(session, post.id) == []
+
+
+def test_draft_autosave_chain(session, author):
+    """Test that autosaves append diffs, another session's save forces a
+    snapshot and older changes are compacted away."""
+    draft = None
+    text = ' '.join(WORDS * 10)
+    for word in ('there', 'was', 'a', 'draft'):
+        text += f' {word}'
+        draft = revisions.save_draft(session, author.id, 'Story', text, draft)
+        session.commit()
+    assert revisions.load_draft(session, author.id) == draft
+    changes = session.execute(
+        select(DraftChange.number, DraftChange.is_snapshot)
+        .order_by(DraftChange.number)
+    ).all()
+    assert changes == [(1, True), (2, False), (3, False), (4, False)]
+
+    # 別のセッションが先に保存していたら差分ではなく全文を書く
+    stale = revisions.Draft(2, 'Story', 'Stale text')
+    revisions.save_draft(session, author.id, 'Other', 'Other tab', stale)
+    session.commit()
+    assert revisions.load_draft(session, author.id) == revisions.Draft(
+        5, 'Other', 'Other tab'
+    )
+    assert session.execute(select(func.count(DraftChange.id))).scalar() == 1
+
+    revisions.discard_draft(session, author.id)
+    session.commit()
+    assert revisions.load_draft(session, author.id) is None
+
+
+def test_deleting_removes_history_and_drafts(session, author):
+    """Test that revisions and drafts go with their post and user."""
+    post = Post(title='T', content='Body', author=author)
+    session.add(post)
+    session.commit()
+    PostManager.update_post(session, post.id, 'T', 'New body')
+    revisions.save_draft(session, author.id, 'Draft', 'Text')
+    session.commit()
+
+    user_deletion.delete_users(session, [author.id], user_deletion.CASCADE)
+    session.commit()
+
+    assert session.execute(select(func.count(PostRevision.id))).scalar() == 0
+    assert session.execute(select(func.count(DraftChange.id))).scalar() == 0
@@ -0,0 +1,77 @@
+import datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base, User, Post
+from src.static_site import StaticSiteExporter
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'blog.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id=1, username='alice', password_hash='x'))
+    start = datetime.datetime(2024, 1, 1)
+    for i in range(1, 6):
+        session.add(Post(
+            id=i, title=f'Post {i}', content=f'Body **{i}**', user_id=1,
+            created_at=start + datetime.timedelta(minutes=i)
+        ))
+    session.commit()
+    session.close()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def exporter(engine, tmp_path):
+    return StaticSiteExporter(engine, str(tmp_path / 'site'), page_size=2,
+                              base_url='https://blog.example')
+
+
+def test_export_writes_site(exporter, tmp_path):
+    """Test that posts, oldest-first index pages and the feed are written."""
+    written = exporter.export()
+
+    assert sorted(written) == sorted(
+        [f'posts/{i}.html' for i in range(1, 6)]
+        + ['page-1.html', 'page-2.html', 'page-3.html', 'atom.xml',
+           'index.html']
+    )
+    site = tmp_path / 'site'
+    assert '<strong>3</strong>' in (site / 'posts/3.html').read_text()
+    # 最新のページが index.html になる
+    index = (site / 'index.html').read_text()
+    assert index == (site / 'page-3.html').read_text()
+    assert 'posts/5.html' in index and 'page-2.html' in index
+    feed = (site / 'atom.xml').read_text()
+    assert '<link href="https://blog.example/posts/5.html"/>' in feed
+    assert feed.index('Post 5') < feed.index('Post 1')
+
+
+def test_export_is_incremental(exporter, engine):
+    """Test that only the changed post, its page and the feed are
+    rewritten, and deleted posts are removed."""
+    exporter.export()
+    assert exporter.export() == []
+
+    session = sessionmaker(bind=engine)()
+    session.get(Post, 1).content = 'Edited'
+    session.delete(session.get(Post, 5))
+    session.commit()
+    session.close()
+    written = exporter.export()
+
+    assert sorted(written) == [
+        'atom.xml', 'index.html', 'page-1.html', 'page-2.html', 'posts/1.html'
+    ]
+    assert exporter.removed == ['posts/5.html', 'page-3.html']
+
+
+def test_export_full(exporter):
+    """Test that a full export rewrites every file."""
+    first = exporter.export()
+
+    assert sorted(exporter.export(full=True)) == sorted(first)
@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src import tags
+from src.models import Base, User, Post
+from src.tag_repository import TagRepository, TagRow
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    author = User(username='author', password_hash='x')
+    for names in (['python', 'sql'], ['python'], ['python', 'web'], []):
+        post = Post(title='T', content='C', author=author)
+        session.add(post)
+        session.flush()
+        tags.set_post_tags(session, post, names)
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_tag_cloud(session):
+    """Test that the cloud keeps the most used tags, sorted by name."""
+    cloud = TagRepository(session).tag_cloud(limit=2)
+
+    assert cloud[0] == TagRow('python', 3)
+    assert len(cloud) == 2
+
+
+def test_tags_for_posts(session):
+    """Test that tags of several posts are loaded at once."""
+    assert TagRepository(session).tags_for_posts([1, 3, 4]) == {
+        1: ('python', 'sql'), 3: ('python', 'web')
+    }
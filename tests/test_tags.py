@@ -0,0 +1,84 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from src import tags, user_deletion
+from src.database import DEFAULT_SETTINGS, create_blog_engine
+from src.models import Base, User, Post, Tag, content_version
+
+
+@pytest.fixture
+def session():
+    # 外部キー制約を有効にしたアプリと同じ設定のエンジン
+    engine = create_blog_engine(dict(DEFAULT_SETTINGS, url='sqlite://'))
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _counts(session):
+    return dict(session.execute(
+        select(Tag.name, Tag.post_count).order_by(Tag.name)
+    ).all())
+
+
+def _add_post(session, author, names):
+    post = Post(title='T', content='C', author=author)
+    session.add(post)
+    session.flush()
+    tags.set_post_tags(session, post, names)
+    session.commit()
+    return post
+
+
+def test_parse_tags():
+    """Test that tag input is normalized, de-duplicated and capped."""
+    assert tags.parse_tags(' #Python, web dev,python,,') == [
+        'python', 'web-dev'
+    ]
+    assert tags.parse_tags(None) == []
+    assert len(tags.parse_tags(','.join(str(i) for i in range(20)))) == (
+        tags.MAX_TAGS
+    )
+
+
+def test_counts_follow_tag_changes(session):
+    """Test that post counts are maintained incrementally by triggers."""
+    author = User(username='author', password_hash='x')
+    first = _add_post(session, author, ['python', 'sql'])
+    _add_post(session, author, ['python'])
+    assert _counts(session) == {'python': 2, 'sql': 1}
+
+    tags.set_post_tags(session, first, ['sql', 'web'])
+    session.commit()
+    assert _counts(session) == {'python': 1, 'sql': 1, 'web': 1}
+
+    session.delete(first)
+    session.commit()
+    assert _counts(session) == {'python': 1, 'sql': 0, 'web': 0}
+
+
+def test_tag_changes_advance_content_version(session):
+    """Test that retagging a post alone invalidates cached pages."""
+    author = User(username='author', password_hash='x')
+    post = _add_post(session, author, ['python'])
+    before, _ = content_version(session.connection())
+
+    tags.set_post_tags(session, post, ['sql'])
+    session.commit()
+
+    assert content_version(session.connection())[0] > before
+
+
+def test_counts_follow_set_based_deletes(session):
+    """Test that counts drop when a user's posts are deleted in bulk."""
+    author = User(username='author', password_hash='x')
+    for _ in range(3):
+        _add_post(session, author, ['python'])
+
+    user_deletion.delete_users(session, [author.id], user_deletion.CASCADE)
+    session.commit()
+
+    assert _counts(session) == {'python': 0}
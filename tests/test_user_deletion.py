@@ -0,0 +1,132 @@
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from src import user_deletion
+from src.database import DEFAULT_SETTINGS, create_blog_engine
+from src.models import Base, User, Post
+
+
+@pytest.fixture
+def engine():
+    # 外部キー制約を有効にしたアプリと同じ設定のエンジン
+    engine = create_blog_engine(dict(DEFAULT_SETTINGS, url='sqlite://'))
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def author(session):
+    author = User(username='author', password_hash='x')
+    other = User(username='other', password_hash='x')
+    session.add_all([author, other])
+    session.add_all(
+        [Post(title=f'P{i}', content='c', author=author) for i in range(20)]
+        + [Post(title='Other', content='c', author=other)]
+    )
+    session.commit()
+    return author.id
+
+
+def _post_owners(session):
+    return session.execute(
+        select(Post.user_id).order_by(Post.id)
+    ).scalars().all()
+
+
+def test_foreign_keys_enforced(session):
+    """Test that SQLite rejects posts pointing at missing users."""
+    session.add(Post(title='Dangling', content='c', user_id=999))
+    with pytest.raises(IntegrityError):
+        session.commit()
+
+
+def test_anonymize(session, author):
+    """Test that posts are kept without an author."""
+    deleted = user_deletion.delete_users(
+        session, [author], user_deletion.ANONYMIZE
+    )
+    session.commit()
+
+    assert deleted == 1
+    owners = _post_owners(session)
+    assert owners.count(None) == 20
+    assert session.get(User, author) is None
+
+
+def test_reassign(session, author):
+    """Test that posts move to the tombstone account."""
+    user_deletion.delete_users(session, [author], user_deletion.REASSIGN)
+    session.commit()
+
+    tombstone = session.execute(
+        select(User).where(
+            User.username == user_deletion.TOMBSTONE_USERNAME)
+    ).scalar_one()
+    assert _post_owners(session).count(tombstone.id) == 20
+    assert tombstone.is_admin is False
+
+    # 退会済みアカウントは削除対象から外れる
+    assert user_deletion.delete_users(
+        session, [tombstone.id], user_deletion.REASSIGN
+    ) == 0
+
+
+def test_reassign_ignores_user_named_like_tombstone(session, author):
+    """Test that a user who registered the tombstone's name does not
+    receive reassigned posts."""
+    impostor = User(username=user_deletion.TOMBSTONE_USERNAME,
+                    password_hash='x', is_admin=True)
+    session.add(impostor)
+    session.commit()
+
+    user_deletion.delete_users(session, [author], user_deletion.REASSIGN)
+    session.commit()
+
+    tombstone = session.execute(
+        select(User).where(User.is_tombstone.is_(True))
+    ).scalar_one()
+    assert tombstone.id != impostor.id
+    assert tombstone.username.startswith(user_deletion.TOMBSTONE_USERNAME)
+    assert _post_owners(session).count(tombstone.id) == 20
+    assert impostor.id not in _post_owners(session)
+
+
+def test_cascade(session, author):
+    """Test that posts are deleted together with the user."""
+    user_deletion.delete_users(session, [author], user_deletion.CASCADE)
+    session.commit()
+
+    assert len(_post_owners(session)) == 1
+
+
+def test_statement_count_independent_of_posts(engine, session, author):
+    """Test that deleting a prolific author takes a fixed few statements."""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        user_deletion.delete_users(session, [author], user_deletion.CASCADE)
+        session.commit()
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+    assert len(statements) == 2
+
+
+def test_unknown_policy(session):
+    with pytest.raises(ValueError):
+        user_deletion.delete_users(session, [1], 'archive')
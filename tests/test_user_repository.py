@@ -0,0 +1,91 @@
+import datetime
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base, User, Post
+from src.user_repository import UserRepository
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def session(engine):
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def users(session):
+    base = datetime.datetime(2024, 1, 1)
+    alice = User(username='alice', password_hash='x', is_admin=True)
+    albert = User(username='albert', password_hash='x')
+    bob = User(username='bob', password_hash='x')
+    session.add_all([alice, albert, bob])
+    for i in range(3):
+        session.add(Post(title=f'A{i}', content='c', author=alice,
+                         created_at=base + datetime.timedelta(days=i)))
+    session.add(Post(title='B', content='c', author=bob, created_at=base))
+    session.commit()
+
+
+def test_user_page_aggregates_posts(session, users):
+    """Test that post counts and last post dates are aggregated."""
+    rows, has_more = UserRepository(session).user_page(page_size=10)
+
+    assert has_more is False
+    assert [(r.username, r.post_count) for r in rows] == [
+        ('albert', 0), ('alice', 3), ('bob', 1)
+    ]
+    assert rows[0].last_post_at is None
+    assert rows[1].last_post_at == datetime.datetime(2024, 1, 3)
+    assert rows[1].is_admin is True
+
+
+def test_get_user(session, users):
+    """Test that one user row has the same aggregates as on the page."""
+    repository = UserRepository(session)
+    rows, _ = repository.user_page(page_size=10)
+
+    for row in rows:
+        assert repository.get_user(row.id) == row
+    assert repository.get_user(12345) is None
+
+
+def test_user_page_prefix_and_cursor(session, users):
+    """Test prefix search and keyset pagination by username."""
+    repository = UserRepository(session)
+
+    first, has_more = repository.user_page(page_size=1, prefix='al')
+    assert [r.username for r in first] == ['albert']
+    assert has_more is True
+
+    second, has_more = repository.user_page(
+        page_size=1, prefix='al', cursor=first[-1].username
+    )
+    assert [r.username for r in second] == ['alice']
+    assert has_more is False
+
+
+def test_user_page_single_statement(engine, session, users):
+    """Test that the page stays within a one-query budget."""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        UserRepository(session).user_page(page_size=10)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+    assert len(statements) == 1
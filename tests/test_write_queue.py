@@ -0,0 +1,139 @@
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from src.database import DEFAULT_SETTINGS, create_blog_engine
+from src.models import Base, User, Post
+from src.post_manager import PostManager
+from src.write_queue import WriteQueue, WriteQueueFull
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # ライタースレッドから同じDBを見るためファイルを使う
+    engine = create_blog_engine(
+        dict(DEFAULT_SETTINGS, url=f"sqlite:///{tmp_path / 'blog.db'}")
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def writer(session_factory):
+    writer = WriteQueue(session_factory, batch_size=16)
+    yield writer
+    writer.stop()
+
+
+def _titles(session_factory):
+    with session_factory() as session:
+        return sorted(session.execute(select(Post.title)).scalars())
+
+
+def test_group_commit_from_many_threads(session_factory, writer):
+    """Test that concurrent writes are all committed in few batches."""
+    futures = []
+    lock = threading.Lock()
+
+    def editor(i):
+        for j in range(10):
+            future = writer.submit(lambda session, t=f'{i}-{j}': session.add(
+                Post(title=t, content='c')
+            ))
+            with lock:
+                futures.append(future)
+
+    threads = [threading.Thread(target=editor, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for future in futures:
+        future.result(timeout=10)
+
+    assert len(_titles(session_factory)) == 80
+    assert writer.batches <= 80
+
+
+def test_failed_operation_only_fails_its_future(session_factory, writer):
+    """Test that one bad write does not roll back the rest of the batch."""
+    release = threading.Event()
+    # 最初の書き込みでライターを止め、後続を同じバッチに溜める
+    first = writer.submit(lambda session: release.wait(5))
+    bad = writer.submit(
+        lambda session: session.add(Post(title='bad', content=None))
+    )
+    good = writer.submit(
+        lambda session: session.add(Post(title='good', content='c'))
+    )
+    release.set()
+
+    first.result(timeout=10)
+    with pytest.raises(IntegrityError):
+        bad.result(timeout=10)
+    good.result(timeout=10)
+    assert _titles(session_factory) == ['good']
+
+
+def test_batch_is_one_transaction(session_factory, writer):
+    """Test that writes in a batch stay invisible to other connections
+    until the whole batch commits."""
+    from concurrent.futures import Future
+
+    def add(session):
+        session.add(Post(title='first', content='c'))
+
+    def peek(session):
+        # 別の接続から見ると、最初の書き込みはまだコミットされていない
+        return _titles(session_factory)
+
+    batch = [(add, Future()), (peek, Future())]
+    writer._commit(batch)
+
+    assert batch[1][1].result(timeout=0) == []
+    assert _titles(session_factory) == ['first']
+    assert writer.batches == 1
+
+
+def test_backpressure(session_factory):
+    """Test that a full queue rejects writes instead of growing."""
+    writer = WriteQueue(session_factory, maxsize=1, put_timeout=0.01)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow(session):
+        started.set()
+        release.wait(5)
+
+    try:
+        writer.submit(slow)
+        assert started.wait(5)
+        writer.submit(lambda session: None)  # キューを埋める
+        with pytest.raises(WriteQueueFull):
+            writer.submit(lambda session: None)
+    finally:
+        release.set()
+        writer.stop()
+
+
+@patch('src.post_manager.st')
+def test_post_manager_writes_through_queue(mock_st, session_factory, writer):
+    """Test that PostManager hands its writes to the writer thread."""
+    with session_factory() as session:
+        user = User(username='writer', password_hash='x')
+        session.add(user)
+        session.commit()
+
+        mock_st.session_state = {'user': user}
+        mock_st.text_input = MagicMock(return_value='Queued')
+        mock_st.text_area = MagicMock(return_value='Content')
+        mock_st.button = MagicMock(return_value=True)
+
+        PostManager(session, writer=writer).create_post()
+
+    assert _titles(session_factory) == ['Queued']
+    mock_st.success.assert_called_once_with("Post published successfully!")